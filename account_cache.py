@@ -0,0 +1,245 @@
+# account_cache.py - 本地资金与可用持仓缓存
+"""
+MiniTrader 下单前需要的可用资金和可卖数量从本地缓存读取，不再每笔委托都查询终端。
+
+- 基准值来自全量查询（连接时和定期刷新）以及 on_stock_asset / on_stock_position 推送
+- 下单提交后立即按委托金额/数量做乐观预扣（按 seq 记录）
+- 委托被终端确认后，预扣保留到下一次基准值刷新（此时终端的资金/持仓已经反映了这笔委托）；
+  废单、撤单或下单失败则直接释放；部成部撤只保留已成交部分
+- 异步回报和委托状态可能先于预扣登记到达（order_stock_async 返回前），先按 seq / order_id 暂存，
+  登记预扣时再补上
+- 成交回报按终端的口径更新基准值：卖出回款立即可用、持仓数量增减；买入资金和卖出可卖数量
+  在委托确认时已经冻结（由预扣或刷新后的基准值体现），成交时不再扣减
+- 全量刷新时传入终端当时已有的成交编号：这些成交已经计入新的基准值，之后迟到的推送不再重复计入
+"""
+import time
+import threading
+
+# 预扣最长保留时间（秒）：回报乱序等原因没能确认的预扣在基准值刷新时丢弃
+RESERVATION_TTL = 60
+
+# 委托终态（与 xtconstant.ORDER_PART_CANCEL / ORDER_CANCELED / ORDER_JUNK 一致）
+RELEASE_STATUSES = {53, 54, 57}
+ORDER_PART_CANCEL = 53
+ORDER_JUNK = 57
+# 交易类型（与 xtconstant.STOCK_BUY / STOCK_SELL 一致）
+STOCK_BUY, STOCK_SELL = 23, 24
+# 暂存的早到回报、已计入的成交编号最多保留条数（其他会话提交的委托也会推送过来，不会有人来取）
+MAX_EARLY = 1000
+
+POSITION_FIELDS = ("stock_code", "volume", "can_use_volume", "frozen_volume", "open_price",
+                   "market_value", "on_road_volume", "yesterday_volume")
+
+
+class _Reservation:
+    __slots__ = ("seq", "order_id", "stock_code", "cash", "volume", "acked_at", "created_at")
+
+    def __init__(self, seq, stock_code, cash=0.0, volume=0):
+        self.seq = seq
+        self.order_id = None
+        self.stock_code = stock_code
+        self.cash = cash
+        self.volume = volume
+        self.acked_at = None
+        self.created_at = time.time()
+
+
+class AccountCache:
+    """资金/持仓缓存"""
+
+    def __init__(self):
+        self.asset = {"total_asset": 0.0, "market_value": 0.0, "cash": 0.0, "frozen_cash": 0.0}
+        self.positions = {}
+        self.asset_at = 0.0
+        self.positions_at = 0.0
+        self._reservations = {}
+        self._by_order = {}
+        # 预扣登记前到达的异步回报 seq -> order_id、委托状态 order_id -> (状态, 时间)、只带 seq 的下单失败
+        self._early_acks = {}
+        self._early_orders = {}
+        self._early_errors = {}
+        # 已计入基准值的成交编号（同一成交重复推送时不重复计入）
+        self._trade_ids = {}
+        self._lock = threading.Lock()
+
+    # ---------- 基准值 ----------
+    def load_asset(self, asset, traded_ids=None):
+        """全量查询或 on_stock_asset 推送的资金
+
+        Args:
+            asset: 资金对象
+            traded_ids: 可选，查询时终端已有的成交编号（已计入 asset，之后的推送不再计入）
+        """
+        if asset is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._cover_trades(traded_ids)
+            self.asset = {
+                "total_asset": asset.total_asset,
+                "market_value": asset.market_value,
+                "cash": asset.cash,
+                "frozen_cash": asset.frozen_cash,
+            }
+            self.asset_at = now
+            self._settle(lambda r: r.cash > 0, now)
+
+    def load_positions(self, positions, traded_ids=None):
+        """全量查询的持仓，traded_ids 同 load_asset"""
+        now = time.time()
+        with self._lock:
+            self._cover_trades(traded_ids)
+            self.positions = {
+                p.stock_code: {name: getattr(p, name, None) for name in POSITION_FIELDS}
+                for p in positions or []
+            }
+            self.positions_at = now
+            self._settle(lambda r: r.volume > 0, now)
+
+    def update_position(self, position):
+        """on_stock_position 推送的单个持仓"""
+        now = time.time()
+        with self._lock:
+            self.positions[position.stock_code] = {name: getattr(position, name, None) for name in POSITION_FIELDS}
+            self._settle(lambda r: r.volume > 0 and r.stock_code == position.stock_code, now)
+
+    def _cover_trades(self, traded_ids):
+        """登记已计入基准值的成交（调用方已持有锁）"""
+        for traded_id in traded_ids or ():
+            self._remember(self._trade_ids, traded_id, None)
+
+    def _settle(self, match, now):
+        """已被终端确认、且确认早于本次基准值的预扣可以丢弃（调用方已持有锁）"""
+        for seq, r in list(self._reservations.items()):
+            if not match(r):
+                continue
+            if (r.acked_at is not None and r.acked_at <= now) or now - r.created_at > RESERVATION_TTL:
+                self._drop(seq)
+
+    def _drop(self, seq):
+        r = self._reservations.pop(seq, None)
+        if r is not None and r.order_id is not None:
+            self._by_order.pop(r.order_id, None)
+
+    def needs_refresh(self, interval):
+        return time.time() - min(self.asset_at, self.positions_at) > interval
+
+    # ---------- 乐观预扣 ----------
+    def reserve_cash(self, seq, stock_code, amount):
+        with self._lock:
+            self._reserve(_Reservation(seq, stock_code, cash=amount))
+
+    def reserve_volume(self, seq, stock_code, volume):
+        with self._lock:
+            self._reserve(_Reservation(seq, stock_code, volume=volume))
+
+    def _reserve(self, r):
+        """登记预扣，补上已经到达的回报（调用方已持有锁）"""
+        if r.seq in self._early_errors:
+            # 下单失败先到，不再预扣
+            del self._early_errors[r.seq]
+            return
+        self._reservations[r.seq] = r
+        order_id = self._early_acks.pop(r.seq, None)
+        if order_id is None:
+            return
+        r.order_id = order_id
+        self._by_order[order_id] = r.seq
+        early = self._early_orders.pop(order_id, None)
+        if early is not None:
+            self._apply_status(r.seq, *early)
+
+    @staticmethod
+    def _remember(early, key, value):
+        early[key] = value
+        if len(early) > MAX_EARLY:
+            early.pop(next(iter(early)))
+
+    def on_async_response(self, seq, order_id):
+        """异步下单回报：记录 seq -> order_id（预扣还没登记时先暂存）"""
+        with self._lock:
+            r = self._reservations.get(seq)
+            if r is None:
+                self._remember(self._early_acks, seq, order_id)
+                return
+            r.order_id = order_id
+            self._by_order[order_id] = seq
+
+    def on_order(self, order):
+        """委托状态变化：终态释放预扣，其他状态视为终端已确认"""
+        with self._lock:
+            seq = self._by_order.get(order.order_id)
+            if seq is None:
+                self._remember(self._early_orders, order.order_id, self._status_of(order))
+                return
+            self._apply_status(seq, *self._status_of(order))
+
+    @staticmethod
+    def _status_of(order):
+        """(状态, 时间, 已成交数量, 成交均价)"""
+        return (order.order_status, time.time(),
+                getattr(order, "traded_volume", 0) or 0, getattr(order, "traded_price", 0.0) or 0.0)
+
+    def _apply_status(self, seq, status, at, traded_volume=0, traded_price=0.0):
+        r = self._reservations[seq]
+        if status == ORDER_PART_CANCEL and traded_volume > 0:
+            # 部成部撤：撤掉的部分释放，已成交部分保留到下一次基准值刷新
+            if r.cash > 0:
+                r.cash = traded_volume * traded_price
+            if r.volume > 0:
+                r.volume = min(r.volume, traded_volume)
+        elif status in RELEASE_STATUSES:
+            self._drop(seq)
+            return
+        if r.acked_at is None:
+            r.acked_at = at
+
+    def on_trade(self, trade):
+        """成交回报：卖出回款计入可用资金，持仓数量按成交增减"""
+        with self._lock:
+            if trade.traded_id in self._trade_ids:
+                return
+            self._remember(self._trade_ids, trade.traded_id, None)
+            position = self.positions.get(trade.stock_code)
+            if position is None:
+                position = dict.fromkeys(POSITION_FIELDS, 0)
+                position["stock_code"] = trade.stock_code
+                position["open_price"] = 0.0
+                self.positions[trade.stock_code] = position
+            if trade.order_type == STOCK_BUY:
+                position["volume"] = (position["volume"] or 0) + trade.traded_volume
+            elif trade.order_type == STOCK_SELL:
+                position["volume"] = (position["volume"] or 0) - trade.traded_volume
+                self.asset["cash"] += trade.traded_amount
+
+    def on_order_error(self, order_error):
+        """下单失败：释放预扣"""
+        with self._lock:
+            seq = self._by_order.get(getattr(order_error, "order_id", None))
+            if seq is None:
+                seq = getattr(order_error, "seq", None)
+            if seq in self._reservations:
+                self._drop(seq)
+                return
+            # 预扣还没登记：按 seq / order_id 暂存，登记时直接释放
+            if seq is not None:
+                self._remember(self._early_errors, seq, None)
+            if getattr(order_error, "order_id", None) is not None:
+                self._remember(self._early_orders, order_error.order_id, (ORDER_JUNK, time.time(), 0, 0.0))
+
+    # ---------- 读取 ----------
+    def available_cash(self):
+        with self._lock:
+            reserved = sum(r.cash for r in self._reservations.values())
+            return self.asset["cash"] - reserved
+
+    def can_use_volume(self, stock_code):
+        with self._lock:
+            position = self.positions.get(stock_code)
+            base = position["can_use_volume"] if position else 0
+            reserved = sum(r.volume for r in self._reservations.values() if r.stock_code == stock_code)
+            return base - reserved
+
+    def position_records(self):
+        with self._lock:
+            return list(self.positions.values())
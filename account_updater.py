@@ -3,32 +3,18 @@ import time
 import pandas as pd
 import os
 import json
-from xtquant.xttrader import XtQuantTrader
-from xtquant.xttype import StockAccount
-from xtquant import xtconstant
+from broker import XtQuantTrader, XtQuantTraderCallback, StockAccount, xtconstant, xtdata
 from datetime import datetime
-from xtquant.xttrader import XtQuantTraderCallback
-from xtquant import xtdata
-import logging
+from snapshot_store import SnapshotStore, file_signature
+from logger import setup_logger
 
-# Configure logger
-logger = logging.getLogger("account_updater")
-logger.setLevel(logging.INFO)
-# Create file handler
-log_file = os.path.join("d:\\Users\\Jack\\xtquant\\logs", "account_updater.log")
-os.makedirs(os.path.dirname(log_file), exist_ok=True)
-file_handler = logging.FileHandler(log_file)
-file_handler.setLevel(logging.INFO)
-# Create console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-# Create formatter and add it to the handlers
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
-# Add the handlers to the logger
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# Configure logger（异步写入，见 logger.setup_logger）
+logger = setup_logger(
+    "account_updater",
+    os.path.join("d:\\Users\\Jack\\xtquant\\logs", "account_updater.log"),
+    rotate=False,
+    fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
 
 # 使用示例
 # 在文件顶部导入区域添加
@@ -79,6 +65,7 @@ class AccountUpdater:
         
         # Ensure data directories exist
         self._ensure_directories()
+        self.store = SnapshotStore(data_dir)
         
     
     def _ensure_directories(self):
@@ -118,6 +105,11 @@ class AccountUpdater:
         # Save to file
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
+
+        # 同步写入列式快照库
+        source = file_signature(file_path)
+        self.store.write_day("account", today, [dict(account_info or {}, timestamp=data["timestamp"])], source)
+        self.store.write_day("positions", today, positions_df, source)
         
         logger.info(f"账户和持仓信息已保存到 {file_path}")
         return file_path
@@ -144,6 +136,11 @@ class AccountUpdater:
         # Save to file
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
+
+        # 同步写入列式快照库
+        source = file_signature(file_path)
+        self.store.write_day("orders", today, orders_df, source)
+        self.store.write_day("trades", today, trades_df, source)
         
         logger.info(f"委托和成交信息已保存到 {file_path}")
         return file_path
@@ -0,0 +1,206 @@
+# analytics.py - 绩效分析
+"""
+基于资产曲线（equity_curve）、快照库中的历史成交和批次引擎（lot_engine）计算绩效指标。
+
+- 成交按 (日期, 策略) 预先汇总，汇总结果按快照库的日期版本号增量维护：只重新读取新增或改写过的日期
+- 结果缓存的键是输入来源的状态：资产曲线和批次引擎对象（两者没有新数据时返回同一个对象）
+  以及快照库 trades 表的版本号，任何一天被改写都会重新计算
+- 策略归因包含成交额/现金流和批次引擎算出的已实现盈亏
+"""
+import threading
+import numpy as np
+import pandas as pd
+from postmarket_helper import read_store_trades, strategy_of
+
+TRADING_DAYS = 252
+
+DAILY_COLUMNS = ["日期", "策略", "成交笔数", "买入金额", "卖出金额", "成交额"]
+ATTRIBUTION_COLUMNS = ["成交笔数", "买入金额", "卖出金额", "净现金流", "成交额占比", "平仓笔数", "已实现盈亏", "胜率"]
+
+# 结果缓存：store.root -> (键, 资产曲线, 批次引擎, 结果)
+_memo = {}
+# 成交汇总缓存：store.root -> (日期版本号, 汇总)
+_daily = {}
+_lock = threading.Lock()
+
+
+def trading_day_equity(curve):
+    """从插值后的资产曲线中取出真实交易日的总资产序列"""
+    if curve.empty:
+        return pd.Series(dtype="float64")
+    # 插值出来的自然日没有日收益率，第一天也没有，单独补回
+    mask = curve["日收益率"].notna().to_numpy(copy=True)
+    mask[0] = True
+    return curve["总资产"][mask]
+
+
+def drawdown_stats(equity):
+    """最大回撤及最长回撤持续天数（交易日）
+
+    Returns:
+        tuple: (最大回撤, 最长回撤持续天数, 回撤序列)
+    """
+    values = equity.to_numpy(dtype="float64")
+    if values.size == 0:
+        return 0.0, 0, pd.Series(dtype="float64")
+    peak = np.maximum.accumulate(values)
+    dd = values / peak - 1.0
+
+    # 水下区间的游程长度：每次回到新高时重置计数
+    underwater = dd < 0
+    idx = np.arange(values.size)
+    last_peak = np.maximum.accumulate(np.where(underwater, 0, idx))
+    duration = np.where(underwater, idx - last_peak, 0)
+    return float(dd.min()), int(duration.max()), pd.Series(dd, index=equity.index)
+
+
+def period_returns(equity, freq):
+    """按周期（"W" / "M"）计算收益率"""
+    if equity.empty:
+        return pd.Series(dtype="float64")
+    rule = {"W": "W-FRI", "M": "ME"}.get(freq, freq)
+    try:
+        last = equity.resample(rule).last()
+    except ValueError:
+        # 旧版 pandas 不认识 "ME"
+        last = equity.resample("M" if freq == "M" else rule).last()
+    base = pd.concat([equity.iloc[:1], last])
+    return base.pct_change().iloc[1:].dropna()
+
+
+def _aggregate_trades(trades):
+    """按 (日期, 策略) 汇总成交笔数、买入/卖出金额和成交额"""
+    if trades.empty:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    value = pd.to_numeric(trades["Value"], errors="coerce").fillna(0.0).to_numpy()
+    side = trades["TradeType"].astype(str).to_numpy()
+    frame = pd.DataFrame({
+        "日期": trades["日期"].astype(str).to_numpy(),
+        "策略": strategy_of(trades).to_numpy(),
+        "买入金额": np.where(side == "buy", value, 0.0),
+        "卖出金额": np.where(side == "sell", value, 0.0),
+        "成交额": value,
+    })
+    grouped = frame.groupby(["日期", "策略"], sort=False)
+    result = grouped[["买入金额", "卖出金额", "成交额"]].sum()
+    result.insert(0, "成交笔数", grouped.size())
+    return result.reset_index()[DAILY_COLUMNS]
+
+
+def daily_trade_stats(store):
+    """按 (日期, 策略) 汇总的成交，只重新读取快照库中新增或改写过的日期
+
+    Returns:
+        pd.DataFrame: 列为 DAILY_COLUMNS
+    """
+    versions = store.versions("trades")
+    with _lock:
+        known, daily = _daily.get(store.root, ({}, pd.DataFrame(columns=DAILY_COLUMNS)))
+        changed = sorted(d for d, v in versions.items() if known.get(d) != v)
+        removed = [d for d in known if d not in versions]
+        if not changed and not removed:
+            return daily
+
+        daily = daily[~daily["日期"].isin(changed + removed)]
+        if changed:
+            trades = read_store_trades(store, start=changed[0], end=changed[-1])
+            fresh = _aggregate_trades(trades[trades["日期"].isin(changed)])
+            daily = pd.concat([daily, fresh], ignore_index=True) if not daily.empty else fresh
+        daily = daily.sort_values("日期", kind="stable").reset_index(drop=True)
+        _daily[store.root] = (dict(versions), daily)
+        return daily
+
+
+def strategy_attribution(daily, lots=None):
+    """按策略汇总成交和已实现盈亏
+
+    Args:
+        daily: daily_trade_stats 的输出
+        lots: 可选，LotEngine；提供时按平仓成交的策略汇总已实现盈亏和胜率
+
+    Returns:
+        pd.DataFrame: 每个策略的成交笔数、买入/卖出金额、净现金流、成交额占比、平仓笔数、已实现盈亏和胜率
+    """
+    result = daily.groupby("策略")[["成交笔数", "买入金额", "卖出金额", "成交额"]].sum()
+    result["净现金流"] = result["卖出金额"] - result["买入金额"]
+    total = result["成交额"].sum()
+    result["成交额占比"] = result["成交额"] / total if total else 0.0
+
+    realized = lots.realized_lots() if lots is not None else pd.DataFrame(columns=["Strategy", "已实现盈亏"])
+    if not realized.empty:
+        grouped = realized.groupby("Strategy")["已实现盈亏"]
+        pnl = pd.DataFrame({
+            "平仓笔数": grouped.size(),
+            "已实现盈亏": grouped.sum(),
+            "胜率": (realized["已实现盈亏"] > 0).groupby(realized["Strategy"]).mean(),
+        })
+        result = result.join(pnl, how="outer")
+    result = result.reindex(columns=ATTRIBUTION_COLUMNS)
+    result[["成交笔数", "平仓笔数"]] = result[["成交笔数", "平仓笔数"]].fillna(0).astype("int64")
+    result[["买入金额", "卖出金额", "净现金流", "成交额占比", "已实现盈亏"]] = \
+        result[["买入金额", "卖出金额", "净现金流", "成交额占比", "已实现盈亏"]].fillna(0.0)
+    result.index.name = "策略"
+    return result.sort_values(["已实现盈亏", "成交笔数"], ascending=False)
+
+
+def compute_performance(curve, store, lots=None, risk_free=0.0):
+    """计算绩效指标
+
+    Args:
+        curve: refresh_equity_curve 返回的资产曲线
+        store: 快照库（调用方负责 sync_store）
+        lots: 可选，update_lot_engine 返回的批次引擎，用于策略归因中的已实现盈亏
+        risk_free: 年化无风险利率
+
+    Returns:
+        dict: summary（指标字典）、daily/weekly/monthly（收益率序列）、
+              drawdown（回撤序列）、turnover（日换手率）、attribution（策略归因）
+    """
+    key = (store.version("trades"), risk_free)
+    with _lock:
+        cached = _memo.get(store.root)
+    if cached and cached[0] == key and cached[1] is curve and cached[2] is lots:
+        return cached[3]
+
+    daily_trades = daily_trade_stats(store)
+    equity = trading_day_equity(curve)
+    returns = equity.pct_change().dropna()
+    r = returns.to_numpy(dtype="float64")
+
+    rf_daily = risk_free / TRADING_DAYS
+    excess = r - rf_daily
+    std = r.std(ddof=1) if r.size > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(excess, 0.0) ** 2)) if r.size else 0.0
+    max_dd, dd_days, dd_series = drawdown_stats(equity)
+
+    # 日换手率 = 当日成交额 / 当日总资产
+    turnover = pd.Series(dtype="float64")
+    if not daily_trades.empty and not equity.empty:
+        daily_value = daily_trades.groupby("日期", sort=True)["成交额"].sum()
+        daily_value.index = pd.to_datetime(daily_value.index, format="%Y%m%d")
+        turnover = (daily_value / equity.reindex(daily_value.index)).dropna()
+
+    summary = {
+        "交易日数": int(equity.size),
+        "累计收益率": float(equity.iloc[-1] / equity.iloc[0] - 1.0) if equity.size else 0.0,
+        "年化波动率": float(std * np.sqrt(TRADING_DAYS)),
+        "夏普比率": float(excess.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else 0.0,
+        "索提诺比率": float(excess.mean() / downside * np.sqrt(TRADING_DAYS)) if downside > 0 else 0.0,
+        "最大回撤": max_dd,
+        "最长回撤天数": dd_days,
+        "日胜率": float((r > 0).mean()) if r.size else 0.0,
+        "平均日换手率": float(turnover.mean()) if not turnover.empty else 0.0,
+    }
+    result = {
+        "summary": summary,
+        "daily": returns,
+        "cumulative": equity / equity.iloc[0] - 1.0 if equity.size else equity,
+        "weekly": period_returns(equity, "W"),
+        "monthly": period_returns(equity, "M"),
+        "drawdown": dd_series,
+        "turnover": turnover,
+        "attribution": strategy_attribution(daily_trades, lots),
+    }
+    with _lock:
+        _memo[store.root] = (key, curve, lots, result)
+    return result
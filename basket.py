@@ -0,0 +1,267 @@
+# basket.py - 篮子委托
+"""
+一次性对一组股票下单：只做一次资金/持仓/行情查询，向量化计算各腿数量（整手取整 + 资金约束），
+再由后台线程以受控并发调用 order_stock_async 提交。返回的 BasketOrder 跟踪全部子委托直到完成。
+"""
+import time
+import threading
+import numpy as np
+import pandas as pd
+from logger import logger
+
+# 每手股数
+LOT_SIZE = 100
+
+# 委托终态（与 xtconstant.ORDER_PART_CANCEL / ORDER_CANCELED / ORDER_SUCCEEDED / ORDER_JUNK 一致）
+FINAL_STATUSES = {53, 54, 56, 57}
+
+# 子委托登记前暂存的回报最多保留条数（其他策略的委托回报也会转发过来，不会有人来取）
+MAX_EARLY = 1000
+
+LEG_COLUMNS = ["StockCode", "Side", "Volume", "Price", "Seq", "OrderId", "Status", "TradedVolume", "Error"]
+
+
+def round_lots(volumes, lot=LOT_SIZE):
+    """向下取整到整手"""
+    return (np.floor(np.asarray(volumes, dtype="float64") / lot) * lot).astype("int64")
+
+
+def size_buy_legs(amounts, prices, cash, lot=LOT_SIZE):
+    """按目标金额计算买入数量，总金额超过可用资金时按比例缩减
+
+    Args:
+        amounts: 各腿目标金额
+        prices: 各腿价格
+        cash: 可用资金
+
+    Returns:
+        np.ndarray: 各腿买入股数（整手）
+    """
+    amounts = np.asarray(amounts, dtype="float64")
+    prices = np.asarray(prices, dtype="float64")
+    valid = prices > 0
+    volumes = np.zeros(prices.size, dtype="int64")
+    volumes[valid] = round_lots(amounts[valid] / prices[valid], lot)
+    cost = float((volumes * prices).sum())
+    if cost > cash > 0:
+        volumes = round_lots(volumes * (cash / cost), lot)
+    elif cash <= 0:
+        volumes[:] = 0
+    return volumes
+
+
+def size_sell_legs(volumes, can_use, lot=LOT_SIZE):
+    """按目标数量计算卖出数量：不超过可卖数量；未卖光时按整手取整，清仓时允许零股"""
+    volumes = np.minimum(np.asarray(volumes, dtype="int64"), np.asarray(can_use, dtype="int64"))
+    volumes = np.maximum(volumes, 0)
+    clear_all = volumes == np.asarray(can_use, dtype="int64")
+    return np.where(clear_all, volumes, round_lots(volumes, lot))
+
+
+def size_rebalance(weights, prices, volumes, can_use, total_asset, cash, lot=LOT_SIZE):
+    """按目标权重计算调仓数量
+
+    Args:
+        weights: 各代码目标权重（相对总资产）
+        prices: 各代码价格
+        volumes: 当前持仓数量
+        can_use: 当前可卖数量
+        total_asset: 总资产
+        cash: 可用资金（买入只使用现有可用资金，不计卖出回款）
+
+    Returns:
+        tuple: (卖出数量数组, 买入数量数组)
+    """
+    prices = np.asarray(prices, dtype="float64")
+    target_value = np.asarray(weights, dtype="float64") * total_asset
+    target = np.zeros(prices.size, dtype="float64")
+    np.divide(target_value, prices, out=target, where=prices > 0)
+    diff = target - np.asarray(volumes, dtype="float64")
+
+    sell = size_sell_legs(np.where(diff < 0, -diff, 0), can_use, lot)
+    buy_amount = np.where(diff > 0, diff * prices, 0.0)
+    buy = size_buy_legs(buy_amount, prices, cash, lot)
+    return sell, buy
+
+
+class BasketOrder:
+    """篮子委托句柄"""
+
+    def __init__(self, legs, remark=""):
+        self.remark = remark
+        self.legs = legs.reset_index(drop=True)
+        self.created_at = time.time()
+        self.finished_at = None
+        self._by_seq = {}
+        self._by_order = {}
+        # 子委托登记前就到达的回报
+        self._early_acks = {}
+        self._early_orders = {}
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        if self.legs.empty:
+            self._finish()
+
+    # ---------- 回报处理（MiniTrader 转发） ----------
+    def _bind_seq(self, i, seq):
+        with self._lock:
+            self.legs.at[i, "Seq"] = seq
+            self._by_seq[seq] = i
+            order_id = self._early_acks.pop(seq, None)
+        if order_id is not None:
+            self.on_async_response(seq, order_id)
+
+    def _fail(self, i, error):
+        with self._lock:
+            self.legs.at[i, "Status"] = "error"
+            self.legs.at[i, "Error"] = error
+        self._check_done()
+
+    def on_async_response(self, seq, order_id):
+        with self._lock:
+            i = self._by_seq.get(seq)
+            if i is None:
+                if not self._done.is_set():
+                    self._remember(self._early_acks, seq, order_id)
+                return
+            self.legs.at[i, "OrderId"] = order_id
+            self._by_order[order_id] = i
+            record = self._early_orders.pop(order_id, None)
+        if record is not None:
+            self.on_order(record)
+
+    def on_order(self, record):
+        """record 为 OrderBook 中的委托记录"""
+        with self._lock:
+            i = self._by_order.get(record.get("order_id"))
+            if i is None:
+                if not self._done.is_set():
+                    self._remember(self._early_orders, record.get("order_id"), record)
+                return
+            self.legs.at[i, "Status"] = record.get("order_status")
+            if record.get("traded_volume") is not None:
+                self.legs.at[i, "TradedVolume"] = record["traded_volume"]
+            if record.get("order_status") == 57:
+                self.legs.at[i, "Error"] = record.get("status_msg")
+        self._check_done()
+
+    @staticmethod
+    def _remember(early, key, value):
+        early[key] = value
+        if len(early) > MAX_EARLY:
+            early.pop(next(iter(early)))
+
+    def _check_done(self):
+        with self._lock:
+            status = self.legs["Status"]
+            finished = status.isin(FINAL_STATUSES) | (status == "error") | (self.legs["Volume"] <= 0)
+            if finished.all():
+                self._finish()
+
+    def _finish(self):
+        if not self._done.is_set():
+            self.finished_at = time.time()
+            self._early_acks.clear()
+            self._early_orders.clear()
+            self._done.set()
+
+    # ---------- 查询 ----------
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """等待全部子委托进入终态"""
+        return self._done.wait(timeout)
+
+    def summary(self):
+        """子委托状态汇总"""
+        with self._lock:
+            legs = self.legs.copy()
+        return {
+            "legs": len(legs),
+            "submitted": int(legs["Seq"].notna().sum()),
+            "filled_volume": int(pd.to_numeric(legs["TradedVolume"], errors="coerce").fillna(0).sum()),
+            "errors": int((legs["Status"] == "error").sum() + (legs["Status"] == 57).sum()),
+            "done": self.done(),
+            "elapsed": (self.finished_at or time.time()) - self.created_at,
+        }
+
+
+def build_legs(codes, sides, volumes, prices):
+    """组装子委托表"""
+    legs = pd.DataFrame({
+        "StockCode": list(codes),
+        "Side": list(sides),
+        "Volume": np.asarray(volumes, dtype="int64"),
+        "Price": np.asarray(prices, dtype="float64"),
+    })
+    for col in ("Seq", "OrderId", "Status", "TradedVolume", "Error"):
+        legs[col] = None
+    legs = legs[legs["Volume"] > 0]
+    return legs[LEG_COLUMNS]
+
+
+def submit_basket(trader, basket, price_type, max_in_flight=10, ack_timeout=10.0):
+    """在后台线程中以受控并发提交篮子子委托
+
+    同时等待异步回报的委托不超过 max_in_flight 笔；某笔超过 ack_timeout 秒未回报时不再占用名额。
+
+    Args:
+        trader: MiniTrader 实例
+        basket: BasketOrder
+        price_type: 报价类型
+        max_in_flight: 最大在途（未收到异步回报）委托数
+        ack_timeout: 单笔等待异步回报的超时时间（秒）
+    """
+    slots = threading.BoundedSemaphore(max_in_flight)
+    pending = {}
+    acked = set()
+    pending_lock = threading.Lock()
+
+    def on_ack(seq):
+        with pending_lock:
+            if pending.pop(seq, None) is not None:
+                slots.release()
+            else:
+                acked.add(seq)
+
+    def run():
+        trader.add_ack_listener(on_ack)
+        try:
+            for i, leg in basket.legs.iterrows():
+                if not slots.acquire(timeout=ack_timeout):
+                    # 有委托迟迟没有回报，放弃等待最早的一笔，占用它的名额继续提交
+                    with pending_lock:
+                        if pending:
+                            seq = next(iter(pending))
+                            logger.warning(f"篮子委托 seq={seq} 超过 {ack_timeout}s 未回报")
+                            pending.pop(seq)
+                seq = trader.submit_order(leg["StockCode"], leg["Side"], int(leg["Volume"]),
+                                          price_type, float(leg["Price"]), basket.remark)
+                if seq is None or seq <= 0:
+                    slots.release()
+                    basket._fail(i, f"提交失败: {seq}")
+                    continue
+                with pending_lock:
+                    if seq in acked:
+                        acked.discard(seq)
+                        slots.release()
+                    else:
+                        pending[seq] = i
+                basket._bind_seq(i, seq)
+        except Exception as e:
+            logger.error(f"篮子委托提交异常: {e}")
+            # 没能提交的子委托记为失败，篮子才能结束
+            with basket._lock:
+                unsent = basket.legs.index[basket.legs["Seq"].isna() & basket.legs["Status"].isna()]
+            for i in unsent:
+                basket._fail(i, f"提交异常: {e}")
+        finally:
+            trader.remove_ack_listener(on_ack)
+            # 子委托全部提交失败时不会再有委托回报触发移除，在这里移除
+            if basket.done():
+                trader._remove_basket(basket)
+
+    thread = threading.Thread(target=run, name="basket-submit", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,495 @@
+# bench.py - 性能基准
+"""
+用合成数据给看板和交易热点路径计时，结果写成 JSON，便于前后两次运行对比。
+
+    python bench.py --scale small --out bench_small.json
+    python bench.py --scale large --data-dir D:\\bench --only log_search,qmtlog_signals
+    python bench.py --scale small --compare bench_small.json
+
+合成数据生成在 --data-dir 下，参数不变时直接复用（大规模日志生成本身很慢）。
+依赖 Streamlit 的模块（qmtlog_helper、logs_helper）导入失败时对应项记为 skipped。
+"""
+import os
+import sys
+import json
+import re
+import time
+import shutil
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# 数据规模：账户天数、每日成交数、main.log / tick.log 大小（MB，当前文件）、轮转日志天数、
+# 北交所股票数、模拟下单笔数
+SCALES = {
+    "small": dict(days=250, trades_per_day=50, main_mb=20, tick_mb=50, log_days=5, bj_codes=300, orders=2000),
+    "medium": dict(days=750, trades_per_day=200, main_mb=200, tick_mb=500, log_days=10, bj_codes=1000, orders=10000),
+    "large": dict(days=1250, trades_per_day=500, main_mb=1000, tick_mb=2000, log_days=30, bj_codes=3000, orders=50000),
+}
+
+STRATEGIES = ["网格", "动量", "反转", "打板", "手动触发"]
+LEVELS = ["INFO"] * 8 + ["WARNING", "ERROR"]
+
+
+def _codes(n, suffix, rng, start=600000):
+    return [f"{start + i:06d}.{suffix}" for i in rng.sample(range(100000), n)]
+
+
+# 日志中出现的代码（所有日志文件共用，搜索时用第一个作关键词）
+LOG_CODES = _codes(500, "SH", random.Random(0))
+
+
+# ---------- 数据生成 ----------
+def gen_account_data(data_dir, days, trades_per_day, seed=0):
+    """生成 account_positions / trades_orders 两个目录的每日 JSON（与 AccountUpdater 的输出格式一致）"""
+    rng = random.Random(seed)
+    codes = _codes(200, "SH", rng)
+    for sub in ("account_positions", "trades_orders"):
+        os.makedirs(os.path.join(data_dir, sub), exist_ok=True)
+    day = datetime(2020, 1, 2)
+    total = 1000000.0
+    order_id = 1
+    written = 0
+    while written < days:
+        if day.weekday() >= 5:
+            day += timedelta(days=1)
+            continue
+        date_str = day.strftime("%Y%m%d")
+        total *= 1 + rng.gauss(0.0005, 0.012)
+        positions = [
+            {"证券代码": c, "持仓数量": 100 * rng.randint(1, 50), "可用数量": 100, "冻结数量": 0,
+             "开仓价格": round(rng.uniform(5, 50), 2), "持仓市值": round(rng.uniform(1e4, 1e5), 2),
+             "在途股份": 0, "昨夜持股": 100}
+            for c in rng.sample(codes, 20)
+        ]
+        account = {"account_info": {"总资产": total, "持仓市值": total * 0.7, "可用资金": total * 0.3, "冻结资金": 0.0},
+                   "positions": positions, "timestamp": f"{day:%Y-%m-%d} 15:30:00"}
+        trades = []
+        for _ in range(trades_per_day):
+            code = rng.choice(codes)
+            volume = 100 * rng.randint(1, 20)
+            price = round(rng.uniform(5, 50), 2)
+            strategy = rng.choice(STRATEGIES)
+            trades.append({
+                "StockCode": code, "Volume": volume, "Price": price, "Value": round(volume * price, 2),
+                "TradeType": rng.choice([23, 24]), "Strategy": strategy, "Remark": f"{strategy}_{code}",
+                "OrderId": order_id, "TradeId": str(order_id),
+                "TradeTime": f"{rng.randint(9, 14):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+            })
+            order_id += 1
+        with open(os.path.join(data_dir, "account_positions", f"{date_str}.json"), "w", encoding="utf-8") as f:
+            json.dump(account, f, ensure_ascii=False)
+        with open(os.path.join(data_dir, "trades_orders", f"{date_str}.json"), "w", encoding="utf-8") as f:
+            json.dump({"orders": [], "trades": trades, "timestamp": account["timestamp"]}, f, ensure_ascii=False)
+        written += 1
+        day += timedelta(days=1)
+
+
+def _log_line(ts, rng, codes, kind):
+    """一行与 logger.py 格式一致的日志；kind 为 main 时约 2% 是交易信号"""
+    stamp = ts.strftime("%Y-%m-%d %H:%M:%S") + f",{rng.randint(0, 999):03d}"
+    code = rng.choice(codes)
+    if kind == "tick":
+        price = rng.uniform(5, 50)
+        return (f"{stamp} - INFO - tick {code} 最新价: {price:.2f} 买一: {price - 0.01:.2f} "
+                f"卖一: {price + 0.01:.2f} 成交量: {rng.randint(100, 1000000)}\n")
+    r = rng.random()
+    strategy = rng.choice(STRATEGIES)
+    if r < 0.01:
+        return (f"{stamp} - INFO - [{strategy}] {code} 触发买入信号 价格: {rng.uniform(5, 50):.2f} "
+                f"阈值: {rng.uniform(5, 50):.2f}\n")
+    if r < 0.02:
+        return (f"{stamp} - INFO - [{strategy}] {code} 触发卖出信号 价格: {rng.uniform(5, 50):.2f} "
+                f"阈值: {rng.uniform(5, 50):.2f}\n")
+    if r < 0.05:
+        return f"{stamp} - INFO - 委托回调 {strategy}_{code}\n"
+    return f"{stamp} - {rng.choice(LEVELS)} - [{strategy}] 检查 {code} 条件未满足，当前价 {rng.uniform(5, 50):.2f}\n"
+
+
+def gen_log_file(path, size_mb, day, kind, seed=0):
+    """生成约 size_mb 的日志文件，时间戳在 day 当天 09:15 ~ 15:00 之间单调递增"""
+    rng = random.Random(seed)
+    codes = LOG_CODES
+    target = int(size_mb * 1024 * 1024)
+    start = datetime.combine(day, datetime.min.time()) + timedelta(hours=9, minutes=15)
+    span = 5.75 * 3600
+    # 先估计行数，让时间戳覆盖整个交易时段
+    sample = sum(len(_log_line(start, rng, codes, kind).encode("utf-8")) for _ in range(200)) / 200
+    lines = max(int(target / sample), 1)
+    step = span / lines
+    written = 0
+    i = 0
+    with open(path, "w", encoding="utf-8") as f:
+        buf = []
+        while written < target:
+            line = _log_line(start + timedelta(seconds=i * step), rng, codes, kind)
+            buf.append(line)
+            written += len(line.encode("utf-8"))
+            i += 1
+            if len(buf) >= 10000:
+                f.write("".join(buf))
+                buf = []
+        f.write("".join(buf))
+
+
+def gen_log_dir(log_dir, main_mb, tick_mb, log_days, today):
+    """当前 main.log / tick.log 加上 log_days 天的按日轮转文件（轮转文件大小与当前文件相同）"""
+    os.makedirs(log_dir, exist_ok=True)
+    for kind, size in (("main", main_mb), ("tick", tick_mb)):
+        gen_log_file(os.path.join(log_dir, f"{kind}.log"), size, today, kind, seed=0)
+        for d in range(1, log_days + 1):
+            day = today - timedelta(days=d)
+            gen_log_file(os.path.join(log_dir, f"{kind}.log.{day:%Y%m%d}"), size, day, kind, seed=d)
+
+
+def gen_bj_universe(n_codes, date_str="20250102", last_date="20241231", seed=0):
+    """与 DataManager.get_local_daily_data 返回结构一致的 {代码: 单日日线 DataFrame}"""
+    rng = np.random.default_rng(seed)
+    codes = [f"{830000 + i:06d}.BJ" for i in range(n_codes)]
+    close = rng.uniform(5, 50, n_codes)
+    pre_close = close / (1 + rng.normal(0, 0.03, n_codes))
+    today, last = {}, {}
+    for i, code in enumerate(codes):
+        today[code] = pd.DataFrame({
+            "code": [code], "open": [pre_close[i]], "close": [close[i]], "high": [close[i] * 1.02],
+            "low": [close[i] * 0.98], "volume": [rng.integers(1e4, 1e7)], "amount": [rng.uniform(1e6, 1e9)],
+        }, index=[date_str])
+        last[code] = pd.DataFrame({"code": [code], "close": [pre_close[i]]}, index=[last_date])
+    return today, last
+
+
+def prepare(data_dir, scale):
+    """生成（或复用）指定规模的数据，返回各数据路径"""
+    params = SCALES[scale]
+    root = os.path.join(data_dir, scale)
+    marker = os.path.join(root, "_params.json")
+    today = datetime(2025, 1, 2).date()
+    paths = {"account": os.path.join(root, "account"), "logs": os.path.join(root, "logs"), "today": today}
+    if os.path.exists(marker):
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == params:
+                return paths
+        shutil.rmtree(root)
+    print(f"生成 {scale} 规模数据到 {root} ...", file=sys.stderr)
+    gen_account_data(paths["account"], params["days"], params["trades_per_day"])
+    gen_log_dir(paths["logs"], params["main_mb"], params["tick_mb"], params["log_days"], today)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return paths
+
+
+# ---------- 计时 ----------
+def measure(fn, repeat=3, setup=None):
+    """运行 repeat 次（每次前调用 setup），返回耗时统计（秒）和最后一次的返回值"""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    return {
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.mean(runs),
+        "max": max(runs),
+    }, result
+
+
+def _dir_bytes(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+
+# ---------- 基准项 ----------
+def bench_history_trades(paths, params, repeat):
+    """盘后视图的历史成交读取路径：快照库读取和 SQLite 索引刷新"""
+    import postmarket_helper
+    from snapshot_store import sync_store
+    from trade_index import TradeIndex, INDEX_NAME
+    data_dir = paths["account"]
+    # 首次运行时先把 JSON 导入快照库（不计时）
+    store = sync_store(data_dir)
+    read, rows = measure(lambda: postmarket_helper.read_store_trades(store), repeat)
+
+    index_path = os.path.join(data_dir, INDEX_NAME)
+
+    def reset():
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    def rebuild():
+        index = TradeIndex(data_dir)
+        try:
+            return index.refresh(store)
+        finally:
+            index.conn.close()
+
+    cold, days = measure(rebuild, repeat, setup=reset)
+    # 索引已是最新：只比较日期版本号
+    warm, _ = measure(rebuild, repeat)
+    return {"read": read, "index_cold": cold, "index_warm": warm, "days": days, "rows": len(rows)}
+
+
+def bench_equity_curve(paths, params, repeat):
+    import equity_curve
+    from snapshot_store import sync_store
+    data_dir = paths["account"]
+    # 曲线从快照库读取，首次运行时先把 JSON 导入快照库（不计时）
+    store = sync_store(data_dir)
+
+    def reset():
+        equity_curve._memo.clear()
+        for name in (equity_curve.STATE_NAME, equity_curve.CURVE_NAME):
+            path = os.path.join(data_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    cold, curve = measure(lambda: equity_curve.refresh_equity_curve(data_dir, store), repeat, setup=reset)
+    # 进程重启后：状态文件还在，内存缓存为空
+    restart, _ = measure(lambda: equity_curve.refresh_equity_curve(data_dir, store), repeat,
+                         setup=equity_curve._memo.clear)
+    warm, _ = measure(lambda: equity_curve.refresh_equity_curve(data_dir, store), repeat)
+    return {"cold": cold, "restart": restart, "warm": warm, "rows": len(curve)}
+
+
+def bench_qmtlog_signals(paths, params, repeat):
+    from qmtlog_helper import SignalTailer
+    log_file = os.path.join(paths["logs"], "main.log")
+
+    def cold():
+        tailer = SignalTailer(log_file)
+        tailer.poll()
+        return tailer
+
+    cold_stats, tailer = measure(cold, repeat)
+    # 增量：末尾追加 1000 行后只解析新内容（测试结束后截回原长度）
+    size = os.path.getsize(log_file)
+    with open(log_file, "rb") as f:
+        f.seek(max(size - 64 * 1024, 0))
+        block = f.read().splitlines(keepends=True)[-1000:]
+    try:
+        def incremental():
+            with open(log_file, "ab") as f:
+                f.writelines(block)
+            return tailer.poll()
+        inc_stats, _ = measure(incremental, repeat)
+    finally:
+        with open(log_file, "r+b") as f:
+            f.truncate(size)
+    return {"cold": cold_stats, "incremental_1000_lines": inc_stats,
+            "signals": len(tailer.frame()), "bytes": size}
+
+
+def bench_log_search(paths, params, repeat):
+    from logs_helper import get_log_files_in_date_range, read_log_tail, filter_logs_by_time
+    from log_index import TimeIndex, read_log_range
+    from log_search import TokenIndex, search_logs, open_cursor
+    from log_grep import grep_lines
+    from log_blocks import compress_log
+    today = paths["today"]
+    start = today - timedelta(days=params["log_days"])
+    start_time = datetime.combine(start, datetime.min.time())
+    end_time = datetime.combine(today, datetime.max.time())
+    # 当前文件中的一个小时
+    hour_start = datetime.combine(today, datetime.min.time()) + timedelta(hours=10)
+    hour_end = hour_start + timedelta(minutes=59, seconds=59)
+    result = {}
+    for kind in ("main", "tick"):
+        files = get_log_files_in_date_range(paths["logs"], kind, start, today)
+
+        def build_index():
+            with tempfile.TemporaryDirectory() as index_dir:
+                for file in files:
+                    TimeIndex(file, index_dir=index_dir).refresh()
+
+        def build_token_index():
+            with tempfile.TemporaryDirectory() as index_dir:
+                for file in files:
+                    TokenIndex(file, index_dir=index_dir).refresh()
+
+        build, _ = measure(build_index, repeat)
+        token_build, _ = measure(build_token_index, repeat)
+        stats, lines = measure(lambda: read_log_range(files, start_time, end_time, LOG_CODES[0]), repeat)
+        grep, grep_hits = measure(lambda: grep_lines(files, LOG_CODES[0], start_time, end_time), repeat)
+        pattern = re.escape(LOG_CODES[0]) + " .*(买入|卖出)"
+        regex, regex_lines = measure(lambda: grep_lines(files, pattern, start_time, end_time, regex=True), repeat)
+        # 先建好索引（数据目录下的 .index），只计查询耗时
+        search_logs(files, start_time, end_time, LOG_CODES[0])
+        indexed, indexed_lines = measure(lambda: search_logs(files, start_time, end_time, LOG_CODES[0]), repeat)
+        # 结果游标：只统计总数；分散跳转 5 页（每页 500 行）
+        count, total = measure(lambda: open_cursor(files, start_time, end_time, "info").total(), repeat)
+        cursor = open_cursor(files, start_time, end_time, "info")
+        jumps = [total // 500 * k // 5 for k in range(5)]
+        page, _ = measure(lambda: [cursor.page(number, 500) for number in jumps], repeat)
+        hour, hour_lines = measure(lambda: read_log_range(files, hour_start, hour_end), repeat)
+        tail, _ = measure(lambda: filter_logs_by_time(read_log_tail(files[0], 200), start_time, end_time), repeat)
+        # 轮转文件分块压缩后（副本）的关键词扫描
+        with tempfile.TemporaryDirectory() as gz_dir:
+            packed = files[:1] + [compress_log(shutil.copy(file, gz_dir)) for file in files[1:]]
+            gz_grep, gz_hits = measure(lambda: grep_lines(packed, LOG_CODES[0], start_time, end_time), repeat)
+            gz_bytes = _dir_bytes(packed)
+        result[kind] = {"index_build": build, "token_index_build": token_build, "keyword": stats,
+                        "keyword_grep": grep, "keyword_indexed": indexed, "keyword_grep_compressed": gz_grep,
+                        "regex": regex,
+                        "broad_count": count, "broad_5_pages": page,
+                        "one_hour": hour, "tail": tail, "files": len(files), "matches": len(lines),
+                        "grep_matches": len(grep_hits), "indexed_matches": len(indexed_lines),
+                        "regex_matches": len(regex_lines), "broad_matches": total, "hour_lines": len(hour_lines),
+                        "compressed_matches": len(gz_hits), "bytes": _dir_bytes(files), "compressed_bytes": gz_bytes}
+    return result
+
+
+def bench_bj_ranking(paths, params, repeat):
+    from ranking_helper import build_ranking
+    today, last = gen_bj_universe(params["bj_codes"])
+    required = ['code', 'open', 'close', 'high', 'low', 'volume', 'amount']
+    stats, df = measure(lambda: build_ranking(today, last, required), repeat)
+    return {"build": stats, "codes": params["bj_codes"], "rows": len(df)}
+
+
+def bench_order_submit(paths, params, repeat):
+    """MiniTrader 在模拟券商上的下单吞吐和委托生命周期延迟"""
+    import config
+    config.BROKER = "paper"
+    n = params["orders"]
+    codes = [f"{600000 + i:06d}.SH" for i in range(50)]
+    # 卖出需要可卖持仓：每个代码预置足够卖完全部委托的底仓
+    config.PAPER_BROKER = dict(config.PAPER_BROKER, ack_latency=("const", 0.0), accept_latency=("const", 0.0),
+                               cash=1e12, positions={code: (n * 100, 10.0) for code in codes})
+    import broker
+    if broker.BROKER != "paper":
+        return {"skipped": "broker 模块已按 qmt 导入"}
+    from mini_trader import MiniTrader
+    import logging
+    # 每笔委托都会写 main 日志：基准期间静音，不写入仓库的 logs/main.log 和控制台，也不计入耗时
+    main_log = logging.getLogger("main")
+    main_log.disabled = True
+    try:
+        return _order_submit(broker, MiniTrader, codes, n, repeat)
+    finally:
+        main_log.disabled = False
+
+
+def _order_submit(broker, MiniTrader, codes, n, repeat):
+    for code in codes:
+        broker.xtdata.push_tick(code, {"time": time.time() * 1000, "lastPrice": 10.0, "bidPrice": [9.99],
+                                       "askPrice": [10.01], "bidVol": [0], "askVol": [0], "volume": 0})
+    trader = MiniTrader("bench", "bench")
+    trader.connect()
+
+    def submit():
+        # 通过策略使用的公开接口下单（含本地资金/可卖数量检查和预扣），买卖交替
+        for i in range(n):
+            code = codes[i % len(codes)]
+            if i % 2:
+                trader.sell_stock(code, 100, broker.xtconstant.FIX_PRICE, 9.99, "bench")
+            else:
+                trader.buy_stock(code, 100, broker.xtconstant.FIX_PRICE, 10.01, "bench")
+
+    stats, _ = measure(submit, repeat)
+    deadline = time.time() + 60
+    while trader.lifecycle.pending() and time.time() < deadline:
+        time.sleep(0.05)
+    latency = trader.lifecycle.frame().to_dict("records")
+    trader.close()
+    trader.trader.stop()
+    return {"submit": stats, "orders": n, "orders_per_second": n / stats["median"], "lifecycle": latency,
+            "events": trader.bus.stats()}
+
+
+BENCHMARKS = {
+    "history_trades": bench_history_trades,
+    "equity_curve": bench_equity_curve,
+    "qmtlog_signals": bench_qmtlog_signals,
+    "log_search": bench_log_search,
+    "bj_ranking": bench_bj_ranking,
+    "order_submit": bench_order_submit,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return None
+
+
+def run(scale="small", data_dir=None, only=None, repeat=3):
+    data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data")
+    paths = prepare(data_dir, scale)
+    params = SCALES[scale]
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        print(f"运行 {name} ...", file=sys.stderr)
+        try:
+            results[name] = fn(paths, params, repeat)
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+    return {
+        "meta": {
+            "scale": scale,
+            "params": params,
+            "repeat": repeat,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def _medians(node, prefix=""):
+    """展开结果中所有计时项的中位数：{"log_search.main.keyword": 秒}"""
+    found = {}
+    if isinstance(node, dict):
+        if "median" in node and "runs" in node:
+            found[prefix] = node["median"]
+        else:
+            for key, value in node.items():
+                found.update(_medians(value, f"{prefix}.{key}" if prefix else key))
+    return found
+
+
+def compare(old, new):
+    """逐项对比两次结果的中位数，返回 [(项目, 旧, 新, 新/旧)]"""
+    before, after = _medians(old["results"]), _medians(new["results"])
+    return [(k, before[k], after[k], after[k] / before[k] if before[k] else None)
+            for k in sorted(after) if k in before]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="看板与交易路径性能基准")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--data-dir", default=None, help="合成数据目录，默认 ./bench_data")
+    parser.add_argument("--only", default="", help="逗号分隔的基准项：" + ",".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=None, help="结果 JSON 路径，默认输出到标准输出")
+    parser.add_argument("--compare", default=None, help="与之前的结果 JSON 对比")
+    args = parser.parse_args()
+
+    report = run(args.scale, args.data_dir, [s for s in args.only.split(",") if s], args.repeat)
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        for name, before, after, ratio in compare(previous, report):
+            flag = "  <-- 变慢" if ratio and ratio > 1.2 else ""
+            print(f"{name:40s} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  x{ratio:.2f}{flag}",
+                  file=sys.stderr)
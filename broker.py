@@ -0,0 +1,22 @@
+# broker.py - 券商接口选择
+"""
+按 config.BROKER 导出 XtQuantTrader / XtQuantTraderCallback / StockAccount / xtconstant / xtdata，
+MiniTrader、AccountUpdater 和 QuoteService 从这里导入，切换到模拟券商时代码不用改。
+"""
+from config import BROKER, PAPER_BROKER
+
+if BROKER == "paper":
+    from paper_broker import PaperMarket, PaperTrader, XtQuantTraderCallback, StockAccount, xtconstant
+
+    # 所有模拟账户共享同一个行情源
+    xtdata = PaperMarket(PAPER_BROKER.get("quote_file"), PAPER_BROKER.get("replay_speed", 0.0))
+    if xtdata.path:
+        xtdata.start()
+
+    def XtQuantTrader(path, session_id):
+        return PaperTrader(path, session_id, market=xtdata, config=PAPER_BROKER)
+else:
+    from xtquant.xttrader import XtQuantTrader, XtQuantTraderCallback
+    from xtquant.xttype import StockAccount
+    from xtquant import xtconstant
+    from xtquant import xtdata
@@ -35,4 +35,16 @@ def get_xueqiu_link(stock_code: str) -> str:
     elif market == 'SH':
         return f"https://xueqiu.com/S/SH{code}"
     else:
-        return f"https://xueqiu.com/S/{market}{code}"
\ No newline at end of file
+        return f"https://xueqiu.com/S/{market}{code}"
+
+def get_xueqiu_links(stock_codes):
+    """
+    批量将股票代码转换为雪球网链接（向量化，结果与 get_xueqiu_link 一致）
+
+    Args:
+        stock_codes: pd.Series，格式如 "835368.BJ"
+
+    Returns:
+        pd.Series: 雪球网链接
+    """
+    return "https://xueqiu.com/S/" + stock_codes.str[7:] + stock_codes.str[:6]
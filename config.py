@@ -5,6 +5,53 @@ import datetime
 DEFAULT_PATH = r"D:\Apps\ZJ_QMT3\userdata_mini"
 DEFAULT_ACCOUNT = "6681802088"
 
+# 账户数据目录（AccountUpdater 每日落盘的位置）
+ACCOUNT_DATA_DIR = r"D:\Users\Jack\myqmt_admin\data\account"
+
+# miniQMT 策略日志目录（main.log / tick.log 及其按日轮转文件）
+QMT_LOG_DIR = r"D:\Users\Jack\xtquant\logs"
+
+# 日志索引目录（稀疏时间索引等），为空时放在日志目录下的 .index
+LOG_INDEX_DIR = None
+
+# 日志搜索结果导出目录，为空时为系统临时目录下的 qmt_log_exports；超过 LOG_EXPORT_MAX_AGE 秒的导出文件自动清理
+LOG_EXPORT_DIR = None
+LOG_EXPORT_MAX_AGE = 6 * 3600
+
+# 日志全文扫描的进程数，None 为 CPU 核数，1 表示在页面进程内扫描
+LOG_SEARCH_WORKERS = None
+
+# logger.py 的日志文件是否写 JSON 行（ts/level/event/code/strategy/order_id/latency/msg），终端输出不受影响
+LOG_STRUCTURED = False
+
+# 异步日志队列长度，写线程跟不上、队列满时丢弃新日志并计数
+LOG_QUEUE_SIZE = 10000
+
+# 账户快照轮询间隔（秒）
+POLL_INTERVAL = 15
+
+# 除持仓外额外订阅实时行情的代码
+WATCHLIST = []
+
+# 性能埋点开关（关闭后埋点装饰器直接返回原函数）
+METRICS_ENABLED = True
+
+# Prometheus 文本格式端点端口，None 表示不启动
+METRICS_PORT = None
+
+# 券商接口："qmt" 使用 miniQMT 终端，"paper" 使用进程内模拟券商（见 paper_broker.py）
+BROKER = "qmt"
+
+# 模拟券商参数，未列出的项使用 paper_broker.DEFAULT_CONFIG
+PAPER_BROKER = {
+    "cash": 1000000.0,
+    "quote_file": None,
+    "ack_latency": ("lognormal", -5.0, 0.5),
+    "accept_latency": ("lognormal", -4.0, 0.5),
+    "reject_rate": 0.0,
+    "seed": 0,
+}
+
 # 页面配置
 PAGE_CONFIG = {
     "page_title": "Quant Ops Dashboard",
@@ -19,6 +66,7 @@ LINKS = [
     ("日志查询", "3_logs"),
     ("策略配置", "1_strategies"),
     ("系统设置", "4_setting"),
+    ("性能监控", "7_performance"),
 ]
 
 # 版权信息
@@ -1,7 +1,8 @@
 # dashboard.py - 量化后台主页 v0.2
 import datetime, streamlit as st
-from config import DEFAULT_PATH, DEFAULT_ACCOUNT, LINKS, get_footer_text
-from trader import get_trader
+from config import DEFAULT_PATH, DEFAULT_ACCOUNT, LINKS, METRICS_PORT, get_footer_text
+import metrics
+from trader import get_poller
 from premarket import render_premarket_view
 from trading import render_trading_view
 from postmarket import render_postmarket_view
@@ -20,14 +21,35 @@ st.set_page_config(
     }
 )
 
+# Prometheus 文本格式端点（config.METRICS_PORT 为空时不启动）
+if METRICS_PORT:
+    metrics.serve(METRICS_PORT)
+
 # 侧边栏配置
 with st.sidebar:
     st.header("⚙️ 连接配置")
     path = st.text_input("安装路径", DEFAULT_PATH)
     account_id = st.text_input("账号", DEFAULT_ACCOUNT)
     if st.button("🔄 重新连接"):
-        get_trader.clear()
-        st.toast("下次调用将重新连接")
+        if get_poller(path, account_id).reconnect():
+            st.toast("已重新连接")
+        else:
+            st.toast("连接失败，请确认 miniQMT 终端已运行并登录")
+
+    # 快照轮询状态，用于调整刷新节奏
+    stats = get_poller(path, account_id).stats()
+    staleness = stats["staleness"]
+    st.caption(
+        f"快照 v{stats['version']} · 刷新耗时 {stats['latency'] * 1000:.0f} ms · "
+        f"数据延迟 {staleness:.0f} s" if staleness is not None else "快照尚未就绪"
+    )
+    if stats["errors"]:
+        st.caption(f"刷新失败 {stats['errors']} 次：{stats['last_error']}")
+    for consumer in stats["events"]:
+        st.caption(
+            f"回调队列 {consumer['name']} · 积压 {consumer['backlog']} · "
+            f"延迟 {consumer['last_lag'] * 1000:.1f} ms · 丢弃 {consumer['dropped']}"
+        )
 
 # 页面上半区
 top = st.container()
@@ -50,7 +72,7 @@ with top:
 st.divider()
 st.markdown("## 🔗 功能索引 / 快捷入口")
 
-link_cols = st.columns(4)
+link_cols = st.columns(len(LINKS))
 for col, (label, url) in zip(link_cols, LINKS):
     with col:
         st.page_link(url, label=label, icon="➡️")
@@ -0,0 +1,129 @@
+# equity_curve.py - 总资产走势的增量物化
+"""
+把快照库（snapshot_store）account 表中的逐日资产汇总成一条持久化的资产曲线。
+
+状态里记录曲线对应的各日期版本号和真实交易日：快照库版本号没有变化时直接复用曲线；
+有新增、改写或删除的日期时，保留最早变化日期之前的部分，只从快照库读取该日期之后的资产追加。
+曲线本身（按自然日插值、含日收益率）也落盘缓存，进程重启后不需要重新读取全部分区。
+"""
+import os
+import json
+import threading
+import pandas as pd
+from snapshot_store import open_store
+
+STATE_NAME = "equity_curve_state.json"
+CURVE_NAME = "equity_curve.parquet"
+VALUE_COLUMNS = ["总资产", "持仓市值", "可用资金"]
+CURVE_COLUMNS = VALUE_COLUMNS + ["日收益率"]
+
+# 进程内缓存：data_dir -> (state, 曲线)
+_memo = {}
+_lock = threading.Lock()
+
+
+def _load_state(state_path):
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if "versions" in state:
+                return state
+        except Exception:
+            pass
+    return None
+
+
+def _save_state(state_path, state):
+    tmp = state_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, state_path)
+
+
+def _empty_curve():
+    return pd.DataFrame(columns=CURVE_COLUMNS, index=pd.DatetimeIndex([], name="date"), dtype="float64")
+
+
+def _build_curve(rows):
+    """由逐日资产（date + VALUE_COLUMNS）生成按自然日插值的资产曲线"""
+    rows = rows.dropna(subset=["总资产", "持仓市值"])
+    if rows.empty:
+        return _empty_curve()
+
+    df = rows[VALUE_COLUMNS].astype("float64")
+    df.index = pd.DatetimeIndex(pd.to_datetime(rows["date"].astype(str), format="%Y%m%d"), name="date")
+    df = df.sort_index()
+
+    # 日收益率只在真实交易日之间计算，再补全自然日并线性插值用于绘图
+    df["日收益率"] = df["总资产"].pct_change()
+    all_days = pd.date_range(df.index.min(), df.index.max(), freq="D", name="date")
+    df = df.reindex(all_days)
+    df[VALUE_COLUMNS] = df[VALUE_COLUMNS].interpolate(method="linear")
+    return df[CURVE_COLUMNS]
+
+
+def _extend_curve(curve, rows):
+    """在已有曲线后追加逐日资产：以曲线最后一个真实交易日为起点生成新的一段再拼接"""
+    if curve.empty:
+        return _build_curve(rows)
+    seed = curve.iloc[[-1]][VALUE_COLUMNS].copy()
+    seed.insert(0, "date", seed.index.strftime("%Y%m%d"))
+    tail = _build_curve(pd.concat([seed.reset_index(drop=True), rows], ignore_index=True))
+    return pd.concat([curve, tail.iloc[1:]])
+
+
+def refresh_equity_curve(data_dir, store=None):
+    """增量更新并返回资产曲线
+
+    Args:
+        data_dir: 账户数据目录，曲线缓存保存在这里
+        store: 快照库，None 时使用 data_dir 下的共享快照库（调用方负责 sync_store）
+
+    Returns:
+        pd.DataFrame: 以自然日为索引，列为 总资产/持仓市值/可用资金/日收益率
+    """
+    store = store or open_store(data_dir)
+    state_path = os.path.join(data_dir, STATE_NAME)
+    curve_path = os.path.join(data_dir, CURVE_NAME)
+    versions = store.versions("account")
+
+    with _lock:
+        state, curve = _memo.get(data_dir, (None, None))
+        if state is None:
+            state = _load_state(state_path)
+            if state is not None and os.path.exists(curve_path):
+                try:
+                    curve = pd.read_parquet(curve_path)
+                except Exception:
+                    state = None
+        if state is None or curve is None:
+            state, curve = {"versions": {}, "dates": []}, _empty_curve()
+
+        known = state["versions"]
+        changed = [d for d, v in versions.items() if known.get(d) != v]
+        changed += [d for d in known if d not in versions]
+        if not changed:
+            _memo[data_dir] = (state, curve)
+            return curve
+
+        # 保留最早变化日期之前的真实交易日（及其间的插值），其后的部分从快照库重新读取
+        start = min(changed)
+        kept = [d for d in state["dates"] if d < start]
+        if kept:
+            curve = curve.loc[:pd.Timestamp(kept[-1])]
+        else:
+            curve = _empty_curve()
+        rows = store.read("account", columns=VALUE_COLUMNS, start=start)
+        curve = _extend_curve(curve, rows)
+
+        valid = rows.dropna(subset=["总资产", "持仓市值"])["date"].astype(str)
+        state = {"versions": dict(versions), "dates": kept + sorted(valid.unique().tolist())}
+        try:
+            curve.to_parquet(curve_path)
+            _save_state(state_path, state)
+        except Exception:
+            # 缓存写入失败不影响展示，下次会重新物化
+            pass
+        _memo[data_dir] = (state, curve)
+        return curve
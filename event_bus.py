@@ -0,0 +1,201 @@
+# event_bus.py - 回调事件总线
+"""
+xtquant 的回调线程只负责把事件放进队列，日志、状态更新等工作由各消费者线程处理，
+避免回调里的格式化日志和状态更新拖慢终端的事件推送。
+
+- 事件是 (kind, 到达时间, 对象) 三元组
+- 每个消费者一个有界队列（collections.deque），入队、丢弃和出队在消费者自己的锁内完成，
+  锁里只有计数和 deque 操作，不会因为处理器慢而阻塞回调线程
+- 队列满时按消费者的策略处理：drop_oldest 丢最早的，drop_newest 丢新来的；
+  丢弃后可以回调 on_overflow（例如让委托簿重新对账）
+- 每个消费者记录处理数、丢弃数、积压和延迟（事件到达到处理完成）
+"""
+import time
+import threading
+from collections import deque
+from logger import logger
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+class Consumer:
+    """单个消费者：一个有界队列 + 一个后台线程，按到达顺序处理事件"""
+
+    def __init__(self, name, handler, maxsize=10000, overflow=DROP_OLDEST, on_overflow=None, kinds=None):
+        self.name = name
+        self.handler = handler
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.on_overflow = on_overflow
+        # 只接收这些类型的事件，None 表示全部
+        self.kinds = set(kinds) if kinds else None
+        self.queue = deque()
+        self._lock = threading.Lock()
+        # 已出队但处理器还没返回的事件数
+        self._in_flight = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"bus-{name}", daemon=True)
+
+    def offer(self, event):
+        """放入事件（回调线程调用，不阻塞）"""
+        if self.kinds is not None and event[0] not in self.kinds:
+            return
+        overflowed = False
+        with self._lock:
+            if len(self.queue) >= self.maxsize:
+                self.dropped += 1
+                overflowed = True
+                if self.overflow == DROP_OLDEST:
+                    self.queue.popleft()
+                    self.queue.append(event)
+            else:
+                self.queue.append(event)
+        if overflowed:
+            self._overflowed()
+        self._wakeup.set()
+
+    def _overflowed(self):
+        if self.on_overflow:
+            try:
+                self.on_overflow()
+            except Exception:
+                pass
+
+    def _run(self):
+        queue = self.queue
+        while not self._stop.is_set():
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    if not queue:
+                        break
+                    event = queue.popleft()
+                    self._in_flight += 1
+                try:
+                    self.handler(event)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"事件处理失败 [{self.name}] {event[0]}: {e}")
+                with self._lock:
+                    self.processed += 1
+                    self._in_flight -= 1
+                self.last_lag = time.monotonic() - event[1]
+                if self.last_lag > self.max_lag:
+                    self.max_lag = self.last_lag
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _idle(self):
+        with self._lock:
+            return not self.queue and not self._in_flight
+
+    def drain(self, timeout=5.0):
+        """等待队列清空且最后一个事件处理完（测试和退出时使用）"""
+        deadline = time.monotonic() + timeout
+        while not self._idle() and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return self._idle()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "backlog": len(self.queue),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+        }
+
+
+class EventBus:
+    """事件总线：一次发布，分发给全部消费者"""
+
+    def __init__(self):
+        self.consumers = []
+        self.published = 0
+
+    def add_consumer(self, name, handler, **kwargs):
+        """注册消费者并启动其线程，参数见 Consumer"""
+        consumer = Consumer(name, handler, **kwargs).start()
+        self.consumers.append(consumer)
+        return consumer
+
+    def publish(self, kind, obj=None):
+        event = (kind, time.monotonic(), obj)
+        self.published += 1
+        for consumer in self.consumers:
+            consumer.offer(event)
+
+    def drain(self, timeout=5.0):
+        return all(c.drain(timeout) for c in self.consumers)
+
+    def stop(self):
+        for consumer in self.consumers:
+            consumer.stop()
+
+    def stats(self):
+        return [c.stats() for c in self.consumers]
+
+
+def stress(events=100000, consumers=2, handler_cost=0.0):
+    """用合成回调压测：发布 events 个事件，返回发布/消费吞吐和延迟
+
+    Args:
+        events: 事件数
+        consumers: 消费者数
+        handler_cost: 每个事件的模拟处理耗时（秒）
+    """
+    from types import SimpleNamespace
+
+    def handler(event):
+        if handler_cost:
+            time.sleep(handler_cost)
+
+    bus = EventBus()
+    for i in range(consumers):
+        bus.add_consumer(f"c{i}", handler, maxsize=events)
+    samples = [
+        ("order", SimpleNamespace(order_id=1, order_status=50, order_remark="stress")),
+        ("trade", SimpleNamespace(order_id=1, traded_volume=100, traded_price=10.0, offset_flag=48,
+                                  order_remark="stress")),
+        ("async_response", SimpleNamespace(seq=1, order_id=1, order_remark="stress")),
+    ]
+    started = time.perf_counter()
+    for i in range(events):
+        kind, obj = samples[i % 3]
+        bus.publish(kind, obj)
+    published = time.perf_counter() - started
+    bus.drain(timeout=60)
+    consumed = time.perf_counter() - started
+    bus.stop()
+    return {
+        "events": events,
+        "publish_rate": events / published,
+        "consume_rate": events / consumed,
+        "consumers": bus.stats(),
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    parser = argparse.ArgumentParser(description="事件总线压测")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--consumers", type=int, default=2)
+    args = parser.parse_args()
+    print(json.dumps(stress(args.events, args.consumers), ensure_ascii=False, indent=2))
@@ -0,0 +1,258 @@
+# log_blocks.py - 轮转日志的分块压缩
+"""
+把已轮转的日志（main.log.YYYYMMDD 等）压缩成 <文件名>.gz：
+
+- 按行切成约 BLOCK_SIZE 字节的块，每块单独压缩成一个 gzip 成员，依次拼接。
+  文件仍是标准 gzip，可以直接用 zcat / gzip.open 读取。
+- 末尾追加一个内容为空的 gzip 成员，块索引（每块的原始位置、压缩位置）以 JSON 写在它的注释字段里
+- 按原始字节位置读取时只解压覆盖到的块（BlockReader 提供 seek / read / readline），
+  时间索引、倒排索引、全文扫描和信号增量读取都按原始位置工作，不需要关心文件是否压缩
+- 块索引中记录原文件的标识（st_dev, st_ino），增量读取器可以据此找到压缩后的轮转文件
+
+压缩只处理日期后缀早于昨天的轮转文件：最近一个轮转文件保持原样，增量读取器还要把它剩余的部分读完。
+命令行：python log_blocks.py <日志目录>
+"""
+import os
+import re
+import sys
+import json
+import zlib
+import gzip
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+
+BLOCK_SIZE = 1024 * 1024
+COMPRESS_LEVEL = 6
+SUFFIX = ".gz"
+INDEX_FORMAT = "qmtlog-blocks/1"
+# 索引成员的 gzip 头：FLG 只有 FCOMMENT，MTIME 为 0，XFL 0，OS 未知
+INDEX_MAGIC = b"\x1f\x8b\x08\x10"
+INDEX_HEADER = INDEX_MAGIC + b"\x00\x00\x00\x00\x00\xff"
+# 空内容的 deflate 数据 + CRC32(0) + ISIZE(0)
+INDEX_TRAILER = b"\x03\x00" + b"\x00" * 8
+# 从文件末尾读取多少字节查找索引成员（不够时读全部）
+INDEX_TAIL = 256 * 1024
+ROTATED_RE = re.compile(r"^(?P<base>.+)\.(?P<date>\d{8})$")
+
+
+def is_compressed(path):
+    return path.endswith(SUFFIX)
+
+
+class BlockFile:
+    """分块压缩文件的块索引
+
+    Attributes:
+        raw: 各块在原文件中的起始位置，末尾追加原文件大小（长度为块数 + 1）
+        comp: 各块在压缩文件中的起始位置，末尾追加索引成员的位置
+        size: 原文件大小
+        source_ident: 原文件的 (st_dev, st_ino)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            end = os.fstat(f.fileno()).st_size
+            tail_start = max(end - INDEX_TAIL, 0)
+            f.seek(tail_start)
+            tail = f.read()
+            pos = tail.rfind(INDEX_MAGIC)
+            if pos < 0 and tail_start:
+                f.seek(0)
+                tail, tail_start = f.read(), 0
+                pos = tail.rfind(INDEX_MAGIC)
+        if pos < 0:
+            raise ValueError(f"{path} 不是分块压缩的日志（缺少块索引）")
+        comment_start = pos + len(INDEX_HEADER)
+        comment_end = tail.find(b"\x00", comment_start)
+        meta = json.loads(tail[comment_start:comment_end].decode("ascii"))
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"{path} 的块索引格式不支持: {meta.get('format')}")
+        self.size = meta["size"]
+        self.source_ident = tuple(meta["ident"])
+        self.raw = np.array(meta["raw"] + [self.size], dtype="int64")
+        self.comp = np.array(meta["comp"] + [tail_start + pos], dtype="int64")
+
+    def block_of(self, pos):
+        """原始位置 pos 所在的块号"""
+        return int(np.searchsorted(self.raw, pos, "right")) - 1
+
+    def read_block(self, f, i):
+        """解压第 i 块（f 为以二进制打开的压缩文件）"""
+        f.seek(int(self.comp[i]))
+        return zlib.decompress(f.read(int(self.comp[i + 1] - self.comp[i])), 31)
+
+
+_block_files = {}
+_block_files_lock = threading.Lock()
+
+
+def open_blocks(path):
+    """读取压缩文件的块索引（按路径、修改时间和大小缓存）"""
+    st_info = os.stat(path)
+    key = (st_info.st_mtime_ns, st_info.st_size)
+    with _block_files_lock:
+        cached = _block_files.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    blocks = BlockFile(path)
+    with _block_files_lock:
+        _block_files[path] = (key, blocks)
+    return blocks
+
+
+class BlockReader:
+    """按原始字节位置读取分块压缩文件（接口同二进制文件对象的 seek / read / readline / tell）
+
+    只解压读取范围覆盖到的块，并缓存最近一块。
+    """
+
+    def __init__(self, path):
+        self.blocks = open_blocks(path)
+        self.size = self.blocks.size
+        self.pos = 0
+        self._f = open(path, "rb")
+        self._cached = (None, b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self._f.close()
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size
+        self.pos = max(pos, 0)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def _block(self, i):
+        if self._cached[0] != i:
+            self._cached = (i, self.blocks.read_block(self._f, i))
+        return self._cached[1]
+
+    def read(self, n=-1):
+        end = self.size if n is None or n < 0 else min(self.pos + n, self.size)
+        parts = []
+        while self.pos < end:
+            i = self.blocks.block_of(self.pos)
+            block_start = int(self.blocks.raw[i])
+            data = self._block(i)
+            part = data[self.pos - block_start:end - block_start]
+            if not part:
+                break
+            parts.append(part)
+            self.pos += len(part)
+        return b"".join(parts)
+
+    def readline(self):
+        """读取一行（块按行切分，一行总在同一块内）"""
+        if self.pos >= self.size:
+            return b""
+        i = self.blocks.block_of(self.pos)
+        block_start = int(self.blocks.raw[i])
+        data = self._block(i)
+        rel = self.pos - block_start
+        end = data.find(b"\n", rel) + 1 or len(data)
+        self.pos = block_start + end
+        return data[rel:end]
+
+
+def open_log(path):
+    """以二进制方式打开日志，压缩文件返回 BlockReader（按原始位置读取）"""
+    if is_compressed(path):
+        return BlockReader(path)
+    return open(path, "rb")
+
+
+def raw_size(path):
+    """日志的原始大小（压缩文件为压缩前的大小）"""
+    if is_compressed(path):
+        return open_blocks(path).size
+    return os.path.getsize(path)
+
+
+def compress_log(path, block_size=BLOCK_SIZE, level=COMPRESS_LEVEL):
+    """把一个日志文件压缩成 <path>.gz 并删除原文件，返回压缩文件路径"""
+    st_info = os.stat(path)
+    dest = path + SUFFIX
+    tmp = dest + ".tmp"
+    raw_starts, comp_starts = [], []
+    raw_pos = 0
+    with open(path, "rb") as src, open(tmp, "wb") as out:
+        buf = b""
+        eof = False
+        while buf or not eof:
+            if not eof and len(buf) < block_size:
+                chunk = src.read(block_size)
+                eof = not chunk
+                buf += chunk
+                continue
+            # 在块大小以内的最后一个换行处切开；单行超过块大小时切到这一行结束
+            cut = buf.rfind(b"\n", 0, block_size) + 1 or buf.find(b"\n", block_size) + 1
+            if not cut:
+                if not eof:
+                    chunk = src.read(block_size)
+                    eof = not chunk
+                    buf += chunk
+                    continue
+                cut = len(buf)
+            block, buf = buf[:cut], buf[cut:]
+            raw_starts.append(raw_pos)
+            comp_starts.append(out.tell())
+            out.write(gzip.compress(block, compresslevel=level, mtime=0))
+            raw_pos += len(block)
+        meta = {
+            "format": INDEX_FORMAT,
+            "ident": [st_info.st_dev, st_info.st_ino],
+            "size": raw_pos,
+            "raw": raw_starts,
+            "comp": comp_starts,
+        }
+        out.write(INDEX_HEADER + json.dumps(meta, separators=(",", ":")).encode("ascii") + b"\x00" + INDEX_TRAILER)
+    os.utime(tmp, ns=(st_info.st_atime_ns, st_info.st_mtime_ns))
+    os.replace(tmp, dest)
+    os.remove(path)
+    return dest
+
+
+def compress_rotated(log_dir, keep_days=1, today=None):
+    """压缩目录下日期后缀早于 today - keep_days 的轮转日志，返回压缩后的文件列表
+
+    压缩失败的文件（如仍被占用）保留原样，下次再试。
+    """
+    cutoff = ((today or date.today()) - timedelta(days=keep_days)).strftime("%Y%m%d")
+    done = []
+    try:
+        names = sorted(os.listdir(log_dir))
+    except OSError:
+        return done
+    for name in names:
+        match = ROTATED_RE.match(name)
+        if not match or match.group("date") >= cutoff:
+            continue
+        path = os.path.join(log_dir, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            done.append(compress_log(path))
+        except OSError:
+            continue
+    return done
+
+
+if __name__ == "__main__":
+    from config import QMT_LOG_DIR
+    for path in compress_rotated(sys.argv[1] if len(sys.argv) > 1 else QMT_LOG_DIR):
+        print(f"{datetime.now():%H:%M:%S} {os.path.basename(path)}: "
+              f"{raw_size(path) / 1024 / 1024:.1f} MB -> {os.path.getsize(path) / 1024 / 1024:.1f} MB")
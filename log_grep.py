@@ -0,0 +1,333 @@
+# log_grep.py - 日志全文扫描
+"""
+按字节扫描日志文件，不逐行解码：
+
+- 每个文件内存映射后按 SCAN_CHUNK 切成若干段（按行对齐，每行只属于一段），分给进程池并行扫描
+- 普通关键词：用 bytes.find 查找，命中后才向两侧找换行取出整行。不区分大小写（ASCII 字母，中文不受影响）时
+  优先查找关键词中不含字母的一段再整行确认，没有这样的一段才整段 bytes.lower()；正则：预编译的 bytes 正则（re.MULTILINE，^ $ 按行匹配）
+- 有时间范围时先用时间索引（log_index）把每个文件限制在对应的字节区间，两端的段对命中行再比较时间戳，
+  不带时间的行（如异常堆栈）保留
+- 命中密集（如 INFO）时改为整段按行切分逐行判断，相邻的匹配行合并成一段切片返回
+- 结果按文件、位置顺序以 (文件, 行首字节位置, 行) 逐条返回
+- 分块压缩的轮转文件（log_blocks）按块切分任务，每个任务只解压自己的块，位置为压缩前的字节位置
+
+扫描量小于 PARALLEL_MIN_BYTES 或 config.LOG_SEARCH_WORKERS 为 1 时在当前进程内扫描，省去进程间传输。
+"""
+import os
+import re
+import mmap
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import LOG_SEARCH_WORKERS
+from log_index import TIMESTAMP_RE, TIMESTAMP_FORMAT, get_time_index
+from log_blocks import BlockReader, is_compressed, open_blocks, raw_size
+from metrics import incr, timed
+
+# 每个扫描任务的字节数
+SCAN_CHUNK = 16 * 1024 * 1024
+# 扫描量低于这个值时不使用进程池
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+# 逐个查找时每 DENSE_CHECK_EVERY 处命中检查一次，平均每不到 DENSE_HIT_BYTES 字节就有一处命中时，
+# 剩余部分改为整段按行切分逐行判断
+DENSE_HIT_BYTES = 256
+DENSE_CHECK_EVERY = 1024
+# 定位串最短长度
+ANCHOR_MIN = 4
+ANCHOR_SPLIT_RE = re.compile(rb"[A-Za-z]+")
+
+
+def compile_matcher(keyword, regex=False, ignore_case=True):
+    """关键词 -> 扫描用的匹配规则 (类型, 模式, 选项, 定位串)，可在进程间传递
+
+    Raises:
+        re.error: 正则表达式无效
+    """
+    pattern = keyword.encode("utf-8")
+    if regex:
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        # 先编译一次，让无效的表达式在提交任务前报错
+        re.compile(pattern, flags)
+        return ("regex", pattern, flags, None)
+    # 没有 ASCII 字母时大小写无关，省去 lower()
+    fold = ignore_case and pattern.lower() != pattern.upper()
+    anchor = None
+    if fold:
+        # 关键词中最长的一段不含字母的部分（如 600000.SH 的 600000.）大小写不变，
+        # 可以直接在原始字节中查找，命中行再整行 lower() 确认，省去整段 lower()
+        anchor = max(ANCHOR_SPLIT_RE.split(pattern), key=len)
+        if len(anchor) < ANCHOR_MIN:
+            anchor = None
+        pattern = pattern.lower()
+    return ("literal", pattern, fold, anchor)
+
+
+def _line_start(mm, pos):
+    """pos 处或之后第一行的行首"""
+    if pos <= 0:
+        return 0
+    return mm.find(b"\n", pos - 1) + 1 or len(mm)
+
+
+def _sparse_lines(data, hay, matcher, dense_check=False):
+    """逐个查找命中位置，取出所在行
+
+    Returns:
+        (行首列表, 行尾列表, 停止位置)：dense_check 时发现命中密集就在停止位置返回，
+        剩余部分改用 _dense_lines；否则停止位置为 None
+    """
+    kind, needle, option, anchor = matcher
+    search = re.compile(needle, option).search if kind == "regex" else None
+    los, his = [], []
+    pos = 0
+    size = len(data)
+    while pos < size:
+        if search is not None:
+            match = search(hay, pos)
+            if match is None:
+                break
+            i = match.start()
+        else:
+            i = hay.find(anchor or needle, pos)
+            if i < 0:
+                break
+        line_lo = data.rfind(b"\n", 0, i) + 1
+        line_hi = data.find(b"\n", i) + 1 or size
+        pos = line_hi
+        if anchor and needle not in data[line_lo:line_hi].lower():
+            continue
+        los.append(line_lo)
+        his.append(line_hi)
+        if dense_check and not len(los) % DENSE_CHECK_EVERY and pos < len(los) * DENSE_HIT_BYTES:
+            return los, his, pos
+    return los, his, None
+
+
+def _dense_lines(data, hay, needle):
+    """命中较多时整段按行切分逐行判断，返回匹配行的 (行首数组, 行尾数组)"""
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.append(newlines + 1, len(data))
+    lines = hay.split(b"\n")
+    mask = np.fromiter((needle in line for line in lines), dtype=bool, count=len(lines))
+    # 以换行结尾时 split 的最后一项是空串，不是一行
+    mask[-1] &= starts[-1] < len(data)
+    return starts[mask], ends[mask]
+
+
+def scan_bytes(data, base, matcher, start_s=None, end_s=None):
+    """在一段按行对齐的字节中查找匹配的行
+
+    Args:
+        data: 日志字节（从行首开始）
+        base: data 在文件中的起始位置
+        matcher: compile_matcher 的返回值
+        start_s / end_s: b"YYYY-MM-DD HH:MM:SS"，为空表示不限
+
+    Returns:
+        (行首字节位置列表, 匹配行拼接成的 bytes)：整段返回，由调用方一次解码后再按换行切分
+    """
+    kind, needle, option, anchor = matcher
+    if kind == "literal" and not anchor:
+        hay = data.lower() if option else data
+        if needle:
+            los, his, stop = _sparse_lines(data, hay, matcher, dense_check=True)
+        else:
+            los, his, stop = [], [], 0
+        if stop is not None:
+            rest_lo, rest_hi = _dense_lines(data[stop:], hay[stop:], needle)
+            los = np.concatenate((np.asarray(los, dtype="int64"), rest_lo + stop))
+            his = np.concatenate((np.asarray(his, dtype="int64"), rest_hi + stop))
+    else:
+        los, his, _ = _sparse_lines(data, data, matcher)
+    if start_s or end_s:
+        keep_lo, keep_hi = [], []
+        for line_lo, line_hi in zip(los, his):
+            stamp = TIMESTAMP_RE.search(data, line_lo, line_hi)
+            if stamp:
+                stamp = stamp.group(0)
+                if (start_s and stamp < start_s) or (end_s and stamp > end_s):
+                    continue
+            keep_lo.append(line_lo)
+            keep_hi.append(line_hi)
+        los, his = keep_lo, keep_hi
+    los = np.asarray(los, dtype="int64")
+    his = np.asarray(his, dtype="int64")
+    if not los.size:
+        return [], b""
+    # 相邻的匹配行合并成一段再切片，命中密集时切片次数远少于行数
+    breaks = np.flatnonzero(los[1:] != his[:-1]) + 1
+    run_lo = los[np.concatenate(([0], breaks))].tolist()
+    run_hi = his[np.append(breaks - 1, los.size - 1)].tolist()
+    blob = b"".join([data[lo:hi] for lo, hi in zip(run_lo, run_hi)])
+    return (los + base).tolist(), blob
+
+
+def _scan_task(task):
+    """进程池任务：扫描文件中行首落在 [lo, hi) 的行"""
+    path, lo, hi, matcher, start_s, end_s = task
+    if is_compressed(path):
+        # 压缩文件的任务边界都是行首，直接读出这一段
+        try:
+            with BlockReader(path) as reader:
+                reader.seek(lo)
+                data = reader.read(hi - lo)
+        except (OSError, ValueError):
+            return [], b""
+        return scan_bytes(data, lo, matcher, start_s, end_s)
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return [], b""
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or lo >= size:
+            return [], b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            begin = _line_start(mm, lo)
+            end = _line_start(mm, hi) if hi < size else size
+            if end <= begin:
+                return [], b""
+            data = mm[begin:end]
+    return scan_bytes(data, begin, matcher, start_s, end_s)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=LOG_SEARCH_WORKERS or os.cpu_count())
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def plan_tasks(log_files, matcher, start_time=None, end_time=None):
+    """把多个文件（有时间范围时只取对应的字节区间）切成扫描任务，按文件、位置顺序排列"""
+    start_s = start_time.strftime(TIMESTAMP_FORMAT).encode("ascii") if start_time is not None else None
+    end_s = end_time.strftime(TIMESTAMP_FORMAT).encode("ascii") if end_time is not None else None
+    tasks = []
+    for log_file in log_files:
+        if start_s or end_s:
+            index = get_time_index(log_file)
+            if not index.refresh():
+                continue
+            lo, body_lo, body_hi, hi = index.span(start_time, end_time)
+        else:
+            try:
+                lo, hi = 0, raw_size(log_file)
+            except (OSError, ValueError):
+                continue
+            body_lo = body_hi = 0
+        bounds = _task_bounds(log_file, lo, hi)
+        for pos, end in zip(bounds[:-1], bounds[1:]):
+            # 整段落在时间范围内部时不用逐行比较时间
+            inside = body_lo <= pos and end <= body_hi
+            tasks.append((log_file, pos, end, matcher, None if inside else start_s, None if inside else end_s))
+    return tasks
+
+
+def _task_bounds(log_file, lo, hi):
+    """[lo, hi) 按 SCAN_CHUNK 切分的边界；压缩文件中间的边界取在块边界上（lo、hi 本身是行首）"""
+    if hi <= lo:
+        return []
+    if not is_compressed(log_file):
+        return list(range(lo, hi, SCAN_CHUNK)) + [hi]
+    try:
+        raw = open_blocks(log_file).raw
+    except (OSError, ValueError):
+        return []
+    bounds = [lo]
+    for pos in raw[(raw > lo) & (raw < hi)].tolist():
+        if pos - bounds[-1] >= SCAN_CHUNK:
+            bounds.append(pos)
+    return bounds + [hi]
+
+
+def _count_task(task):
+    return len(_scan_task(task)[0])
+
+
+def _map(func, tasks):
+    """按提交顺序逐个返回结果；进程池每批只提交 2 倍进程数的任务，未取走的结果不会堆积"""
+    workers = LOG_SEARCH_WORKERS or os.cpu_count() or 1
+    total = sum(task[2] - task[1] for task in tasks)
+    incr("bytes_read.logs", total)
+    if workers <= 1 or total < PARALLEL_MIN_BYTES or len(tasks) < 2:
+        yield from map(func, tasks)
+        return
+    batch = workers * 2
+    for i in range(0, len(tasks), batch):
+        part = tasks[i:i + batch]
+        try:
+            results = list(_get_pool().map(func, part))
+        except BrokenProcessPool:
+            # 工作进程异常退出（如被杀掉），重建进程池，这一批在当前进程内扫描
+            _reset_pool()
+            results = map(func, part)
+        yield from results
+
+
+def run_tasks(tasks):
+    """执行扫描任务，按顺序逐个返回 (行首位置列表, 匹配行 bytes)"""
+    return _map(_scan_task, tasks)
+
+
+def count_tasks(tasks):
+    """只统计各任务的匹配行数（工作进程只传回数字）"""
+    return list(_map(_count_task, tasks))
+
+
+def decode_lines(blob):
+    """scan_bytes 返回的匹配行 bytes -> 行列表（保留换行）
+
+    每行以换行结尾（只有文件最后还没写完的半行例外），按 \n 切分与行首位置一一对应。
+    """
+    parts = blob.decode("utf-8", errors="replace").split("\n")
+    last = parts.pop()
+    lines = [part + "\n" for part in parts]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def grep_logs(log_files, keyword, start_time=None, end_time=None, regex=False, ignore_case=True):
+    """在多个日志文件中查找匹配关键词的行
+
+    Args:
+        log_files: 日志文件路径列表（结果按这个顺序返回）
+        keyword: 关键词或正则表达式
+        start_time / end_time: datetime，为空表示不限
+        regex: 是否按正则表达式匹配
+        ignore_case: 是否忽略大小写
+
+    Yields:
+        (文件, 行首字节位置, 行 str)
+
+    Raises:
+        re.error: 正则表达式无效
+    """
+    matcher = compile_matcher(keyword, regex, ignore_case)
+    tasks = plan_tasks(log_files, matcher, start_time, end_time)
+    for task, (offsets, blob) in zip(tasks, run_tasks(tasks)):
+        if offsets:
+            path = task[0]
+            for offset, line in zip(offsets, decode_lines(blob)):
+                yield path, offset, line
+
+
+@timed()
+def grep_lines(log_files, keyword, start_time=None, end_time=None, regex=False, ignore_case=True):
+    """grep_logs 的行列表形式"""
+    return [line for _, _, line in grep_logs(log_files, keyword, start_time, end_time, regex, ignore_case)]
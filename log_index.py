@@ -0,0 +1,312 @@
+# log_index.py - 日志文件的稀疏时间索引
+"""
+每个日志文件一个旁路索引：每隔 stride 字节取一行，记录 (时间戳, 行首字节位置)。
+
+- 建索引只在每个采样点 seek 并读一小段，不需要读完整个文件；已轮转的文件建一次即可，
+  正在写入的 main.log / tick.log 每次查询前只补采新增部分
+- main.log 被 TimedRotatingFileHandler 改名为 main.log.YYYYMMDD 后，按文件标识（st_dev, st_ino）
+  把原来的索引直接改名给轮转文件用
+- 按时间范围查询时二分找到起止位置，只读这一段；两端的块逐行比较时间，中间的块整块返回
+- 索引假设日志时间基本单调递增（多线程写入的秒级内乱序不影响结果）
+- 分块压缩的轮转文件（log_blocks，main.log.YYYYMMDD.gz）按原始字节位置建索引和读取，只解压用到的块
+
+索引保存在 config.LOG_INDEX_DIR（为空时为日志目录下的 .index），文件名为 <日志文件名>.tidx.npz。
+"""
+import os
+import re
+import threading
+import numpy as np
+from config import LOG_INDEX_DIR
+from log_blocks import open_log, raw_size
+from metrics import incr, timed
+
+# 采样间隔（字节）
+INDEX_STRIDE = 64 * 1024
+# 每个采样点先读 SAMPLE_HEAD 字节，找不到带时间的完整行再读到 SAMPLE_WINDOW，仍找不到则跳过该采样点
+SAMPLE_HEAD = 2 * 1024
+SAMPLE_WINDOW = 16 * 1024
+# 按范围读取时每次读入的字节数
+READ_CHUNK = 1024 * 1024
+
+TIMESTAMP_RE = re.compile(rb"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+TEXT_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _seconds(stamps):
+    """b"YYYY-MM-DD HH:MM:SS" 列表 -> int64 秒"""
+    return np.array(stamps, dtype="S19").astype("datetime64[s]").astype("int64")
+
+
+def _to_seconds(value):
+    return int(np.datetime64(value, "s").astype("int64"))
+
+
+def live_name(log_file):
+    """轮转文件（main.log.YYYYMMDD）改名前的文件名，不是轮转文件时返回 None"""
+    base, dot, suffix = os.path.basename(log_file).rpartition(".")
+    if not dot or not suffix.isdigit():
+        return None
+    return base
+
+
+def file_ident(path):
+    st_info = os.stat(path)
+    return (st_info.st_dev, st_info.st_ino)
+
+
+def default_index_dir(log_file):
+    """索引目录：config.LOG_INDEX_DIR，为空时为日志目录下的 .index"""
+    return LOG_INDEX_DIR or os.path.join(os.path.dirname(log_file), ".index")
+
+
+class TimeIndex:
+    """单个日志文件的稀疏时间索引"""
+
+    def __init__(self, log_file, index_dir=None, stride=INDEX_STRIDE):
+        self.log_file = log_file
+        self.stride = stride
+        self.index_dir = index_dir = index_dir or default_index_dir(log_file)
+        self.index_path = os.path.join(index_dir, os.path.basename(log_file) + ".tidx.npz")
+        self.ident = None
+        self.size = 0
+        # 下一个待采样的位置
+        self.next_offset = 0
+        self.times = np.empty(0, dtype="int64")
+        self.offsets = np.empty(0, dtype="int64")
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self._loaded = True
+        path = self.index_path
+        if not os.path.exists(path):
+            path = self._adopt_live_index()
+            if path is None:
+                return
+        try:
+            with np.load(path) as data:
+                ident = tuple(int(x) for x in data["ident"])
+                size, next_offset, stride = (int(x) for x in data["state"])
+                times, offsets = data["times"], data["offsets"]
+        except Exception:
+            return
+        if stride != self.stride:
+            return
+        self.ident = ident
+        self.size = size
+        self.next_offset = next_offset
+        self.times = times
+        self.offsets = offsets
+
+    def _adopt_live_index(self):
+        """轮转文件没有索引时，看改名前（main.log）的索引是否属于同一个文件"""
+        base = live_name(self.log_file)
+        if base is None:
+            return None
+        live_path = os.path.join(self.index_dir, base + ".tidx.npz")
+        try:
+            with np.load(live_path) as data:
+                ident = tuple(int(x) for x in data["ident"])
+            if ident != file_ident(self.log_file):
+                return None
+        except Exception:
+            return None
+        os.replace(live_path, self.index_path)
+        return self.index_path
+
+    def _save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp = self.index_path + ".tmp.npz"
+        np.savez(
+            tmp,
+            ident=np.array(self.ident, dtype="uint64"),
+            state=np.array([self.size, self.next_offset, self.stride], dtype="int64"),
+            times=self.times,
+            offsets=self.offsets,
+        )
+        os.replace(tmp, self.index_path)
+
+    def refresh(self):
+        """补采新增部分（文件被替换或截断时重建），返回当前文件大小"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            try:
+                st_info = os.stat(self.log_file)
+                size = raw_size(self.log_file)
+            except (OSError, ValueError):
+                return 0
+            ident = (st_info.st_dev, st_info.st_ino)
+            if ident != self.ident or size < self.size:
+                self.ident = ident
+                self.size = 0
+                self.next_offset = 0
+                self.times = np.empty(0, dtype="int64")
+                self.offsets = np.empty(0, dtype="int64")
+            if size > self.size:
+                self._extend(size)
+                self.size = size
+                try:
+                    self._save()
+                except OSError:
+                    pass
+            return self.size
+
+    def _extend(self, size):
+        stamps, offsets = [], []
+        pos = self.next_offset
+        with open_log(self.log_file) as f:
+            while pos < size:
+                for width in (SAMPLE_HEAD, SAMPLE_WINDOW):
+                    f.seek(pos)
+                    window = f.read(min(width, size - pos))
+                    incr("bytes_read.log_index", len(window))
+                    found, complete = self._sample(window, pos == 0, width)
+                    if found is not None or not complete:
+                        break
+                if found is not None:
+                    stamp, rel = found
+                    stamps.append(stamp)
+                    offsets.append(pos + rel)
+                elif not complete:
+                    # 末尾还没有完整的带时间行，下次从这里继续
+                    break
+                pos += self.stride
+        self.next_offset = pos
+        if not stamps:
+            return
+        times = _seconds(stamps)
+        if self.times.size:
+            times = np.concatenate([self.times, times])
+        # 保证单调，便于二分
+        self.times = np.maximum.accumulate(times)
+        self.offsets = np.concatenate([self.offsets, np.array(offsets, dtype="int64")])
+
+    @staticmethod
+    def _sample(window, at_line_start, width):
+        """在采样窗口内找第一行带时间的完整行
+
+        Returns:
+            ((时间戳 bytes, 行首相对位置) 或 None, 窗口是否读满（未读满说明到了文件末尾）)
+        """
+        full = len(window) >= width
+        start = 0 if at_line_start else window.find(b"\n") + 1
+        if not at_line_start and start == 0:
+            return None, full
+        while True:
+            end = window.find(b"\n", start)
+            if end < 0:
+                return None, full
+            match = TIMESTAMP_RE.search(window, start, end)
+            if match:
+                return (match.group(0), start), True
+            start = end + 1
+
+    def span(self, start_time=None, end_time=None):
+        """时间范围对应的字节区间
+
+        Returns:
+            (lo, body_lo, body_hi, hi)：[lo, hi) 之外的行都不在范围内，
+            [body_lo, body_hi) 内的行都在范围内（不需要逐行比较时间）
+        """
+        times, offsets, size = self.times, self.offsets, self.size
+        lo, hi = 0, size
+        body_lo = body_hi = 0
+        if not times.size:
+            return lo, body_lo, body_hi, hi
+        first = 0
+        last = times.size - 1
+        if start_time is not None:
+            start = _to_seconds(start_time)
+            i = int(np.searchsorted(times, start, "left"))
+            lo = int(offsets[i - 1]) if i > 0 else 0
+            first = i
+        if end_time is not None:
+            end = _to_seconds(end_time)
+            j = int(np.searchsorted(times, end, "right"))
+            hi = int(offsets[j]) if j < times.size else size
+            last = j - 1
+        if first <= last:
+            body_lo, body_hi = int(offsets[first]), int(offsets[last])
+        else:
+            # 范围落在两个采样点之间，或开始时间晚于结束时间
+            body_lo = body_hi = lo
+            hi = max(hi, lo)
+        return lo, body_lo, body_hi, hi
+
+    def iter_lines(self, start_time=None, end_time=None, keyword=""):
+        """按时间范围（和关键词）逐行返回日志，不带时间的行（如异常堆栈）保留"""
+        if not self.refresh():
+            return
+        lo, body_lo, body_hi, hi = self.span(start_time, end_time)
+        start_s = start_time.strftime(TIMESTAMP_FORMAT) if start_time is not None else None
+        end_s = end_time.strftime(TIMESTAMP_FORMAT) if end_time is not None else None
+        keyword = keyword.lower()
+        with open_log(self.log_file) as f:
+            for seg_lo, seg_hi, check in ((lo, body_lo, True), (body_lo, body_hi, False), (body_hi, hi, True)):
+                if seg_hi <= seg_lo:
+                    continue
+                for line in _read_lines(f, seg_lo, seg_hi):
+                    if keyword and keyword not in line.lower():
+                        continue
+                    if check:
+                        match = TEXT_TIMESTAMP_RE.search(line) if (start_s or end_s) else None
+                        if match:
+                            stamp = match.group(0)
+                            if start_s and stamp < start_s:
+                                continue
+                            if end_s and stamp > end_s:
+                                continue
+                    yield line
+
+
+def _read_lines(f, lo, hi):
+    """读取 [lo, hi) 区间内的行（解码为 str，保留换行）"""
+    f.seek(lo)
+    remaining = hi - lo
+    pending = b""
+    while remaining > 0:
+        chunk = f.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        incr("bytes_read.logs", len(chunk))
+        data = pending + chunk
+        end = data.rfind(b"\n") + 1
+        pending = data[end:]
+        if end:
+            yield from data[:end].decode("utf-8", errors="replace").splitlines(keepends=True)
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_time_index(log_file):
+    """获取日志文件的时间索引（进程内共享）"""
+    with _indexes_lock:
+        index = _indexes.get(log_file)
+        if index is None:
+            index = _indexes[log_file] = TimeIndex(log_file)
+        return index
+
+
+@timed()
+def read_log_range(log_files, start_time=None, end_time=None, keyword=""):
+    """按时间范围读取多个日志文件，只读取范围对应的字节区间
+
+    Args:
+        log_files: 日志文件路径列表
+        start_time / end_time: datetime，为空表示不限
+        keyword: 关键词过滤（不区分大小写）
+
+    Returns:
+        list: 日志行列表
+    """
+    lines = []
+    for log_file in log_files:
+        lines.extend(get_time_index(log_file).iter_lines(start_time, end_time, keyword))
+    return lines
@@ -0,0 +1,621 @@
+# log_search.py - 日志关键词倒排索引
+"""
+每个日志文件一个倒排索引：词 -> 包含该词的行首字节位置（有序）。关键词搜索先查索引拿到候选行，
+再逐行确认（不区分大小写的子串匹配 + 时间范围），不再整文件扫描。
+
+分词（不区分大小写）：按字符类别切成连续段，类别变化处也切开（100股 -> 100 / 股，
+600001.SH买入 -> 600001 / sh / 买入）
+- 英文段 [a-z_]+，如日志级别、tick、策略英文名
+- 中文段（非 ASCII 字节的连续段，含中文标点），如 触发买入信号、[网格] 中的 网格
+- 数字段（价格、数量、时间）不建索引
+- 证券代码 600000.sh 另外作为一个词建索引
+
+查询时关键词按同样规则切词，每个词在词表中做子串匹配（关键词两端可能只是某一段的一部分），
+多个词的候选行取交集。行中包含关键词时，关键词切出的每一段都是行中某一段的子串，所以候选行不会漏。
+出现在超过 STOP_RATIO 行里的词（INFO、最新价 等）和数字段不参与筛选；只剩这类词时回退到按字节
+全文扫描（log_grep，有时间范围时只扫对应的字节区间），如只输入 600000 时成交量等数字里也可能出现，
+仍全文扫描，输入 600000.SH 才走索引。正则表达式总是全文扫描。
+
+- 已轮转的 main.log.YYYYMMDD / tick.log.YYYYMMDD 建一次；正在写入的文件每次搜索前只补建新增的行
+- 待补建的内容超过 SYNC_BUILD（如首次搜索、服务重启后）时不在页面请求里建索引：
+  交给后台线程（同一时间只建一个文件），建好之前该文件按字节全文扫描
+- 轮转后按文件标识（st_dev, st_ino）把 main.log 的索引改名给轮转文件继续使用
+- 分块压缩的轮转文件（log_blocks）按原始字节位置建索引，确认候选行时只解压候选行所在的块
+- 索引文件：<索引目录>/<日志文件名>.kidx.json（词表）+ .kidx.npy（位置，按需内存映射）
+
+搜索结果以游标（LogCursor）返回：先统计各段匹配数，翻页和导出时再按段读取，不在内存中保留全部结果。
+
+命令行预建索引（先压缩较早的轮转文件，再清理已不存在的日志的索引）：python log_search.py <日志目录>
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import threading
+import numpy as np
+import pandas as pd
+from log_index import (default_index_dir, live_name, file_ident, get_time_index,
+                       TIMESTAMP_RE, TIMESTAMP_FORMAT)
+from log_grep import compile_matcher, plan_tasks, run_tasks, count_tasks, decode_lines
+from log_blocks import BlockReader, open_log, is_compressed, raw_size, compress_rotated
+from metrics import incr, timed
+
+# 建索引时每次读入的字节数
+READ_CHUNK = 4 * 1024 * 1024
+# 出现在超过这个比例的行里的词不保存位置（累计行数达到 STOP_MIN_LINES 后才判断）
+STOP_RATIO = 0.2
+STOP_MIN_LINES = 50000
+# 正在写入的文件每新增这么多字节落盘一次
+SAVE_EVERY = 32 * 1024 * 1024
+# 结果游标中每段包含的候选位置数
+INDEX_BLOCK = 64 * 1024
+# 搜索时待补建的字节数不超过这个值就当场补建，否则交给后台线程，本次先全文扫描
+SYNC_BUILD = 8 * 1024 * 1024
+
+# 索引格式版本（分词规则变化时加一，旧索引自动重建）
+INDEX_VERSION = 2
+
+# 英文字母、下划线和非 ASCII 字节保留，其余字节（含数字）替换成空格（\n 保留，用来切行）
+_KEEP = set(b"abcdefghijklmnopqrstuvwxyz_\n") | set(range(0x80, 0x100))
+TOKEN_TABLE = bytes(b if b in _KEEP else 0x20 for b in range(256))
+LINE_MARK = b"\x00"
+# 按空白切开后英文和中文可能还连在一起（sh买入），再按类别切段
+RUN_RE = re.compile(rb"[a-z_]+|[\x80-\xff]+")
+CODE_RE = re.compile(rb"\d{6}\.[a-z]{2}")
+
+
+def _split(data):
+    """小写、替换非分词字符后按空白切分，每行结束处插入 LINE_MARK（英文和中文还没有切开）"""
+    return data.lower().translate(TOKEN_TABLE).replace(b"\n", b" " + LINE_MARK + b" ").split()
+
+
+def query_tokens(keyword):
+    """关键词切词（与建索引相同的规则，另加其中的完整证券代码），返回 str 列表"""
+    data = keyword.encode("utf-8").lower()
+    tokens = [run for t in _split(data) if t != LINE_MARK for run in RUN_RE.findall(t)] + CODE_RE.findall(data)
+    return [t.decode("utf-8", errors="ignore") for t in tokens]
+
+
+def _group_postings(token_ids, lines, uniques, line_starts, postings):
+    """(词号, 行号) 去重后按词归并为 词 -> 行首位置数组，写入 postings"""
+    pairs = np.unique((token_ids.astype("int64") << 32) | lines)
+    if not pairs.size:
+        return
+    token_ids = pairs >> 32
+    lines = pairs & 0xFFFFFFFF
+    bounds = np.flatnonzero(np.diff(token_ids)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [pairs.size]))
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        token = uniques[token_ids[s]].decode("utf-8", errors="replace")
+        postings[token] = line_starts[lines[s:e]]
+
+
+def chunk_postings(chunk, base):
+    """对一段完整的行建倒排表
+
+    Args:
+        chunk: 以换行结尾的日志字节
+        base: chunk 在文件中的起始位置
+
+    Returns:
+        (词 -> 行首位置数组, 行数)
+    """
+    newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)
+    line_starts = np.concatenate(([0], newlines[:-1] + 1)).astype("int64") + base
+    lowered = chunk.lower()
+    postings = {}
+    codes, uniques = pd.factorize(np.array(_split(lowered), dtype=object))
+    # 不能用 uniques == LINE_MARK：numpy 把 b"\x00" 当作空串比较
+    marks = codes == uniques.tolist().index(LINE_MARK)
+    line = np.cumsum(marks) - marks
+    # 每个不同的词再按类别切段（多数词只有一段），parts[j][词号] 为第 j 段的段号，没有时为 -1
+    runs, run_ids = [], {}
+    parts = []
+    for u, token in enumerate(uniques.tolist()):
+        for j, run in enumerate(RUN_RE.findall(token)):
+            if j == len(parts):
+                parts.append(np.full(len(uniques), -1, dtype="int64"))
+            run_id = run_ids.get(run)
+            if run_id is None:
+                run_id = run_ids[run] = len(runs)
+                runs.append(run)
+            parts[j][u] = run_id
+    if parts:
+        ids = np.concatenate([p[codes] for p in parts])
+        lines = np.tile(line, len(parts))
+        sel = ids >= 0
+        _group_postings(ids[sel], lines[sel], runs, line_starts, postings)
+    # 证券代码：按出现位置找到所在行
+    found = [(m.group(), m.start()) for m in CODE_RE.finditer(lowered)]
+    if found:
+        code_ids, code_uniques = pd.factorize(np.array([f[0] for f in found], dtype=object))
+        positions = np.fromiter((f[1] for f in found), dtype="int64", count=len(found))
+        _group_postings(code_ids, np.searchsorted(newlines, positions), code_uniques, line_starts, postings)
+    return postings, newlines.size
+
+
+class TokenIndex:
+    """单个日志文件的倒排索引"""
+
+    def __init__(self, log_file, index_dir=None):
+        self.log_file = log_file
+        self.index_dir = index_dir or default_index_dir(log_file)
+        self.ident = None
+        # 已建索引的字节数（到最后一个完整行）
+        self.size = 0
+        self.lines = 0
+        self.common = set()
+        # 词 -> 位置数组列表（内存中追加）或 (起, 止)（来自已落盘的 .npy）
+        self.postings = {}
+        self.stored = None
+        self.saved_size = 0
+        self._loaded = False
+        self._building = False
+        self._lock = threading.Lock()
+
+    def _paths(self, name=None):
+        base = os.path.join(self.index_dir, (name or os.path.basename(self.log_file)) + ".kidx")
+        return base + ".json", base + ".npy"
+
+    def _reset(self, ident):
+        self.ident = ident
+        self.size = self.lines = self.saved_size = 0
+        self.common = set()
+        self.postings = {}
+        self.stored = None
+
+    def _load(self):
+        self._loaded = True
+        meta_path, npy_path = self._paths()
+        if not os.path.exists(meta_path) and not self._adopt_live_index():
+            return
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            stored = np.load(npy_path, mmap_mode="r")
+        except Exception:
+            return
+        if meta.get("version") != INDEX_VERSION:
+            # 分词规则已变化，重建
+            return
+        starts = meta["starts"]
+        if stored.shape[0] != (starts[-1] if starts else 0):
+            # 两个文件不一致（写到一半中断），重建
+            return
+        self.ident = tuple(meta["ident"])
+        self.size = self.saved_size = meta["size"]
+        self.lines = meta["lines"]
+        self.common = set(meta["common"])
+        self.stored = stored
+        self.postings = {t: (starts[i], starts[i + 1]) for i, t in enumerate(meta["tokens"])}
+
+    def _adopt_live_index(self):
+        """轮转文件没有索引时，看改名前（main.log）的索引是否属于同一个文件"""
+        base = live_name(self.log_file)
+        if base is None:
+            return False
+        live_meta, live_npy = self._paths(base)
+        try:
+            with open(live_meta, "r", encoding="utf-8") as f:
+                ident = tuple(json.load(f)["ident"])
+            if ident != file_ident(self.log_file):
+                return False
+        except Exception:
+            return False
+        meta_path, npy_path = self._paths()
+        os.replace(live_npy, npy_path)
+        os.replace(live_meta, meta_path)
+        return True
+
+    def _arrays(self, token):
+        entry = self.postings.get(token)
+        if entry is None:
+            return []
+        if isinstance(entry, tuple):
+            return [self.stored[entry[0]:entry[1]]]
+        return entry
+
+    def _save(self):
+        """写出全部位置（先写 .npy 再写词表，词表里记录总长度用于校验）"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        meta_path, npy_path = self._paths()
+        tokens, parts, starts = [], [], [0]
+        for token in self.postings:
+            arrays = self._arrays(token)
+            tokens.append(token)
+            parts.extend(arrays)
+            starts.append(starts[-1] + sum(len(a) for a in arrays))
+        postings = np.concatenate(parts).astype("int64") if parts else np.empty(0, dtype="int64")
+        tmp = npy_path + ".tmp.npy"
+        np.save(tmp, postings)
+        # 已落盘的部分改为内存数组，释放对旧 .npy 的映射后再替换
+        self.stored = postings
+        self.postings = {t: (starts[i], starts[i + 1]) for i, t in enumerate(tokens)}
+        os.replace(tmp, npy_path)
+        meta = {
+            "version": INDEX_VERSION,
+            "ident": list(self.ident),
+            "size": self.size,
+            "lines": self.lines,
+            "common": sorted(self.common),
+            "tokens": tokens,
+            "starts": starts,
+        }
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
+        self.saved_size = self.size
+
+    def refresh(self):
+        """补建新增的完整行（文件被替换或截断时重建），返回已建索引的字节数"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            try:
+                st_info = os.stat(self.log_file)
+                size = raw_size(self.log_file)
+            except (OSError, ValueError):
+                return 0
+            ident = (st_info.st_dev, st_info.st_ino)
+            if ident != self.ident or size < self.size:
+                self._reset(ident)
+            if size > self.size:
+                self._extend(size)
+                # 轮转文件不会再变，建完就落盘；正在写入的文件攒够 SAVE_EVERY 再落盘
+                rotated = live_name(self.log_file) or is_compressed(self.log_file)
+                if self.size > self.saved_size and (rotated or not self.saved_size
+                                                    or self.size - self.saved_size >= SAVE_EVERY):
+                    try:
+                        self._save()
+                    except OSError:
+                        pass
+            return self.size
+
+    def ready(self, sync_limit=SYNC_BUILD):
+        """搜索前调用：待补建的内容不多时当场补建，返回索引是否可用
+
+        待补建超过 sync_limit 字节时启动后台线程补建并返回 False（调用方本次全文扫描），不阻塞。
+        """
+        if self._building:
+            return False
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            try:
+                st_info = os.stat(self.log_file)
+                size = raw_size(self.log_file)
+            except (OSError, ValueError):
+                return False
+            same = (st_info.st_dev, st_info.st_ino) == self.ident and size >= self.size
+            pending = size - self.size if same else size
+        if pending <= sync_limit:
+            return self.refresh() > 0
+        self._building = True
+        threading.Thread(target=self._build_background, name="log-index", daemon=True).start()
+        return False
+
+    def _build_background(self):
+        try:
+            with _build_lock:
+                self.refresh()
+        finally:
+            self._building = False
+
+    def _extend(self, size):
+        with open_log(self.log_file) as f:
+            f.seek(self.size)
+            pending = b""
+            base = self.size
+            while base + len(pending) < size:
+                chunk = f.read(min(READ_CHUNK, size - base - len(pending)))
+                if not chunk:
+                    break
+                incr("bytes_read.log_search_index", len(chunk))
+                data = pending + chunk
+                end = data.rfind(b"\n") + 1
+                pending = data[end:]
+                if end:
+                    self._add(*chunk_postings(data[:end], base))
+                    base += end
+            self.size = base
+
+    def _add(self, postings, lines):
+        self.lines += lines
+        for token, offsets in postings.items():
+            if token in self.common:
+                continue
+            entry = self.postings.get(token)
+            if entry is None:
+                self.postings[token] = [offsets]
+            elif isinstance(entry, tuple):
+                self.postings[token] = [self.stored[entry[0]:entry[1]], offsets]
+            else:
+                entry.append(offsets)
+        # 高频词只记为 common，不再保存位置
+        if self.lines >= STOP_MIN_LINES:
+            limit = self.lines * STOP_RATIO
+            for token in [t for t in self.postings if sum(len(a) for a in self._arrays(t)) > limit]:
+                del self.postings[token]
+                self.common.add(token)
+
+    def candidates(self, keyword):
+        """关键词的候选行首位置（有序），索引帮不上忙时返回 None"""
+        result = None
+        for q in query_tokens(keyword):
+            if q[:1].isdigit() and not CODE_RE.fullmatch(q.encode("utf-8")):
+                continue
+            if any(q in c for c in self.common):
+                continue
+            matched = [t for t in self.postings if q in t]
+            if not matched:
+                return np.empty(0, dtype="int64")
+            arrays = [a for t in matched for a in self._arrays(t)]
+            offsets = arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+            result = offsets if result is None else np.intersect1d(result, offsets, assume_unique=True)
+            if not result.size:
+                break
+        return result
+
+    def search(self, keyword, start_time=None, end_time=None):
+        """用索引查找关键词的候选行首位置（已按时间范围收窄，还需 read_candidates 确认）
+
+        Returns:
+            np.ndarray 或 None（索引帮不上忙）
+        """
+        with self._lock:
+            offsets = self.candidates(keyword)
+        if offsets is None:
+            return None
+        offsets = np.asarray(offsets)
+        if offsets.size and (start_time is not None or end_time is not None):
+            # 时间索引先把候选行限制在时间范围对应的字节区间
+            index = get_time_index(self.log_file)
+            index.refresh()
+            lo, _, _, hi = index.span(start_time, end_time)
+            offsets = offsets[(offsets >= lo) & (offsets < hi)]
+        return offsets
+
+
+def read_candidates(log_file, offsets, needle, start_s=None, end_s=None):
+    """按候选行首位置读取各行，确认包含关键词且在时间范围内
+
+    Args:
+        offsets: 候选行首位置（有序）
+        needle: 小写的关键词 bytes
+        start_s / end_s: b"YYYY-MM-DD HH:MM:SS"，为空表示不限
+
+    Returns:
+        (行首位置列表, 匹配行拼接成的 bytes)，与 log_grep.scan_bytes 相同
+    """
+    hits, lines = [], []
+    for off, line in _candidate_lines(log_file, offsets):
+        incr("bytes_read.logs", len(line))
+        if needle not in line.lower():
+            continue
+        if start_s or end_s:
+            match = TIMESTAMP_RE.search(line)
+            if match:
+                stamp = match.group(0)
+                if (start_s and stamp < start_s) or (end_s and stamp > end_s):
+                    continue
+        hits.append(off)
+        lines.append(line)
+    return hits, b"".join(lines)
+
+
+def _candidate_lines(log_file, offsets):
+    """逐个返回 (行首位置, 行 bytes)；压缩文件只解压候选行所在的块"""
+    if is_compressed(log_file):
+        try:
+            reader = BlockReader(log_file)
+        except (OSError, ValueError):
+            return
+        with reader:
+            for off in offsets.tolist():
+                if off >= reader.size:
+                    break
+                reader.seek(off)
+                yield off, reader.readline()
+        return
+    try:
+        f = open(log_file, "rb")
+    except OSError:
+        return
+    with f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            for off in offsets.tolist():
+                if off >= size:
+                    break
+                end = mm.find(b"\n", off) + 1 or size
+                yield off, mm[off:end]
+
+
+class LogCursor:
+    """搜索结果游标：只保存每段的匹配行数，按页取结果时重新读取所在的段
+
+    段是 log_grep 的扫描任务（("scan", task)），或倒排索引的一批候选位置
+    （("index", 文件, 位置数组, 关键词, 起, 止)）。总数由各段计数得到，不保留匹配行；
+    翻页只读取页面所在的段（缓存最近一段），只解码这一页的行。导出按段逐块返回原始字节。
+    段的字节区间在创建时确定，之后追加到正在写入的文件的内容不在结果里。
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        self._counts = None
+        self._cached = (None, None)
+
+    def _execute(self, indexes):
+        """按顺序执行指定的段，逐个返回 (段号, (行首位置列表, 匹配行 bytes))；连续的扫描段交给进程池"""
+        batch = []
+        for i in indexes:
+            segment = self.segments[i]
+            if segment[0] == "scan":
+                batch.append(i)
+                continue
+            if batch:
+                yield from zip(batch, run_tasks([self.segments[j][1] for j in batch]))
+                batch = []
+            yield i, read_candidates(*segment[1:])
+        if batch:
+            yield from zip(batch, run_tasks([self.segments[j][1] for j in batch]))
+
+    def counts(self):
+        """各段的匹配行数（首次调用时统计）"""
+        if self._counts is None:
+            counts = [0] * len(self.segments)
+            scans = [i for i, segment in enumerate(self.segments) if segment[0] == "scan"]
+            for i, n in zip(scans, count_tasks([self.segments[i][1] for i in scans])):
+                counts[i] = n
+            for i, segment in enumerate(self.segments):
+                if segment[0] == "index":
+                    counts[i] = len(read_candidates(*segment[1:])[0])
+            self._counts = counts
+        return self._counts
+
+    def total(self):
+        return sum(self.counts())
+
+    def _segment(self, i):
+        """第 i 段的匹配行 bytes 及各行在其中的起始位置（缓存最近一段）"""
+        if self._cached[0] != i:
+            _, (_, blob) = next(self._execute([i]))
+            newlines = np.flatnonzero(np.frombuffer(blob, dtype=np.uint8) == 10)
+            starts = np.concatenate(([0], newlines + 1))
+            if starts[-1] < len(blob):
+                # 最后是还没写完的半行
+                starts = np.append(starts, len(blob))
+            self._cached = (i, (blob, starts))
+        return self._cached[1]
+
+    def page(self, number, size):
+        """第 number 页（从 0 开始，每页 size 行），只解码这一页的行"""
+        counts = self.counts()
+        skip = number * size
+        lines = []
+        for i, n in enumerate(counts):
+            if skip >= n:
+                skip -= n
+                continue
+            blob, starts = self._segment(i)
+            stop = min(skip + size - len(lines), len(starts) - 1)
+            lines.extend(decode_lines(blob[starts[skip]:starts[stop]]))
+            skip = 0
+            if len(lines) >= size:
+                break
+        return lines
+
+    def iter_bytes(self):
+        """逐段返回匹配行的原始字节（用于导出，内存中只保留一段）"""
+        counts = self._counts
+        indexes = [i for i in range(len(self.segments)) if counts is None or counts[i]]
+        for _, (_, blob) in self._execute(indexes):
+            if blob:
+                yield blob
+
+    def iter_lines(self):
+        for blob in self.iter_bytes():
+            yield from decode_lines(blob)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+# 后台补建索引同一时间只处理一个文件
+_build_lock = threading.Lock()
+
+
+def get_token_index(log_file):
+    """获取日志文件的倒排索引（进程内共享）"""
+    with _indexes_lock:
+        index = _indexes.get(log_file)
+        if index is None:
+            index = _indexes[log_file] = TokenIndex(log_file)
+        return index
+
+
+def open_cursor(log_files, start_time=None, end_time=None, keyword="", regex=False):
+    """按关键词和时间范围搜索多个日志文件，返回结果游标（此时还没有读取结果）
+
+    有关键词时先查倒排索引，索引不适用的关键词（只含高频词或数字）、索引还在后台补建的文件
+    和正则表达式按字节全文扫描（log_grep）。
+
+    Args:
+        log_files: 日志文件路径列表
+        start_time / end_time: datetime，为空表示不限
+        keyword: 关键词（不区分大小写），为空时返回时间范围内的全部行
+        regex: keyword 是否为正则表达式
+
+    Returns:
+        LogCursor
+
+    Raises:
+        re.error: 正则表达式无效
+    """
+    matcher = compile_matcher(keyword, regex)
+    start_s = start_time.strftime(TIMESTAMP_FORMAT).encode("ascii") if start_time is not None else None
+    end_s = end_time.strftime(TIMESTAMP_FORMAT).encode("ascii") if end_time is not None else None
+    needle = keyword.encode("utf-8").lower()
+    segments = []
+    for log_file in log_files:
+        offsets = None
+        if keyword and not regex:
+            index = get_token_index(log_file)
+            if index.ready():
+                offsets = index.search(keyword, start_time, end_time)
+        if offsets is None:
+            segments.extend(("scan", task) for task in plan_tasks([log_file], matcher, start_time, end_time))
+        else:
+            for i in range(0, offsets.size, INDEX_BLOCK):
+                segments.append(("index", log_file, offsets[i:i + INDEX_BLOCK], needle, start_s, end_s))
+    return LogCursor(segments)
+
+
+@timed()
+def search_logs(log_files, start_time=None, end_time=None, keyword="", regex=False):
+    """open_cursor 的行列表形式
+
+    Returns:
+        list: 日志行列表
+    """
+    return list(open_cursor(log_files, start_time, end_time, keyword, regex).iter_lines())
+
+
+def build_indexes(log_dir):
+    """压缩较早的轮转文件，为目录下的全部日志文件建索引（可在收盘后定时执行）"""
+    for path in compress_rotated(log_dir):
+        print(f"{os.path.basename(path)}: 已压缩")
+    names = set()
+    for name in sorted(os.listdir(log_dir)):
+        path = os.path.join(log_dir, name)
+        if not os.path.isfile(path) or not (name.endswith(".log") or live_name(path) or is_compressed(path)):
+            continue
+        names.add(name)
+        get_time_index(path).refresh()
+        size = get_token_index(path).refresh()
+        print(f"{name}: {size / 1024 / 1024:.1f} MB")
+    prune_indexes(default_index_dir(os.path.join(log_dir, "main.log")), names)
+
+
+def prune_indexes(index_dir, names):
+    """删除日志文件已不存在（如压缩后原文件已删除）的索引文件"""
+    try:
+        entries = os.listdir(index_dir)
+    except OSError:
+        return
+    for entry in entries:
+        for suffix in (".tidx.npz", ".kidx.json", ".kidx.npy"):
+            if entry.endswith(suffix) and entry[:-len(suffix)] not in names:
+                try:
+                    os.remove(os.path.join(index_dir, entry))
+                except OSError:
+                    pass
+
+
+if __name__ == "__main__":
+    from config import QMT_LOG_DIR
+    build_indexes(sys.argv[1] if len(sys.argv) > 1 else QMT_LOG_DIR)
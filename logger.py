@@ -1,29 +1,251 @@
 import logging
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 import os
+import json
+import queue
+import atexit
+import threading
+from config import LOG_STRUCTURED, LOG_QUEUE_SIZE
+from log_blocks import compress_rotated
+from metrics import incr, gauge
+
+# 异步日志：logger.info 等只把记录放进队列（不格式化、不写文件），由后台线程取出后格式化写入，
+# 每取出一批（最多 BATCH_SIZE 条）统一 flush 一次。队列满时丢弃新记录并计数（log_dropped），
+# 后台线程随后写一条警告说明丢弃了多少条。
+# config.LOG_STRUCTURED 为 True 时日志文件改为 JSON 行，字段见 STRUCTURED_FIELDS，
+# 其中 event / code / strategy / order_id / latency 通过 extra 传入：
+#   logger.info("买入 600000.SH", extra={"event": "buy", "code": "600000.SH", "strategy": "网格"})
+# 终端输出始终为文本格式。
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+STRUCTURED_FIELDS = ("ts", "level", "event", "code", "strategy", "order_id", "latency")
+# 后台线程每批最多处理的记录数
+BATCH_SIZE = 256
+# 停止时等待队列腾出位置、等待写线程写完的最长时间（秒）
+STOP_TIMEOUT = 5
+# 放入队列通知写线程结束
+_STOP = object()
 
 # 创建日志目录
 log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 
+
+class JsonLinesFormatter(logging.Formatter):
+    """JSON 行格式：固定字段 + msg（日志正文，异常堆栈附在后面）"""
+
+    def format(self, record):
+        entry = {"ts": self.formatTime(record), "level": record.levelname}
+        for field in STRUCTURED_FIELDS[2:]:
+            entry[field] = getattr(record, field, None)
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            message = f"{message}\n{record.exc_text}"
+        entry["msg"] = message
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _BatchFlush:
+    """写入后不立即 flush，由后台线程每批写完调用 flush_batch"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BatchStreamHandler(_BatchFlush, logging.StreamHandler):
+    pass
+
+
+class BatchFileHandler(_BatchFlush, logging.FileHandler):
+    pass
+
+
+class BatchRotatingFileHandler(_BatchFlush, TimedRotatingFileHandler):
+    pass
+
+
+class DropQueueHandler(QueueHandler):
+    """队列满时不阻塞调用方，丢弃记录并计数"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # 只在调用方线程合并参数（参数对象之后可能被修改），格式化和异常堆栈留给写线程；
+        # 队列在进程内，不需要像默认实现那样复制记录
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.count_dropped()
+
+    def count_dropped(self):
+        with self._lock:
+            self.dropped += 1
+        incr("log_dropped")
+
+
+class BatchQueueListener(QueueListener):
+    """后台写线程：一次取出队列中已有的记录（最多 BATCH_SIZE 条）逐条写入，整批写完再 flush
+
+    只使用 QueueListener 的公开接口（dequeue / handle），写线程由 start / stop 自己管理。
+    """
+
+    def __init__(self, log_queue, *handlers, source=None):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.source = source
+        self.reported = 0
+        self._writer = None
+
+    def start(self):
+        self._writer = threading.Thread(target=self._write_batches, name="log-writer", daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        """写完队列中剩余的记录后停止写线程（队列满时先等写线程腾出位置，超时则丢弃最早的一条）"""
+        if self._writer is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=STOP_TIMEOUT)
+        except queue.Full:
+            # 写线程一直没有腾出位置：丢弃最早的记录，直到放得下结束标记
+            while True:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    if self.source is not None:
+                        self.source.count_dropped()
+                except queue.Empty:
+                    pass
+                try:
+                    self.queue.put_nowait(_STOP)
+                    break
+                except queue.Full:
+                    continue
+        self._writer.join(STOP_TIMEOUT)
+        self._writer = None
+
+    def _write_batches(self):
+        q = self.queue
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            stop = False
+            for record in batch:
+                if record is _STOP:
+                    stop = True
+                else:
+                    self.handle(record)
+            self._report_dropped()
+            for handler in self.handlers:
+                try:
+                    getattr(handler, "flush_batch", handler.flush)()
+                except (OSError, ValueError):
+                    # 终端或文件已关闭（进程退出时）
+                    pass
+            for _ in batch:
+                q.task_done()
+            gauge("log_queue_depth", q.qsize())
+            if stop:
+                break
+
+    def _report_dropped(self):
+        dropped = self.source.dropped if self.source is not None else 0
+        if dropped > self.reported:
+            record = logging.LogRecord(self.source.name or "logger", logging.WARNING, __file__, 0,
+                                       "日志队列已满，已丢弃 %d 条日志", (dropped - self.reported,), None)
+            self.reported = dropped
+            self.handle(record)
+
+
+def rotate_and_compress(source, dest):
+    """轮转时改名，并在后台把更早的轮转文件分块压缩（见 log_blocks），最近一个轮转文件保持原样"""
+    if os.path.exists(source):
+        os.rename(source, dest)
+    threading.Thread(target=compress_rotated, args=(os.path.dirname(dest),), name="log-compress",
+                     daemon=True).start()
+
+
+_listeners = {}
+
+
+def setup_logger(name, log_file, rotate=True, fmt=TEXT_FORMAT, structured=None, console=True):
+    """创建异步日志记录器（同名只创建一次）
+
+    Args:
+        name: logging 记录器名称
+        log_file: 日志文件路径
+        rotate: 是否按天轮转（文件名后缀 YYYYMMDD，较早的轮转文件自动压缩）
+        fmt: 文本格式
+        structured: 日志文件是否写 JSON 行，为空时取 config.LOG_STRUCTURED
+        console: 是否同时输出到终端
+    """
+    log = logging.getLogger(name)
+    if name in _listeners:
+        return log
+    handlers = []
+    if console:
+        console_handler = BatchStreamHandler()
+        console_handler.setFormatter(logging.Formatter(fmt))
+        handlers.append(console_handler)
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    if rotate:
+        file_handler = BatchRotatingFileHandler(
+            log_file,
+            when='midnight',  # 每天午夜轮转
+            interval=1,       # 间隔为1天
+            backupCount=30,   # 保留30天的日志
+            encoding='utf-8'
+        )
+        file_handler.suffix = "%Y%m%d"  # 设置日志文件后缀格式为YYYYMMDD
+        file_handler.rotator = rotate_and_compress
+    else:
+        file_handler = BatchFileHandler(log_file, encoding='utf-8')
+    structured = LOG_STRUCTURED if structured is None else structured
+    file_handler.setFormatter(JsonLinesFormatter() if structured else logging.Formatter(fmt))
+    handlers.append(file_handler)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = DropQueueHandler(log_queue)
+    queue_handler.set_name(name)
+    listener = BatchQueueListener(log_queue, *handlers, source=queue_handler)
+    listener.start()
+    # 进程退出前把队列中剩余的记录写完
+    atexit.register(listener.stop)
+    _listeners[name] = listener
+
+    log.setLevel(logging.INFO)
+    log.addHandler(queue_handler)
+    return log
+
+
+def flush_logs():
+    """等待已进入队列的日志全部写入（测试、进程退出前使用）"""
+    for listener in _listeners.values():
+        listener.queue.join()
+
+
+def log_stats():
+    """各记录器的队列积压和丢弃条数"""
+    return {name: {"queued": listener.queue.qsize(), "dropped": listener.source.dropped}
+            for name, listener in _listeners.items()}
+
+
 # 创建主日志记录器
-logger = logging.getLogger('main')
-logger.setLevel(logging.INFO)
-
-# 创建终端输出处理器
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logger.addHandler(console_handler)
-
-# 主日志文件处理器（按天轮转）
-main_handler = TimedRotatingFileHandler(
-    os.path.join(log_dir, 'main.log'),
-    when='midnight',  # 每天午夜轮转
-    interval=1,       # 间隔为1天
-    backupCount=30,   # 保留30天的日志
-    encoding='utf-8'
-)
-main_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-main_handler.suffix = "%Y%m%d"  # 设置日志文件后缀格式为YYYYMMDD
-logger.addHandler(main_handler)
+logger = setup_logger('main', os.path.join(log_dir, 'main.log'))
@@ -0,0 +1,245 @@
+# logs_helper.py - 日志查询辅助函数
+"""
+日志查询页面（pages/3_logs.py）使用的文件定位、读取和过滤函数，放在页面外以便复用和压测。
+较早的轮转文件可能已分块压缩为 <文件名>.gz（见 log_blocks），读取时只解压需要的块。
+logger.py 开启 config.LOG_STRUCTURED 后写出的 JSON 行按字段解析（见 parse_structured_line）。
+"""
+import os
+import re
+import gzip
+import json
+import time
+import tempfile
+import pandas as pd
+import streamlit as st
+from collections import deque
+from datetime import datetime, timedelta
+from log_grep import grep_lines
+from log_blocks import BlockReader, BLOCK_SIZE, SUFFIX, is_compressed
+from config import LOG_EXPORT_DIR, LOG_EXPORT_MAX_AGE
+from metrics import incr, timed
+
+# 导出文件名前缀（sweep_exports 只清理这类文件）和单个分卷的压缩后大小
+EXPORT_PREFIX = "log_export_"
+EXPORT_PART_SIZE = 32 * 1024 * 1024
+
+# logger.JsonLinesFormatter 写出的字段
+STRUCTURED_COLUMNS = ["ts", "level", "event", "code", "strategy", "order_id", "latency", "msg"]
+
+def get_log_files_in_date_range(log_base_path, log_type, start_date, end_date):
+    """获取指定日期范围内的所有日志文件
+    
+    Args:
+        log_base_path: 日志文件基础路径
+        log_type: 日志类型 ('main' 或 'tics')
+        start_date: 开始日期
+        end_date: 结束日期
+        
+    Returns:
+        list: 日期范围内的日志文件路径列表
+    """
+    log_files = []
+    
+    # 获取当前日志文件
+    current_log = os.path.join(log_base_path, f"{log_type}.log")
+    if os.path.exists(current_log):
+        log_files.append(current_log)
+    
+    # 获取历史日志文件
+    current_date = start_date
+    while current_date <= end_date:
+        date_str = current_date.strftime("%Y%m%d")
+        log_file = os.path.join(log_base_path, f"{log_type}.log.{date_str}")
+        if os.path.exists(log_file):
+            log_files.append(log_file)
+        elif os.path.exists(log_file + SUFFIX):
+            log_files.append(log_file + SUFFIX)
+        current_date += timedelta(days=1)
+    
+    return log_files
+
+@timed()
+def read_log_tail(log_file, lines=200):
+    """读取日志文件的最后N行
+    
+    Args:
+        log_file: 日志文件路径
+        lines: 要读取的行数
+        
+    Returns:
+        list: 包含日志行的列表
+    """
+    if not os.path.exists(log_file):
+        return []
+    
+    try:
+        if is_compressed(log_file):
+            return _read_compressed_tail(log_file, lines)
+        with open(log_file, 'r', encoding='utf-8') as f:
+            tail = list(deque(f, lines))
+            incr("bytes_read.logs", os.fstat(f.fileno()).st_size)
+            return tail
+    except Exception as e:
+        st.error(f"读取日志文件失败: {str(e)}")
+        return []
+
+def _read_compressed_tail(log_file, lines):
+    """压缩文件从末尾逐块向前读，够 lines 行即停，只解压最后几块"""
+    with BlockReader(log_file) as reader:
+        pos = reader.size
+        data = b""
+        while pos > 0 and data.count(b"\n") <= lines:
+            start = max(pos - BLOCK_SIZE, 0)
+            reader.seek(start)
+            data = reader.read(pos - start) + data
+            pos = start
+    incr("bytes_read.logs", len(data))
+    tail = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+    # 没读到文件开头时第一行可能不完整
+    return tail[-lines:] if pos == 0 else tail[1:][-lines:]
+
+@timed()
+def read_log_content(log_files, keyword=""):
+    """读取多个日志文件的内容并根据关键词过滤
+    
+    Args:
+        log_files: 日志文件路径列表
+        keyword: 关键词过滤（不区分大小写）
+        
+    Returns:
+        list: 包含日志行的列表
+    """
+    if keyword:
+        # 按字节扫描，只解码匹配的行
+        return grep_lines(log_files, keyword)
+
+    all_lines = []
+    
+    for log_file in log_files:
+        try:
+            opener = gzip.open if is_compressed(log_file) else open
+            with opener(log_file, 'rt', encoding='utf-8') as f:
+                # 没有关键词，读取所有行
+                all_lines.extend(f.readlines())
+                incr("bytes_read.logs", os.fstat(f.fileno()).st_size)
+        except Exception as e:
+            st.error(f"读取日志文件 {log_file} 失败: {str(e)}")
+    
+    return all_lines
+
+def parse_log_line(line):
+    """解析日志行，提取时间戳和内容
+    
+    Args:
+        line: 日志行文本
+        
+    Returns:
+        tuple: (时间戳, 日志内容)
+    """
+    entry = parse_structured_line(line)
+    if entry is not None:
+        return str(entry.get("ts") or "")[:19], str(entry.get("msg") or "").strip()
+    # 尝试匹配常见的时间戳格式
+    timestamp_match = re.search(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})', line)
+    if timestamp_match:
+        timestamp = timestamp_match.group(1)
+        content = line[timestamp_match.end():].strip()
+        return timestamp, content
+    return "", line.strip()
+
+def parse_structured_line(line):
+    """解析 JSON 格式的日志行（logger.JsonLinesFormatter），不是 JSON 行时返回 None"""
+    if not line.startswith("{"):
+        return None
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) else None
+
+def structured_frame(log_lines):
+    """日志行中的 JSON 行 -> 字段表（ts/level/event/code/strategy/order_id/latency/msg），没有时返回空表"""
+    entries = [entry for entry in map(parse_structured_line, log_lines) if entry is not None]
+    return pd.DataFrame(entries, columns=STRUCTURED_COLUMNS)
+
+@timed()
+def filter_logs_by_time(log_lines, start_time=None, end_time=None):
+    """根据时间范围过滤日志
+    
+    Args:
+        log_lines: 日志行列表
+        start_time: 开始时间
+        end_time: 结束时间
+        
+    Returns:
+        list: 过滤后的日志行
+    """
+    filtered_lines = []
+    
+    for line in log_lines:
+        timestamp, content = parse_log_line(line)
+        
+        # 时间范围过滤
+        if timestamp:
+            try:
+                log_time = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+                if start_time and log_time < start_time:
+                    continue
+                if end_time and log_time > end_time:
+                    continue
+            except:
+                pass  # 如果时间解析失败，不进行时间过滤
+                
+        filtered_lines.append(line)
+    
+    return filtered_lines
+
+def export_dir():
+    """导出文件目录（config.LOG_EXPORT_DIR，为空时为系统临时目录下的 qmt_log_exports）"""
+    path = LOG_EXPORT_DIR or os.path.join(tempfile.gettempdir(), "qmt_log_exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def sweep_exports(max_age=LOG_EXPORT_MAX_AGE, now=None):
+    """删除导出目录中超过 max_age 秒的导出文件（会话结束时没能删除的文件由这里清理），返回删除的个数"""
+    now = now or time.time()
+    removed = 0
+    for entry in os.scandir(export_dir()):
+        if not entry.name.startswith(EXPORT_PREFIX):
+            continue
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+@timed()
+def export_log_cursor(cursor, part_size=EXPORT_PART_SIZE):
+    """把搜索结果（log_search.LogCursor）逐段写入导出目录下的 gzip 文件，返回文件路径列表
+
+    结果按段流式写出，内存中只保留一段；压缩后超过 part_size 字节时换下一个文件（分卷），
+    页面每次只把一个分卷交给下载按钮。先清理过期的导出文件；由调用方在不再需要时删除返回的文件。
+    """
+    sweep_exports()
+    paths = []
+    raw = out = None
+    try:
+        for chunk in cursor.iter_bytes():
+            if out is None:
+                fd, path = tempfile.mkstemp(prefix=EXPORT_PREFIX, suffix=".txt.gz", dir=export_dir())
+                paths.append(path)
+                raw = os.fdopen(fd, "wb")
+                out = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+            out.write(chunk)
+            incr("bytes_written.log_export", len(chunk))
+            if raw.tell() >= part_size:
+                out.close()
+                raw.close()
+                raw = out = None
+    finally:
+        if out is not None:
+            out.close()
+            raw.close()
+    return paths
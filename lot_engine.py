@@ -0,0 +1,337 @@
+# lot_engine.py - 持仓批次与盈亏重建
+"""
+按成交历史重放持仓批次（lot），计算每笔平仓的已实现盈亏、持有天数以及当前未平仓批次。
+
+- method="fifo"：先进先出匹配
+- method="average"：移动平均成本，每个代码只保留一个合并批次
+
+每个代码的批次存放在可增长的 NumPy 数组里（数量/价格/开仓日），卖出时用累加和 +
+searchsorted 一次性确定要消耗的批次。状态按日落盘为检查点，新一天的成交只在检查点上增量应用；
+检查点记录每个已应用日期在快照库中的版本号，较早的日期被补录或改写时从头重放。
+"""
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from logger import logger
+from postmarket_helper import read_store_trades, strategy_of
+
+CHECKPOINT_VERSION = 3
+
+REALIZED_COLUMNS = ["StockCode", "Strategy", "开仓日期", "平仓日期", "数量", "开仓价", "平仓价", "已实现盈亏", "持有天数"]
+
+
+class _SymbolLots:
+    """单个代码的批次队列（环形使用的数组 + head/tail 指针）"""
+
+    __slots__ = ("qty", "price", "day", "head", "tail")
+
+    def __init__(self, capacity=8):
+        self.qty = np.zeros(capacity, dtype="float64")
+        self.price = np.zeros(capacity, dtype="float64")
+        self.day = np.zeros(capacity, dtype="datetime64[D]")
+        self.head = 0
+        self.tail = 0
+
+    def _ensure_capacity(self):
+        if self.tail < self.qty.size:
+            return
+        # 先压缩已消耗部分，空间仍不够再翻倍
+        n = self.tail - self.head
+        size = self.qty.size * 2 if n * 2 > self.qty.size else self.qty.size
+        for name in ("qty", "price", "day"):
+            old = getattr(self, name)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:n] = old[self.head:self.tail]
+            setattr(self, name, new)
+        self.head, self.tail = 0, n
+
+    def copy(self):
+        """只复制未消耗的部分"""
+        n = self.tail - self.head
+        other = _SymbolLots(max(n * 2, 8))
+        other.qty[:n] = self.qty[self.head:self.tail]
+        other.price[:n] = self.price[self.head:self.tail]
+        other.day[:n] = self.day[self.head:self.tail]
+        other.tail = n
+        return other
+
+    def push(self, qty, price, day):
+        self._ensure_capacity()
+        self.qty[self.tail] = qty
+        self.price[self.tail] = price
+        self.day[self.tail] = day
+        self.tail += 1
+
+    def open_volume(self):
+        return float(self.qty[self.head:self.tail].sum())
+
+    def consume(self, volume):
+        """按 FIFO 消耗 volume 股，返回被消耗部分的 (数量, 开仓价, 开仓日) 数组和未匹配数量"""
+        qty = self.qty[self.head:self.tail]
+        if qty.size == 0:
+            return np.empty(0), np.empty(0), np.empty(0, dtype="datetime64[D]"), volume
+
+        cum = np.cumsum(qty)
+        # 第一个累计量 >= volume 的批次是最后一个被（部分）消耗的批次
+        last = int(np.searchsorted(cum, volume, side="left"))
+        if last >= qty.size:
+            used = qty.copy()
+            price = self.price[self.head:self.tail].copy()
+            day = self.day[self.head:self.tail].copy()
+            self.head = self.tail
+            return used, price, day, volume - float(cum[-1])
+
+        used = qty[:last + 1].copy()
+        used[-1] = volume - (cum[last - 1] if last > 0 else 0.0)
+        price = self.price[self.head:self.head + last + 1].copy()
+        day = self.day[self.head:self.head + last + 1].copy()
+
+        remain = cum[last] - volume
+        self.head += last
+        if remain > 0:
+            self.qty[self.head] = remain
+        else:
+            self.head += 1
+        return used, price, day, 0.0
+
+    def average(self, qty, price, day):
+        """平均成本模式下合并为单个批次，开仓日按数量加权"""
+        if self.tail == self.head:
+            self.push(qty, price, day)
+            return
+        i = self.head
+        total = self.qty[i] + qty
+        self.price[i] = (self.qty[i] * self.price[i] + qty * price) / total
+        base = self.day[i]
+        offset = (day - base).astype("int64") * qty / total
+        self.day[i] = base + np.timedelta64(int(round(float(offset))), "D")
+        self.qty[i] = total
+
+
+class LotEngine:
+    """持仓批次引擎"""
+
+    def __init__(self, method="fifo"):
+        if method not in ("fifo", "average"):
+            raise ValueError(f"不支持的成本计算方式: {method}")
+        self.method = method
+        self.lots = {}
+        self.realized = {col: [] for col in REALIZED_COLUMNS}
+        self.unmatched_volume = {}
+        self.last_date = ""
+        # 已应用的日期 -> 快照库版本号
+        self.versions = {}
+        # overlay 产生的引擎：基础引擎及仍与它共用的批次
+        self._base = None
+        self._shared = set()
+
+    def overlay(self):
+        """在当前状态上叠加一层用于应用新成交，当前引擎不受影响
+
+        批次按代码写时复制（只复制被新成交改动的代码），已实现盈亏只记录新增部分，
+        代价与新成交涉及的代码数成正比，而不是整个引擎的大小。
+        """
+        live = LotEngine(self.method)
+        live.lots = dict(self.lots)
+        live.unmatched_volume = dict(self.unmatched_volume)
+        live.last_date = self.last_date
+        live.versions = dict(self.versions)
+        live._base = self
+        live._shared = set(self.lots)
+        return live
+
+    def _detach(self):
+        """把 overlay 合并成独立的引擎（已实现盈亏并入自身）；仍共用的批次保持写时复制"""
+        if self._base is None:
+            return
+        base = self._base
+        base._detach()
+        self.realized = {col: base.realized[col] + self.realized[col] for col in REALIZED_COLUMNS}
+        self._base = None
+
+    # ---------- 成交重放 ----------
+    def apply(self, trades):
+        """按时间顺序应用一批成交（read_store_trades / load_history_trades 的输出）"""
+        if trades.empty:
+            return
+        trades = trades.sort_values(["日期", "TradeTime"], kind="stable")
+        codes = trades["StockCode"].astype(str).to_numpy()
+        sides = trades["TradeType"].astype(str).to_numpy()
+        volumes = pd.to_numeric(trades["Volume"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        prices = pd.to_numeric(trades["Price"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        days = pd.to_datetime(trades["日期"].astype(str), format="%Y%m%d").to_numpy().astype("datetime64[D]")
+        strategies = strategy_of(trades).to_numpy()
+
+        realized = self.realized
+        for code, side, volume, price, day, strategy in zip(codes, sides, volumes, prices, days, strategies):
+            if volume <= 0:
+                continue
+            lots = self.lots.get(code)
+            if lots is None:
+                lots = self.lots[code] = _SymbolLots()
+            elif code in self._shared:
+                lots = self.lots[code] = lots.copy()
+                self._shared.discard(code)
+
+            if side == "buy":
+                if self.method == "fifo":
+                    lots.push(volume, price, day)
+                else:
+                    lots.average(volume, price, day)
+            elif side == "sell":
+                used, open_price, open_day, unmatched = lots.consume(volume)
+                if unmatched > 0:
+                    # 历史起点之前的持仓，无法确定成本
+                    self.unmatched_volume[code] = self.unmatched_volume.get(code, 0.0) + unmatched
+                n = used.size
+                if n == 0:
+                    continue
+                realized["StockCode"].extend([code] * n)
+                realized["Strategy"].extend([strategy] * n)
+                realized["开仓日期"].extend(open_day)
+                realized["平仓日期"].extend([day] * n)
+                realized["数量"].extend(used)
+                realized["开仓价"].extend(open_price)
+                realized["平仓价"].extend([price] * n)
+                realized["已实现盈亏"].extend((price - open_price) * used)
+                realized["持有天数"].extend((day - open_day).astype("int64"))
+
+        self.last_date = max(self.last_date, str(trades["日期"].iloc[-1]))
+
+    # ---------- 结果 ----------
+    def realized_lots(self):
+        """每笔平仓（按批次拆分）的已实现盈亏"""
+        df = pd.DataFrame(self.realized, columns=REALIZED_COLUMNS)
+        if self._base is not None:
+            base = self._base.realized_lots()
+            df = pd.concat([base, df], ignore_index=True) if not df.empty else base
+        if not df.empty:
+            df["开仓日期"] = pd.to_datetime(df["开仓日期"])
+            df["平仓日期"] = pd.to_datetime(df["平仓日期"])
+        return df
+
+    def realized_by_symbol(self):
+        """按代码汇总已实现盈亏、胜率和平均持有天数"""
+        df = self.realized_lots()
+        if df.empty:
+            return pd.DataFrame(columns=["平仓笔数", "已实现盈亏", "胜率", "平均持有天数"])
+        grouped = df.groupby("StockCode")
+        result = pd.DataFrame({
+            "平仓笔数": grouped.size(),
+            "已实现盈亏": grouped["已实现盈亏"].sum(),
+            "胜率": (df["已实现盈亏"] > 0).groupby(df["StockCode"]).mean(),
+            "平均持有天数": grouped["持有天数"].mean(),
+        })
+        return result.sort_values("已实现盈亏", ascending=False)
+
+    def open_lots(self, last_prices=None):
+        """当前未平仓批次
+
+        Args:
+            last_prices: 可选，{代码: 最新价}，提供时计算未实现盈亏
+        """
+        frames = []
+        for code, lots in self.lots.items():
+            n = lots.tail - lots.head
+            if n == 0:
+                continue
+            frames.append(pd.DataFrame({
+                "StockCode": code,
+                "开仓日期": lots.day[lots.head:lots.tail],
+                "数量": lots.qty[lots.head:lots.tail],
+                "开仓价": lots.price[lots.head:lots.tail],
+            }))
+        if not frames:
+            return pd.DataFrame(columns=["StockCode", "开仓日期", "数量", "开仓价", "未实现盈亏"])
+        df = pd.concat(frames, ignore_index=True)
+        df["开仓日期"] = pd.to_datetime(df["开仓日期"])
+        if last_prices:
+            last = df["StockCode"].map(last_prices).astype("float64")
+            df["未实现盈亏"] = (last - df["开仓价"]) * df["数量"]
+        return df
+
+
+def _checkpoint_path(data_dir, method):
+    return os.path.join(data_dir, f"lot_engine_{method}.pkl")
+
+
+def _load_checkpoint(path, method):
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                version, engine = pickle.load(f)
+            if version == CHECKPOINT_VERSION and engine.method == method:
+                return engine
+        except Exception:
+            pass
+    return LotEngine(method)
+
+
+def _save_checkpoint(path, engine):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump((CHECKPOINT_VERSION, engine), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+_engines = {}
+# 最新一天叠加后的引擎：path -> ((日期, 版本号), 基础引擎, 引擎)
+_live = {}
+_lock = threading.Lock()
+
+
+def update_lot_engine(data_dir, store, method="fifo"):
+    """增量更新批次引擎
+
+    检查点只覆盖到倒数第二个交易日；最新一天（可能仍在被改写）叠加在检查点上重放，
+    同一版本的最新一天只重放一次。已入检查点的日期被改写或删除、或者补录了检查点之前的日期时，从头重放。
+
+    Args:
+        data_dir: 账户数据目录，检查点保存在这里
+        store: 快照库（调用方负责 sync_store）
+        method: "fifo" 或 "average"
+
+    Returns:
+        LotEngine: 包含最新一天成交的引擎（调用方只读）
+    """
+    path = _checkpoint_path(data_dir, method)
+    versions = store.versions("trades")
+    dates = sorted(versions)
+
+    with _lock:
+        base = _engines.get(path) or _load_checkpoint(path, method)
+
+        changed = [d for d, v in base.versions.items() if versions.get(d) != v]
+        backfilled = [d for d in dates if d <= base.last_date and d not in base.versions]
+        if changed or backfilled:
+            logger.info(f"成交历史有变化（改写/删除 {len(changed)} 天，补录 {len(backfilled)} 天），批次引擎从头重放")
+            base = LotEngine(method)
+
+        committed = [d for d in dates[:-1] if d not in base.versions]
+        if committed:
+            # 已返回给调用方的引擎可能仍与 base 共用批次，新的检查点叠加在上面生成，不修改 base
+            trades = read_store_trades(store, start=committed[0], end=committed[-1])
+            base = base.overlay()
+            base.apply(trades[trades["日期"].isin(committed)])
+            base._detach()
+            for d in committed:
+                base.versions[d] = versions[d]
+            base.last_date = max(base.last_date, committed[-1])
+            _save_checkpoint(path, base)
+        _engines[path] = base
+
+        if not dates or dates[-1] in base.versions:
+            return base
+        latest = dates[-1]
+        key = (latest, versions[latest])
+        cached = _live.get(path)
+        if cached and cached[0] == key and cached[1] is base:
+            return cached[2]
+        live = base.overlay()
+        live.apply(read_store_trades(store, start=latest))
+        live.versions[latest] = versions[latest]
+        live.last_date = max(live.last_date, latest)
+        _live[path] = (key, base, live)
+        return live
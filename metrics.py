@@ -0,0 +1,305 @@
+# metrics.py - 进程内性能埋点
+"""
+热点路径的轻量埋点：耗时（计时装饰器/上下文）、计数器、仪表值，以及 Streamlit 缓存命中率。
+
+- 耗时进入 order_lifecycle.LatencyHistogram（对数分桶，固定内存），可随时读取 p50/p95/p99
+- 计数器用于调用次数、读取字节数等，调用频率按进程运行时长和最近一分钟两种口径计算
+- config.METRICS_ENABLED 为 False 时装饰器直接返回原函数、上下文返回空对象，没有额外开销
+- 汇总结果在 pages/7_performance.py 展示；设置 config.METRICS_PORT 后另外以
+  Prometheus 文本格式在 http://<host>:<port>/metrics 暴露
+"""
+import time
+import functools
+import threading
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+from config import METRICS_ENABLED
+from order_lifecycle import LatencyHistogram
+
+_NULL = nullcontext()
+
+
+class Timer:
+    """单个埋点的耗时统计"""
+
+    __slots__ = ("name", "hist", "errors", "minute", "minute_count", "last_minute_count", "_lock")
+
+    def __init__(self, name):
+        self.name = name
+        self.hist = LatencyHistogram()
+        self.errors = 0
+        # 当前分钟（time.monotonic() // 60）及其计数，用于最近一分钟调用频率
+        self.minute = 0
+        self.minute_count = 0
+        self.last_minute_count = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds, error=False):
+        minute = int(time.monotonic() // 60)
+        with self._lock:
+            self.hist.add(seconds)
+            if error:
+                self.errors += 1
+            if minute != self.minute:
+                self.last_minute_count = self.minute_count if minute == self.minute + 1 else 0
+                self.minute = minute
+                self.minute_count = 0
+            self.minute_count += 1
+
+    def reset(self):
+        with self._lock:
+            self.hist = LatencyHistogram()
+            self.errors = 0
+            self.minute_count = 0
+            self.last_minute_count = 0
+
+
+class _TimerContext:
+    """每次进入创建一个，避免同一 Timer 在多线程中共用起始时间"""
+
+    __slots__ = ("timer", "started")
+
+    def __init__(self, timer):
+        self.timer = timer
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.add(time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+
+class Registry:
+    """埋点注册表（进程内单例，见模块级 registry）"""
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def timer(self, name):
+        t = self.timers.get(name)
+        if t is None:
+            with self._lock:
+                t = self.timers.setdefault(name, Timer(name))
+        return t
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def reset(self):
+        # 装饰器持有 Timer 引用，计时器原地清零而不是移除
+        for t in list(self.timers.values()):
+            t.reset()
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.started = time.monotonic()
+
+    def uptime(self):
+        return time.monotonic() - self.started
+
+    def timers_frame(self):
+        """各埋点的耗时统计（毫秒）"""
+        uptime = max(self.uptime(), 1e-9)
+        minute = int(time.monotonic() // 60)
+        rows = []
+        for name, t in sorted(self.timers.items()):
+            with t._lock:
+                stats = t.hist.to_dict()
+                recent = t.last_minute_count if minute == t.minute + 1 else (
+                    t.minute_count if minute == t.minute else 0)
+                errors = t.errors
+            # 分位数取桶上沿，不超过实际最大值
+            ms = {k: (min(stats[k], stats["max"]) * 1000 if stats[k] is not None else None)
+                  for k in ("mean", "p50", "p95", "p99", "max")}
+            rows.append({
+                "埋点": name,
+                "调用次数": stats["count"],
+                "失败次数": errors,
+                "平均(ms)": ms["mean"],
+                "p50(ms)": ms["p50"],
+                "p95(ms)": ms["p95"],
+                "p99(ms)": ms["p99"],
+                "最大(ms)": ms["max"],
+                "总耗时(s)": t.hist.sum,
+                "调用/秒": stats["count"] / uptime,
+                "最近一分钟调用": recent,
+            })
+        return pd.DataFrame(rows)
+
+    def cache_frame(self):
+        """Streamlit 缓存命中率（cache.<name>.calls / cache.<name>.miss 计数器）"""
+        rows = []
+        for key, calls in sorted(self.counters.items()):
+            if not (key.startswith("cache.") and key.endswith(".calls")):
+                continue
+            name = key[len("cache."):-len(".calls")]
+            misses = self.counters.get(f"cache.{name}.miss", 0)
+            hits = max(calls - misses, 0)
+            rows.append({
+                "缓存": name,
+                "调用次数": calls,
+                "命中": hits,
+                "未命中": misses,
+                "命中率": hits / calls if calls else None,
+            })
+        return pd.DataFrame(rows)
+
+    def counters_frame(self):
+        """其他计数器（读取字节数等）和仪表值"""
+        uptime = max(self.uptime(), 1e-9)
+        rows = [
+            {"名称": name, "类型": "counter", "值": value, "每秒": value / uptime}
+            for name, value in sorted(self.counters.items()) if not name.startswith("cache.")
+        ]
+        rows += [
+            {"名称": name, "类型": "gauge", "值": value, "每秒": None}
+            for name, value in sorted(self.gauges.items())
+        ]
+        return pd.DataFrame(rows)
+
+    def prometheus(self):
+        """Prometheus 文本格式（耗时为 summary，单位秒）"""
+        lines = []
+        errors = []
+        if self.timers:
+            lines.append("# TYPE qmt_call_seconds summary")
+        for name, t in sorted(self.timers.items()):
+            with t._lock:
+                p = t.hist.percentiles((50, 95, 99))
+                count, total, peak = t.hist.total, t.hist.sum, t.hist.max
+                errors.append((name, t.errors))
+            label = _escape(name)
+            for q in (50, 95, 99):
+                if p[q] is not None:
+                    lines.append(f'qmt_call_seconds{{name="{label}",quantile="{q / 100}"}} {min(p[q], peak)}')
+            lines.append(f'qmt_call_seconds_sum{{name="{label}"}} {total}')
+            lines.append(f'qmt_call_seconds_count{{name="{label}"}} {count}')
+        if errors:
+            lines.append("# TYPE qmt_call_errors_total counter")
+        for name, value in errors:
+            lines.append(f'qmt_call_errors_total{{name="{_escape(name)}"}} {value}')
+        if self.counters:
+            lines.append("# TYPE qmt_counter_total counter")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'qmt_counter_total{{name="{_escape(name)}"}} {value}')
+        if self.gauges:
+            lines.append("# TYPE qmt_gauge gauge")
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f'qmt_gauge{{name="{_escape(name)}"}} {value}')
+        lines.append("# TYPE qmt_uptime_seconds gauge")
+        lines.append(f"qmt_uptime_seconds {self.uptime()}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+def timer(name):
+    """计时上下文：with timer("xxx"): ..."""
+    if not METRICS_ENABLED:
+        return _NULL
+    return _TimerContext(registry.timer(name))
+
+
+def timed(name=None):
+    """计时装饰器，name 默认为 模块.函数名"""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+        t = registry.timer(name or f"{func.__module__}.{func.__qualname__}")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                t.add(time.perf_counter() - started, error)
+        return wrapper
+    return decorator
+
+
+def incr(name, n=1):
+    """计数器累加"""
+    if METRICS_ENABLED:
+        registry.incr(name, n)
+
+
+def gauge(name, value):
+    """设置仪表值"""
+    if METRICS_ENABLED:
+        registry.set_gauge(name, value)
+
+
+def cached(name, cache):
+    """给 Streamlit 缓存装饰器加上命中率统计
+
+    用法：@cached("trading.get_potential_trades", st.cache_data(ttl=60))
+    外层每次调用计一次 calls，被缓存的内层函数真正执行时计一次 miss。
+    """
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return cache(func)
+
+        @functools.wraps(func)
+        def miss(*args, **kwargs):
+            registry.incr(f"cache.{name}.miss")
+            return func(*args, **kwargs)
+
+        cached_func = cache(miss)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            registry.incr(f"cache.{name}.calls")
+            return cached_func(*args, **kwargs)
+        wrapper.clear = cached_func.clear
+        return wrapper
+    return decorator
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="0.0.0.0"):
+    """在后台线程启动 /metrics 端点（重复调用只启动一次）"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -1,33 +1,74 @@
 import sys
 import time
+import numpy as np
 import pandas as pd
-from xtquant.xttrader import XtQuantTrader
-from xtquant.xttype import StockAccount
-from xtquant import xtconstant
-from datetime import datetime
-from xtquant.xttrader import XtQuantTraderCallback
-from xtquant import xtdata
+from broker import XtQuantTrader, XtQuantTraderCallback, StockAccount, xtconstant, xtdata
 from logger import logger
+from metrics import timed
+from event_bus import EventBus
+from order_book import OrderBook
+from account_cache import AccountCache
+from valuation import PortfolioValuation
+from order_lifecycle import OrderLifecycleTracker
+from basket import (BasketOrder, build_legs, submit_basket,
+                    size_buy_legs, size_sell_legs, size_rebalance)
 """
  目前是完整copy xtquant目录下的实现，后续想一下如何共用更好
 """
+# 定期全量对账间隔（秒）
+RECONCILE_INTERVAL = 300
+# 资金/持仓缓存定期刷新间隔（秒）
+ACCOUNT_REFRESH_INTERVAL = 30
+# 回调事件队列长度
+EVENT_QUEUE_SIZE = 50000
+
 class MiniTraderCallback(XtQuantTraderCallback):
+    """回调线程上只把事件放进事件总线，日志和状态更新由总线的消费者线程处理"""
+
+    def __init__(self, bus):
+        super().__init__()
+        self.bus = bus
+
     def on_disconnected(self):
-        logger.warning(f'{datetime.now()} 连接断开')
+        self.bus.publish("disconnected")
 
     def on_stock_order(self, order):
-        logger.info(f'{datetime.now()} 委托回调 {order.order_remark}')
+        self.bus.publish("order", order)
 
     def on_stock_trade(self, trade):
-        direction = "买入" if trade.offset_flag == 48 else "卖出"
-        logger.info(f'{datetime.now()} 成交回调: {direction} {trade.order_remark} '
-                   f'成交价格: {trade.traded_price} 成交数量: {trade.traded_volume}')
+        self.bus.publish("trade", trade)
 
     def on_order_error(self, order_error):
-        logger.error(f"委托错误: {order_error.order_remark} {order_error.error_msg}")
+        self.bus.publish("order_error", order_error)
 
     def on_order_stock_async_response(self, response):
-        logger.info(f"异步委托回调: {response.order_remark}")
+        self.bus.publish("async_response", response)
+
+    def on_stock_asset(self, asset):
+        self.bus.publish("asset", asset)
+
+    def on_stock_position(self, position):
+        self.bus.publish("position", position)
+
+def _log_fields(kind, obj):
+    """回报对象 -> 结构化日志字段（config.LOG_STRUCTURED 时写入 JSON 行）"""
+    return {"event": kind, "code": getattr(obj, "stock_code", None), "order_id": getattr(obj, "order_id", None)}
+
+def log_event(event):
+    """日志消费者"""
+    kind, _, obj = event
+    if kind == "disconnected":
+        logger.warning('连接断开', extra={"event": kind})
+    elif kind == "order":
+        logger.info(f'委托回调 {obj.order_remark}', extra=_log_fields(kind, obj))
+    elif kind == "trade":
+        direction = "买入" if obj.offset_flag == 48 else "卖出"
+        logger.info(f'成交回调: {direction} {obj.order_remark} '
+                    f'成交价格: {obj.traded_price} 成交数量: {obj.traded_volume}', extra=_log_fields(kind, obj))
+    elif kind == "order_error":
+        logger.error(f"委托错误: {obj.order_remark} {obj.error_msg}", extra=_log_fields(kind, obj))
+    elif kind == "async_response":
+        logger.info(f"异步委托回调: {obj.order_remark}", extra=_log_fields(kind, obj))
 
 class MiniTrader:
     def __init__(self, path, account_id):
@@ -36,8 +77,96 @@ class MiniTrader:
         self.session_id = int(time.time())
         self.trader = XtQuantTrader(path, self.session_id)
         self.account = StockAccount(account_id)
-        self.callback = MiniTraderCallback()
+        self.book = OrderBook()
+        self.account_cache = AccountCache()
+        self.valuation = PortfolioValuation()
+        self.lifecycle = OrderLifecycleTracker()
+        self.baskets = []
+        # 实时行情服务（QuoteService），未设置时直接查询 xtdata
+        self.quotes = None
+        self._ack_listeners = []
+        self.book.subscribe(self._on_book_delta)
+        self.bus = EventBus()
+        # 状态事件丢失后本地委托簿/缓存不再可信，溢出时标记为需要重新对账
+        self.bus.add_consumer("state", self._on_event, maxsize=EVENT_QUEUE_SIZE,
+                              on_overflow=self._on_event_overflow)
+        self.bus.add_consumer("log", log_event, maxsize=EVENT_QUEUE_SIZE,
+                              kinds=("disconnected", "order", "trade", "order_error", "async_response"))
+        self.callback = MiniTraderCallback(self.bus)
         self.trader.register_callback(self.callback)
+
+    def _on_event(self, event):
+        """状态消费者：按到达顺序更新委托簿、资金/持仓缓存"""
+        kind, _, obj = event
+        if kind == "order":
+            self.book.on_order(obj)
+            self.account_cache.on_order(obj)
+        elif kind == "trade":
+            self.book.on_trade(obj)
+            self.account_cache.on_trade(obj)
+        elif kind == "order_error":
+            self.book.on_order_error(obj)
+            self.account_cache.on_order_error(obj)
+        elif kind == "async_response":
+            self.on_async_response(obj.seq, obj.order_id)
+        elif kind == "asset":
+            self.account_cache.load_asset(obj)
+        elif kind == "position":
+            self.account_cache.update_position(obj)
+        elif kind == "disconnected":
+            self.book.mark_stale()
+
+    def _on_event_overflow(self):
+        self.book.mark_stale()
+        self.account_cache.asset_at = 0.0
+
+    def close(self):
+        """停止事件总线的消费者线程（重连替换实例时调用）"""
+        self.bus.stop()
+
+    def on_async_response(self, seq, order_id):
+        """异步下单回报：分发给资金缓存、篮子委托和提交线程"""
+        self.lifecycle.on_async_response(seq, order_id)
+        self.account_cache.on_async_response(seq, order_id)
+        for basket in list(self.baskets):
+            basket.on_async_response(seq, order_id)
+        for listener in list(self._ack_listeners):
+            listener(seq)
+
+    def add_ack_listener(self, listener):
+        """订阅异步下单回报，listener(seq) 在回报线程上执行"""
+        self._ack_listeners.append(listener)
+
+    def remove_ack_listener(self, listener):
+        try:
+            self._ack_listeners.remove(listener)
+        except ValueError:
+            pass
+
+    def _on_book_delta(self, delta):
+        """委托簿变化：成交转发给估值，委托转发给未完成的篮子委托，全部计入生命周期跟踪"""
+        _, kind, record = delta
+        if kind == "trade":
+            self.lifecycle.on_trade(record)
+            self.valuation.on_trade(record)
+            return
+        if kind == "order":
+            self.lifecycle.on_order(record)
+        elif kind == "error":
+            self.lifecycle.on_order_error(record)
+        else:
+            return
+        for basket in list(self.baskets):
+            basket.on_order(record)
+            if basket.done():
+                self._remove_basket(basket)
+
+    def _remove_basket(self, basket):
+        """移除已结束的篮子委托（委托回报线程和提交线程都可能调用）"""
+        try:
+            self.baskets.remove(basket)
+        except ValueError:
+            pass
         
     def connect(self):
         """连接交易终端并订阅账户"""
@@ -52,73 +181,94 @@ class MiniTrader:
             
         logger.info('【软件终端连接成功！】')
         logger.info('【账户信息订阅成功！】')
+        self.reconcile()
+        self.refresh_account_cache()
         return True
 
-    def get_account_info(self):
-        """获取账户资产信息"""
+    @timed()
+    def reconcile(self):
+        """全量查询委托和成交，重建本地委托/成交簿"""
+        orders = self.trader.query_stock_orders(self.account) or []
+        trades = self.trader.query_stock_trades(self.account) or []
+        self.book.seed(orders, trades)
+
+    def reconcile_if_due(self):
+        """断线后或超过对账间隔时重新对账"""
+        if self.book.needs_reconcile(RECONCILE_INTERVAL):
+            self.reconcile()
+
+    @timed()
+    def refresh_account_cache(self):
+        """全量查询资金和持仓，刷新本地缓存"""
         asset = self.trader.query_stock_asset(self.account)
-        if asset:
-            return {
-                "TotalAsset": asset.total_asset,
-                "MarketValue": asset.market_value,
-                "FreeCash": asset.cash,
-                "FrozenCash": asset.frozen_cash
-            }
-        return None
+        positions = self.trader.query_stock_positions(self.account)
+        # 资金/持仓之后再查成交：查询时已有的成交都计入了这次的基准值，迟到的推送不再重复计入
+        # （查询间隙里刚成交的几笔可能被少算，下一次刷新纠正）
+        traded_ids = [t.traded_id for t in self.trader.query_stock_trades(self.account) or []]
+        self.account_cache.load_asset(asset, traded_ids)
+        self.account_cache.load_positions(positions, traded_ids)
+        self.seed_valuation()
+
+    def seed_valuation(self):
+        """用资金/持仓缓存和当日成交重建持仓估值"""
+        quotes = self.quotes
+        asset = self.account_cache.asset
+        self.valuation.seed(
+            self.account_cache.position_records(),
+            self.book.trade_records(),
+            # 挂单冻结的资金仍属于总资产，成交时才由估值扣除
+            (asset["cash"] or 0.0) + (asset["frozen_cash"] or 0.0),
+            prices=quotes.last_prices() if quotes else None,
+            prev_close=quotes.prev_close if quotes else None,
+        )
 
+    def refresh_account_if_due(self):
+        """超过刷新间隔时刷新资金/持仓缓存"""
+        if self.account_cache.needs_refresh(ACCOUNT_REFRESH_INTERVAL):
+            self.refresh_account_cache()
+
+    @timed()
+    def get_account_info(self):
+        """获取账户资产信息（读取本地资金缓存）"""
+        self.refresh_account_if_due()
+        if not self.account_cache.asset_at:
+            return None
+        asset = self.account_cache.asset
+        return {
+            "TotalAsset": asset["total_asset"],
+            "MarketValue": asset["market_value"],
+            "FreeCash": asset["cash"],
+            "FrozenCash": asset["frozen_cash"]
+        }
+
+    @timed()
     def get_orders(self):
-        """获取委托订单信息"""
-        orders = self.trader.query_stock_orders(self.account)
-        orders_df = pd.DataFrame([
-            {
-                "证券代码": order.stock_code,
-                "委托数量": order.order_volume,
-                "委托价格": order.price,
-                "订单编号": order.order_id,
-                "委托策略": order.strategy_name,
-                "委托状态": order.order_status,
-                "状态描述": order.status_msg,
-                "报单时间": datetime.fromtimestamp(order.order_time).strftime('%H:%M:%S')
-            }
-            for order in orders
-        ])
-        return orders_df
+        """获取委托订单信息（读取本地委托簿）"""
+        self.reconcile_if_due()
+        return self.book.orders_frame()
 
+    @timed()
     def get_trades(self):
-        """获取成交信息"""
-        trades = self.trader.query_stock_trades(self.account)
-        trades_df = pd.DataFrame([
-            {
-                "StockCode": trade.stock_code,
-                "Volume": trade.traded_volume,
-                "Price": trade.traded_price,
-                "Value": trade.traded_amount,
-                "TradeType":trade.order_type,
-                "Strategy": trade.strategy_name, 
-                "Remark":trade.order_remark,
-                "OrderId": trade.order_id,
-                "TradeId": trade.traded_id,
-                "TradeTime": datetime.fromtimestamp(trade.traded_time).strftime('%H:%M:%S')
-            }
-            for trade in trades
-        ])
-        return trades_df
+        """获取成交信息（读取本地成交簿）"""
+        self.reconcile_if_due()
+        return self.book.trades_frame()
 
+    @timed()
     def get_positions(self):
-        """获取持仓信息"""
-        positions = self.trader.query_stock_positions(self.account)
+        """获取持仓信息（读取本地持仓缓存）"""
+        self.refresh_account_if_due()
         positions_df = pd.DataFrame([
             {
-                "StockCode": position.stock_code,
-                "Volume": position.volume,
-                "FreeVolume": position.can_use_volume,
-                "FrozenVolue": position.frozen_volume,
-                "OpenPrice": position.open_price,
-                "MarketValue": position.market_value,
-                "OnRoadVolume": position.on_road_volume,
-                "YesterdayVolume": position.yesterday_volume
+                "StockCode": position["stock_code"],
+                "Volume": position["volume"],
+                "FreeVolume": position["can_use_volume"],
+                "FrozenVolue": position["frozen_volume"],
+                "OpenPrice": position["open_price"],
+                "MarketValue": position["market_value"],
+                "OnRoadVolume": position["on_road_volume"],
+                "YesterdayVolume": position["yesterday_volume"]
             }
-            for position in positions
+            for position in self.account_cache.position_records()
         ])
         return positions_df
 
@@ -145,6 +295,7 @@ class MiniTrader:
         logger.info('-' * 18 + "【持仓信息】" + '-' * 18)
         logger.info(str(positions_df) if not positions_df.empty else "无持仓信息")
 
+    @timed()
     def buy_stock(self, stock_code, amount, price_type=xtconstant.LATEST_PRICE, price=-1, remark=''):
         """
         买入股票
@@ -155,13 +306,13 @@ class MiniTrader:
         :param remark: 委托备注
         :return: 异步委托序号
         """
-        # 获取账户可用资金
-        asset = self.trader.query_stock_asset(self.account)
-        available_cash = asset.cash
+        # 获取账户可用资金（本地缓存，已扣除未确认委托）
+        self.refresh_account_if_due()
+        available_cash = self.account_cache.available_cash()
     
         # 获取当前价格 #TODO
         if price_type == xtconstant.LATEST_PRICE:
-            full_tick = xtdata.get_full_tick([stock_code])
+            full_tick = self.get_full_tick([stock_code])
             current_price = full_tick[stock_code]['lastPrice']
         else:
             current_price = price
@@ -174,8 +325,10 @@ class MiniTrader:
             logger.warning(f"可买数量为0，可用资金：{available_cash}，目标金额：{amount}")
             return None
 
-        logger.info(f"买入 {stock_code}: 金额{amount}, 价格类型{price_type}, 价格{price},  备注{remark}, 可用资金{available_cash}")    
-        return self.trader.order_stock_async(
+        logger.info(f"买入 {stock_code}: 金额{amount}, 价格类型{price_type}, 价格{price},  备注{remark}, 可用资金{available_cash}",
+                    extra={"event": "buy", "code": stock_code, "strategy": remark or None})    
+        started = time.monotonic()
+        seq = self.trader.order_stock_async(
             self.account,
             stock_code,
             xtconstant.STOCK_BUY,
@@ -185,7 +338,12 @@ class MiniTrader:
             remark or 'buy',
             remark +"_"+ stock_code
         )
+        self.lifecycle.on_submit(seq, stock_code, "buy", buy_volume, remark or 'buy', started)
+        if seq is not None and seq > 0:
+            self.account_cache.reserve_cash(seq, stock_code, buy_volume * current_price)
+        return seq
 
+    @timed()
     def sell_stock(self, stock_code, volume, price_type=xtconstant.LATEST_PRICE, price=-1, remark=''):
         """
         卖出股票
@@ -196,20 +354,19 @@ class MiniTrader:
         :param remark: 委托备注
         :return: 异步委托序号
         """
-        # 获取持仓信息
-        positions = self.trader.query_stock_positions(self.account)
-        position_available = {p.stock_code: p.can_use_volume for p in positions}
-        
-        # 确定可卖数量
-        available_volume = position_available.get(stock_code, 0)
+        # 确定可卖数量（本地缓存，已扣除未确认委托）
+        self.refresh_account_if_due()
+        available_volume = self.account_cache.can_use_volume(stock_code)
         sell_volume = min(volume, available_volume)
         
         if sell_volume <= 0:
             logger.warning(f"可卖数量为0，持仓可用：{available_volume}，目标数量：{volume}")
             return None
             
-        logger.info(f"卖出 {stock_code}: 数量{sell_volume}股")
-        return self.trader.order_stock_async(
+        logger.info(f"卖出 {stock_code}: 数量{sell_volume}股",
+                    extra={"event": "sell", "code": stock_code, "strategy": remark or None})
+        started = time.monotonic()
+        seq = self.trader.order_stock_async(
             self.account,
             stock_code,
             xtconstant.STOCK_SELL,
@@ -219,6 +376,110 @@ class MiniTrader:
             remark or 'sell',
             remark +"_"+ stock_code
         )
+        self.lifecycle.on_submit(seq, stock_code, "sell", sell_volume, remark or 'sell', started)
+        if seq is not None and seq > 0:
+            self.account_cache.reserve_volume(seq, stock_code, sell_volume)
+        return seq
+
+    @timed()
+    def get_full_tick(self, codes):
+        """行情快照：优先读取本地行情缓冲"""
+        return (self.quotes or xtdata).get_full_tick(codes)
+
+    @timed()
+    def submit_order(self, stock_code, side, volume, price_type, price, remark=''):
+        """提交单笔委托（不做资金/持仓检查），并登记乐观预扣
+
+        :param side: "buy" 或 "sell"
+        :return: 异步委托序号
+        """
+        order_type = xtconstant.STOCK_BUY if side == "buy" else xtconstant.STOCK_SELL
+        started = time.monotonic()
+        seq = self.trader.order_stock_async(
+            self.account,
+            stock_code,
+            order_type,
+            volume,
+            price_type,
+            price,
+            remark or side,
+            remark +"_"+ stock_code
+        )
+        self.lifecycle.on_submit(seq, stock_code, side, volume, remark or side, started)
+        if seq is not None and seq > 0:
+            if side == "buy":
+                self.account_cache.reserve_cash(seq, stock_code, volume * price)
+            else:
+                self.account_cache.reserve_volume(seq, stock_code, volume)
+        return seq
+
+    def _basket_prices(self, codes, price_type, prices=None):
+        """一次性获取篮子内全部代码的价格"""
+        if price_type != xtconstant.LATEST_PRICE and prices is not None:
+            return np.array([prices[c] for c in codes], dtype="float64")
+        full_tick = self.get_full_tick(list(codes))
+        return np.array([full_tick.get(c, {}).get('lastPrice', 0.0) for c in codes], dtype="float64")
+
+    def _start_basket(self, legs, price_type, remark, max_in_flight):
+        basket = BasketOrder(legs, remark)
+        if not basket.done():
+            self.baskets.append(basket)
+            submit_basket(self, basket, price_type, max_in_flight)
+        logger.info(f"篮子委托 {remark}: {len(basket.legs)} 笔")
+        return basket
+
+    @timed()
+    def buy_basket(self, targets, price_type=xtconstant.LATEST_PRICE, prices=None, remark='', max_in_flight=10):
+        """
+        按目标金额批量买入
+        :param targets: {股票代码: 目标金额}
+        :param prices: 限价委托时的 {股票代码: 价格}
+        :param max_in_flight: 最大在途委托数
+        :return: BasketOrder
+        """
+        codes = list(targets)
+        self.refresh_account_cache()
+        px = self._basket_prices(codes, price_type, prices)
+        volumes = size_buy_legs([targets[c] for c in codes], px, self.account_cache.available_cash())
+        legs = build_legs(codes, ["buy"] * len(codes), volumes, px)
+        return self._start_basket(legs, price_type, remark, max_in_flight)
+
+    @timed()
+    def sell_basket(self, targets, price_type=xtconstant.LATEST_PRICE, prices=None, remark='', max_in_flight=10):
+        """
+        按目标数量批量卖出
+        :param targets: {股票代码: 目标卖出数量}
+        :return: BasketOrder
+        """
+        codes = list(targets)
+        self.refresh_account_cache()
+        px = self._basket_prices(codes, price_type, prices)
+        can_use = [self.account_cache.can_use_volume(c) for c in codes]
+        volumes = size_sell_legs([targets[c] for c in codes], can_use)
+        legs = build_legs(codes, ["sell"] * len(codes), volumes, px)
+        return self._start_basket(legs, price_type, remark, max_in_flight)
+
+    @timed()
+    def rebalance_to_weights(self, weights, price_type=xtconstant.LATEST_PRICE, prices=None, remark='', max_in_flight=10):
+        """
+        按目标权重调仓，未出现在 weights 中的持仓清仓
+        :param weights: {股票代码: 目标权重（占总资产）}
+        :return: BasketOrder（卖出腿在前，买入只使用当前可用资金）
+        """
+        self.refresh_account_cache()
+        positions = {p["stock_code"]: p for p in self.account_cache.position_records()}
+        codes = list(dict.fromkeys(list(weights) + [c for c, p in positions.items() if p["volume"]]))
+        px = self._basket_prices(codes, price_type, prices)
+        volumes = [positions.get(c, {}).get("volume", 0) for c in codes]
+        can_use = [self.account_cache.can_use_volume(c) for c in codes]
+        sell, buy = size_rebalance([weights.get(c, 0.0) for c in codes], px, volumes, can_use,
+                                   self.account_cache.asset["total_asset"],
+                                   self.account_cache.available_cash())
+        legs = pd.concat([
+            build_legs(codes, ["sell"] * len(codes), sell, px),
+            build_legs(codes, ["buy"] * len(codes), buy, px),
+        ], ignore_index=True)
+        return self._start_basket(legs, price_type, remark, max_in_flight)
 
 # 使用示例
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+# order_book.py - 回调驱动的本地委托/成交簿
+"""
+MiniTrader 连接后用一次全量查询初始化，之后由 on_stock_order / on_stock_trade / on_order_error
+回调增量更新。读取当前状态是内存操作；需要增量的消费者可以订阅回调，
+或者用 changes_since(version) 拉取某个版本之后的变化。
+"""
+import time
+import threading
+from collections import deque
+from datetime import datetime
+import pandas as pd
+
+# 委托废单状态（与 xtconstant.ORDER_JUNK 一致）
+ORDER_JUNK = 57
+
+ORDER_FIELDS = ("stock_code", "order_volume", "price", "order_id", "strategy_name", "order_status",
+                "status_msg", "order_time", "order_remark", "order_type", "traded_volume", "traded_price")
+TRADE_FIELDS = ("stock_code", "traded_volume", "traded_price", "traded_amount", "order_type",
+                "strategy_name", "order_remark", "order_id", "traded_id", "traded_time")
+
+
+def _to_record(obj, fields):
+    return {name: getattr(obj, name, None) for name in fields}
+
+
+class OrderBook:
+    """委托/成交簿"""
+
+    def __init__(self, max_deltas=10000):
+        self.orders = {}
+        self.trades = {}
+        self.version = 0
+        self.seeded_at = 0.0
+        self.stale = True
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._deltas = deque(maxlen=max_deltas)
+
+    # ---------- 写入 ----------
+    def _publish(self, kind, record):
+        """记录一条变化并通知订阅者（调用方已持有锁）"""
+        self.version += 1
+        delta = (self.version, kind, record)
+        self._deltas.append(delta)
+        return delta
+
+    def _notify(self, delta):
+        for listener in list(self._listeners):
+            try:
+                listener(delta)
+            except Exception:
+                pass
+
+    def seed(self, orders, trades):
+        """用全量查询结果重建（连接、重连或定期对账时调用）"""
+        with self._lock:
+            self.orders = {o.order_id: _to_record(o, ORDER_FIELDS) for o in orders}
+            self.trades = {t.traded_id: _to_record(t, TRADE_FIELDS) for t in trades}
+            self.seeded_at = time.time()
+            self.stale = False
+            delta = self._publish("reset", None)
+        self._notify(delta)
+
+    def on_order(self, order):
+        """委托状态变化"""
+        record = _to_record(order, ORDER_FIELDS)
+        with self._lock:
+            self.orders[record["order_id"]] = record
+            delta = self._publish("order", record)
+        self._notify(delta)
+
+    def on_trade(self, trade):
+        """成交回报（同一成交编号重复推送时覆盖）"""
+        record = _to_record(trade, TRADE_FIELDS)
+        with self._lock:
+            self.trades[record["traded_id"]] = record
+            delta = self._publish("trade", record)
+        self._notify(delta)
+
+    def on_order_error(self, order_error):
+        """下单失败：标记为废单"""
+        order_id = getattr(order_error, "order_id", None)
+        with self._lock:
+            record = dict(self.orders.get(order_id) or {"order_id": order_id})
+            record["order_status"] = ORDER_JUNK
+            record["status_msg"] = getattr(order_error, "error_msg", "")
+            record.setdefault("order_remark", getattr(order_error, "order_remark", ""))
+            self.orders[order_id] = record
+            delta = self._publish("error", record)
+        self._notify(delta)
+
+    def mark_stale(self):
+        """断线后标记，下一次读取前会重新对账"""
+        self.stale = True
+
+    # ---------- 读取 ----------
+    def subscribe(self, listener):
+        """订阅变化，listener(delta) 在回调线程上执行；返回取消订阅函数"""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def changes_since(self, version):
+        """返回 version 之后的变化列表；太旧（已被淘汰）时返回 None，调用方应重新读取全量"""
+        with self._lock:
+            if version >= self.version:
+                return []
+            if not self._deltas or self._deltas[0][0] > version + 1:
+                return None
+            return [d for d in self._deltas if d[0] > version]
+
+    def order_records(self):
+        with self._lock:
+            return list(self.orders.values())
+
+    def trade_records(self):
+        with self._lock:
+            return list(self.trades.values())
+
+    def needs_reconcile(self, interval):
+        """断线后或距上次全量对账超过 interval 秒时需要对账"""
+        return self.stale or time.time() - self.seeded_at > interval
+
+    def orders_frame(self):
+        """委托 DataFrame（列与 MiniTrader.get_orders 一致）"""
+        return pd.DataFrame([
+            {
+                "证券代码": o.get("stock_code"),
+                "委托数量": o.get("order_volume"),
+                "委托价格": o.get("price"),
+                "订单编号": o.get("order_id"),
+                "委托策略": o.get("strategy_name"),
+                "委托状态": o.get("order_status"),
+                "状态描述": o.get("status_msg"),
+                "报单时间": datetime.fromtimestamp(o["order_time"]).strftime('%H:%M:%S') if o.get("order_time") else ""
+            }
+            for o in self.order_records()
+        ])
+
+    def trades_frame(self):
+        """成交 DataFrame（列与 MiniTrader.get_trades 一致）"""
+        return pd.DataFrame([
+            {
+                "StockCode": t["stock_code"],
+                "Volume": t["traded_volume"],
+                "Price": t["traded_price"],
+                "Value": t["traded_amount"],
+                "TradeType": t["order_type"],
+                "Strategy": t["strategy_name"],
+                "Remark": t["order_remark"],
+                "OrderId": t["order_id"],
+                "TradeId": t["traded_id"],
+                "TradeTime": datetime.fromtimestamp(t["traded_time"]).strftime('%H:%M:%S')
+            }
+            for t in self.trade_records()
+        ])
@@ -0,0 +1,303 @@
+# order_lifecycle.py - 委托生命周期与延迟统计
+"""
+把 order_stock_async 的 seq、异步回报的 order_id 和成交回报串起来，记录每笔委托各阶段的时间：
+
+    提交 -> 异步回报 -> 终端受理 -> 首笔成交 -> 完成（全部成交/撤单/废单/下单失败）
+
+相邻阶段的耗时按 整体 / 策略 / 代码 三个维度进入流式直方图（对数分桶，固定内存），
+可以随时读取 p50/p95/p99，也可以导出为 JSON 对比。
+- 提交 -> 异步回报：本进程 + 终端 API
+- 异步回报 -> 受理：终端报单到柜台
+- 受理 -> 首笔成交：交易所撮合
+"""
+import json
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# 委托状态（与 xtconstant 一致）
+ORDER_REPORTED = 50
+ORDER_PART_SUCC = 55
+FINAL_STATUSES = {53, 54, 56, 57}
+ORDER_SUCCEEDED = 56
+ORDER_JUNK = 57
+
+# 统计的阶段：(名称, 起点, 终点)
+STAGES = (
+    ("submit_ack", "submit", "ack"),
+    ("ack_accepted", "ack", "accepted"),
+    ("accepted_first_fill", "accepted", "first_fill"),
+    ("first_fill_done", "first_fill", "done"),
+    ("submit_done", "submit", "done"),
+)
+STAGE_NAMES = {
+    "submit_ack": "提交→异步回报",
+    "ack_accepted": "异步回报→受理",
+    "accepted_first_fill": "受理→首笔成交",
+    "first_fill_done": "首笔成交→完成",
+    "submit_done": "提交→完成",
+}
+
+# 没有对应 seq 的委托（异步回报未到或非本进程提交）进入终态后，等待异步回报的时间（秒）
+ORPHAN_GRACE = 5.0
+
+# 直方图分桶：0.1ms ~ 1000s，相邻桶相差 5%
+BUCKET_EDGES = np.geomspace(1e-4, 1e3, num=int(np.log(1e7) / np.log(1.05)) + 1)
+# 单次写入用 bisect 查桶，比对标量调用 np.searchsorted 快一个数量级
+_EDGE_LIST = BUCKET_EDGES.tolist()
+
+
+class LatencyHistogram:
+    """对数分桶的流式延迟直方图（秒）"""
+
+    __slots__ = ("counts", "total", "sum", "max")
+
+    def __init__(self):
+        self.counts = np.zeros(BUCKET_EDGES.size + 1, dtype="int64")
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(_EDGE_LIST, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentiles(self, qs=(50, 95, 99)):
+        """各分位数（取所在桶的上沿），无数据时为 None"""
+        if not self.total:
+            return {q: None for q in qs}
+        cum = np.cumsum(self.counts)
+        result = {}
+        for q in qs:
+            i = int(np.searchsorted(cum, self.total * q / 100.0))
+            result[q] = float(BUCKET_EDGES[min(i, BUCKET_EDGES.size - 1)])
+        return result
+
+    def to_dict(self):
+        p = self.percentiles()
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else None,
+            "p50": p[50],
+            "p95": p[95],
+            "p99": p[99],
+            "max": self.max,
+        }
+
+
+class _Order:
+    __slots__ = ("seq", "order_id", "stock_code", "strategy", "side", "volume",
+                 "filled", "status", "submitted_at", "marks")
+
+    def __init__(self, seq=None, order_id=None, stock_code=None, strategy="", side=None, volume=0):
+        self.seq = seq
+        self.order_id = order_id
+        self.stock_code = stock_code
+        self.strategy = strategy
+        self.side = side
+        self.volume = volume
+        self.filled = 0
+        self.status = None
+        self.submitted_at = None
+        # 阶段 -> time.monotonic()
+        self.marks = {}
+
+    def to_dict(self):
+        origin = self.marks.get("submit")
+        return {
+            "seq": self.seq,
+            "order_id": self.order_id,
+            "stock_code": self.stock_code,
+            "strategy": self.strategy,
+            "side": self.side,
+            "volume": self.volume,
+            "filled": self.filled,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            # 各阶段相对提交的耗时（秒）
+            "marks": {k: (v - origin if origin is not None else None) for k, v in self.marks.items()},
+        }
+
+
+class OrderLifecycleTracker:
+    """委托生命周期跟踪"""
+
+    def __init__(self, max_finished=5000):
+        self._by_seq = {}
+        self._by_order = {}
+        # on_submit 登记前就到达的异步回报：seq -> (order_id, 时间)
+        self._early_acks = {}
+        # 已进入终态、还在等异步回报的无 seq 记录：order_id -> 进入终态的时间
+        self._orphans = {}
+        self.finished = deque(maxlen=max_finished)
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    # ---------- 事件 ----------
+    def on_submit(self, seq, stock_code, side, volume, strategy="", started=None):
+        """order_stock_async 返回后调用
+
+        Args:
+            started: 调用 order_stock_async 之前的 time.monotonic()，缺省为当前时间
+        """
+        if seq is None or seq <= 0:
+            return
+        order = _Order(seq, None, stock_code, strategy, side, volume)
+        order.marks["submit"] = started if started is not None else time.monotonic()
+        order.submitted_at = time.time() - (time.monotonic() - order.marks["submit"])
+        with self._lock:
+            self._by_seq[seq] = order
+            early = self._early_acks.pop(seq, None)
+        if early is not None:
+            self.on_async_response(seq, *early)
+
+    def on_async_response(self, seq, order_id, at=None):
+        now = at if at is not None else time.monotonic()
+        with self._lock:
+            order = self._by_seq.pop(seq, None)
+            if order is None:
+                self._early_acks[seq] = (order_id, now)
+                if len(self._early_acks) > 1000:
+                    # 不是本进程提交的委托，不会有人来取
+                    self._early_acks.pop(next(iter(self._early_acks)))
+                return
+            order.order_id = order_id
+            order.marks["ack"] = now
+            # 委托/成交回报先于异步回报到达时已经建了一条记录，合并过来
+            early = self._by_order.get(order_id)
+            if early is not None:
+                for stage, t in early.marks.items():
+                    order.marks.setdefault(stage, t)
+                order.filled, order.status = early.filled, early.status
+                order.volume = early.volume or order.volume
+                self._orphans.pop(order_id, None)
+            self._by_order[order_id] = order
+            self._maybe_finish(order)
+
+    def _get(self, order_id, record):
+        """按 order_id 取记录，没有时新建（调用方已持有锁）"""
+        order = self._by_order.get(order_id)
+        if order is None:
+            order = _Order(None, order_id, record.get("stock_code"), record.get("strategy_name") or "")
+            self._by_order[order_id] = order
+        return order
+
+    def on_order(self, record):
+        """委托状态变化（OrderBook 的委托记录）"""
+        now = time.monotonic()
+        with self._lock:
+            order = self._get(record.get("order_id"), record)
+            status = record.get("order_status")
+            order.status = status
+            order.volume = record.get("order_volume") or order.volume
+            if status is not None and ORDER_REPORTED <= status < ORDER_JUNK:
+                order.marks.setdefault("accepted", now)
+            if status in (ORDER_PART_SUCC, ORDER_SUCCEEDED):
+                order.marks.setdefault("first_fill", now)
+            self._maybe_finish(order)
+
+    def on_trade(self, record):
+        """成交回报（OrderBook 的成交记录）"""
+        now = time.monotonic()
+        with self._lock:
+            order = self._get(record.get("order_id"), record)
+            order.filled += record.get("traded_volume") or 0
+            order.marks.setdefault("accepted", now)
+            order.marks.setdefault("first_fill", now)
+            if order.volume and order.filled >= order.volume:
+                order.status = ORDER_SUCCEEDED
+            self._maybe_finish(order)
+
+    def on_order_error(self, record):
+        """下单失败（OrderBook 的废单记录）"""
+        with self._lock:
+            order = self._get(record.get("order_id"), record)
+            order.status = ORDER_JUNK
+            self._maybe_finish(order)
+
+    def _maybe_finish(self, order):
+        """进入终态时记录完成时间、计入直方图并移出活动表（调用方已持有锁）"""
+        if order.status not in FINAL_STATUSES or "done" in order.marks:
+            return
+        now = time.monotonic()
+        if order.seq is None:
+            # 异步回报可能还在路上，先不结算，超过 ORPHAN_GRACE 再按无提交时间的记录结算
+            self._orphans.setdefault(order.order_id, now)
+            self._flush_orphans(now)
+            return
+        self._finish(order, now)
+        self._flush_orphans(now)
+
+    def _flush_orphans(self, now, force=False):
+        """结算等待超时的无 seq 记录（调用方已持有锁）"""
+        for order_id, since in list(self._orphans.items()):
+            if force or now - since > ORPHAN_GRACE:
+                del self._orphans[order_id]
+                order = self._by_order.get(order_id)
+                if order is not None:
+                    self._finish(order, since)
+
+    def _finish(self, order, now):
+        """记录完成时间、计入直方图并移出活动表（调用方已持有锁）"""
+        order.marks["done"] = now
+        for stage, start, end in STAGES:
+            if start in order.marks and end in order.marks:
+                seconds = max(order.marks[end] - order.marks[start], 0.0)
+                for key in (("all", ""), ("strategy", order.strategy), ("symbol", order.stock_code)):
+                    self._histogram(stage, *key).add(seconds)
+        self._by_order.pop(order.order_id, None)
+        self.finished.append(order)
+
+    def _histogram(self, stage, dimension, key):
+        hist = self.histograms.get((stage, dimension, key))
+        if hist is None:
+            hist = self.histograms[(stage, dimension, key)] = LatencyHistogram()
+        return hist
+
+    # ---------- 读取 ----------
+    def pending(self):
+        """尚未完成的委托数"""
+        with self._lock:
+            self._flush_orphans(time.monotonic())
+            return len(self._by_seq) + len(self._by_order) - len(self._orphans)
+
+    def frame(self, dimension="all"):
+        """各阶段延迟分位数（毫秒）"""
+        with self._lock:
+            items = [(k, h.to_dict()) for k, h in self.histograms.items() if k[1] == dimension]
+        rows = []
+        for (stage, _, key), stats in sorted(items):
+            rows.append({
+                "阶段": STAGE_NAMES[stage],
+                "维度": key,
+                "笔数": stats["count"],
+                "p50(ms)": stats["p50"] * 1000,
+                "p95(ms)": stats["p95"] * 1000,
+                "p99(ms)": stats["p99"] * 1000,
+                "最大(ms)": stats["max"] * 1000,
+            })
+        return pd.DataFrame(rows, columns=["阶段", "维度", "笔数", "p50(ms)", "p95(ms)", "p99(ms)", "最大(ms)"])
+
+    def export(self, include_orders=True):
+        """导出直方图统计（和最近完成的委托明细）为可 JSON 序列化的字典"""
+        with self._lock:
+            data = {
+                "exported_at": time.time(),
+                "histograms": [
+                    {"stage": stage, "dimension": dimension, "key": key, **hist.to_dict()}
+                    for (stage, dimension, key), hist in self.histograms.items()
+                ],
+            }
+            if include_orders:
+                data["orders"] = [o.to_dict() for o in self.finished]
+        return data
+
+    def export_json(self, path, include_orders=True):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.export(include_orders), f, ensure_ascii=False)
@@ -1,13 +1,12 @@
 
 # logs_app.py - 日志查询页面
-import streamlit as st
 import os
 import re
-import glob
-import pandas as pd
-from collections import deque
-from datetime import datetime, timedelta
-from config import get_footer_text
+import streamlit as st
+from datetime import datetime
+from config import get_footer_text, QMT_LOG_DIR
+from logs_helper import get_log_files_in_date_range, read_log_tail, filter_logs_by_time, export_log_cursor, structured_frame
+from log_search import open_cursor
 
 # 初始化页面
 st.set_page_config(
@@ -17,138 +16,84 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def get_log_files_in_date_range(log_base_path, log_type, start_date, end_date):
-    """获取指定日期范围内的所有日志文件
-    
-    Args:
-        log_base_path: 日志文件基础路径
-        log_type: 日志类型 ('main' 或 'tics')
-        start_date: 开始日期
-        end_date: 结束日期
-        
-    Returns:
-        list: 日期范围内的日志文件路径列表
-    """
-    log_files = []
-    
-    # 获取当前日志文件
-    current_log = os.path.join(log_base_path, f"{log_type}.log")
-    if os.path.exists(current_log):
-        log_files.append(current_log)
-    
-    # 获取历史日志文件
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y%m%d")
-        log_file = os.path.join(log_base_path, f"{log_type}.log.{date_str}")
-        if os.path.exists(log_file):
-            log_files.append(log_file)
-        current_date += timedelta(days=1)
-    
-    return log_files
+# 搜索结果每页行数
+PAGE_SIZES = [200, 500, 1000, 2000]
 
-def read_log_tail(log_file, lines=200):
-    """读取日志文件的最后N行
-    
-    Args:
-        log_file: 日志文件路径
-        lines: 要读取的行数
-        
-    Returns:
-        list: 包含日志行的列表
-    """
-    if not os.path.exists(log_file):
-        return []
-    
-    try:
-        with open(log_file, 'r', encoding='utf-8') as f:
-            return list(deque(f, lines))
-    except Exception as e:
-        st.error(f"读取日志文件失败: {str(e)}")
-        return []
+def get_cursor(prefix, log_files, start_time, end_time, keyword, use_regex, refresh):
+    """同一查询在会话中复用结果游标（翻页不重新搜索），点击刷新或条件变化时重建"""
+    query = (tuple(log_files), start_time, end_time, keyword, use_regex)
+    state = st.session_state.get(f"{prefix}_cursor")
+    if refresh or state is None or state[0] != query:
+        # 先查关键词倒排索引，索引不适用时（或正则）按字节扫描日期范围对应的区间
+        state = (query, open_cursor(log_files, start_time, end_time, keyword, use_regex))
+        st.session_state[f"{prefix}_cursor"] = state
+        st.session_state[f"{prefix}_page"] = 1
+        drop_export(prefix)
+    return state[1]
 
-def read_log_content(log_files, keyword=""):
-    """读取多个日志文件的内容并根据关键词过滤
-    
-    Args:
-        log_files: 日志文件路径列表
-        keyword: 关键词过滤
-        
-    Returns:
-        list: 包含日志行的列表
-    """
-    all_lines = []
-    
-    for log_file in log_files:
-        try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                if keyword:
-                    # 如果有关键词，只保留包含关键词的行
-                    for line in f:
-                        if keyword.lower() in line.lower():
-                            all_lines.append(line)
-                else:
-                    # 如果没有关键词，读取所有行
-                    all_lines.extend(f.readlines())
-        except Exception as e:
-            st.error(f"读取日志文件 {log_file} 失败: {str(e)}")
-    
-    return all_lines
+def drop_export(prefix):
+    """删除上一次生成的导出文件（会话直接关闭时留下的文件由 sweep_exports 按时间清理）"""
+    for path in st.session_state.pop(f"{prefix}_export", None) or []:
+        if os.path.exists(path):
+            os.remove(path)
 
-def parse_log_line(line):
-    """解析日志行，提取时间戳和内容
-    
-    Args:
-        line: 日志行文本
-        
-    Returns:
-        tuple: (时间戳, 日志内容)
-    """
-    # 尝试匹配常见的时间戳格式
-    timestamp_match = re.search(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})', line)
-    if timestamp_match:
-        timestamp = timestamp_match.group(1)
-        content = line[timestamp_match.end():].strip()
-        return timestamp, content
-    return "", line.strip()
+def render_search_results(prefix, cursor, keyword, file_count, export_name):
+    """分页显示搜索结果：总数只统计不取行，每次只读取当前页"""
+    with st.spinner(f"正在搜索 {file_count} 个日志文件..."):
+        total = cursor.total()
+    if not total:
+        st.warning(f"未找到包含关键词 '{keyword}' 的日志记录")
+        return
 
-def filter_logs_by_time(log_lines, start_time=None, end_time=None):
-    """根据时间范围过滤日志
-    
-    Args:
-        log_lines: 日志行列表
-        start_time: 开始时间
-        end_time: 结束时间
-        
-    Returns:
-        list: 过滤后的日志行
-    """
-    filtered_lines = []
-    
-    for line in log_lines:
-        timestamp, content = parse_log_line(line)
-        
-        # 时间范围过滤
-        if timestamp:
-            try:
-                log_time = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                if start_time and log_time < start_time:
-                    continue
-                if end_time and log_time > end_time:
-                    continue
-            except:
-                pass  # 如果时间解析失败，不进行时间过滤
-                
-        filtered_lines.append(line)
-    
-    return filtered_lines
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("每页行数", PAGE_SIZES, key=f"{prefix}_page_size")
+    pages = (total + page_size - 1) // page_size
+    # 每页行数变大后原页码可能超出范围
+    if st.session_state.get(f"{prefix}_page", 1) > pages:
+        st.session_state[f"{prefix}_page"] = pages
+    with col2:
+        page = st.number_input(f"页码（共 {pages} 页）", min_value=1, max_value=pages, step=1, key=f"{prefix}_page")
+
+    lines = cursor.page(page - 1, page_size)
+    st.code("".join(lines), language="text")
+    render_structured(lines)
+    st.info(f"找到 {total} 条匹配记录，来自 {file_count} 个日志文件，当前第 {page}/{pages} 页")
+
+    # 导出：按段写入压缩文件（较大时分卷），下载按钮每次只加载一个分卷
+    if st.button("📦 生成导出文件", key=f"{prefix}_prepare_export"):
+        drop_export(prefix)
+        with st.spinner("正在导出..."):
+            st.session_state[f"{prefix}_export"] = export_log_cursor(cursor)
+    paths = [p for p in st.session_state.get(f"{prefix}_export") or [] if os.path.exists(p)]
+    if paths:
+        part = 1
+        if len(paths) > 1:
+            part = st.selectbox(f"分卷（共 {len(paths)} 个）", range(1, len(paths) + 1), key=f"{prefix}_export_part")
+        suffix = f".part{part}" if len(paths) > 1 else ""
+        with open(paths[part - 1], "rb") as f:
+            if st.download_button(
+                "📥 导出筛选结果",
+                f,
+                file_name=f"{export_name}{suffix}.txt.gz",
+                mime="application/gzip",
+                key=f"{prefix}_download"
+            ):
+                st.success("日志导出成功！")
+
+def render_structured(lines):
+    """结构化日志（JSON 行）另外按字段列成表格"""
+    frame = structured_frame(lines)
+    if not frame.empty:
+        with st.expander(f"结构化字段（{len(frame)} 行）"):
+            st.dataframe(frame, use_container_width=True)
 
 def render_logs_view():
     """渲染日志查询页面"""
     st.title("📋 日志查询")
     
     # 定义日志文件基础路径
-    log_base_path = r"D:\Users\Jack\xtquant\logs"
+    log_base_path = QMT_LOG_DIR
     
     # 创建选项卡
     tab1, tab2 = st.tabs(["主日志 (main.log)", "行情日志 (tick.log)"])
@@ -161,6 +106,7 @@ def render_logs_view():
         col1, col2, col3 = st.columns(3)
         with col1:
             keyword = st.text_input("关键词过滤", key="main_keyword")
+            use_regex = st.checkbox("正则表达式", key="main_regex")
         with col2:
             start_date = st.date_input("开始日期", key="main_start_date")
             start_time = datetime.combine(start_date, datetime.min.time())
@@ -175,22 +121,20 @@ def render_logs_view():
         
         # 获取日期范围内的所有日志文件
         log_files = get_log_files_in_date_range(log_base_path, "main", start_date, end_date)
+        export_name = f"main_log_export_{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}"
         
         if not log_files:
             st.warning(f"在指定日期范围内未找到日志文件")
         else:
             # 根据是否有关键词决定读取方式
             if keyword:
-                # 有关键词，进行全文搜索
-                with st.spinner(f"正在搜索 {len(log_files)} 个日志文件..."):
-                    log_lines = read_log_content(log_files, keyword)
-                    filtered_lines = filter_logs_by_time(log_lines, start_time, end_time)
-                
-                if filtered_lines:
-                    st.code("".join(filtered_lines), language="text")
-                    st.info(f"找到 {len(filtered_lines)} 条匹配记录，来自 {len(log_files)} 个日志文件")
+                # 有关键词，进行全文搜索，结果分页显示
+                try:
+                    cursor = get_cursor("main", log_files, start_time, end_time, keyword, use_regex, refresh)
+                except re.error as e:
+                    st.error(f"正则表达式无效: {str(e)}")
                 else:
-                    st.warning(f"未找到包含关键词 '{keyword}' 的日志记录")
+                    render_search_results("main", cursor, keyword, len(log_files), export_name)
             else:
                 # 没有关键词，只读取最新的200行
                 if len(log_files) > 0:
@@ -201,19 +145,19 @@ def render_logs_view():
                     
                     if filtered_lines:
                         st.code("".join(filtered_lines), language="text")
+                        render_structured(filtered_lines)
                         st.info(f"显示最新 {len(filtered_lines)} 行日志")
+                        
+                        # 导出功能（仅当有数据时显示）
+                        if st.download_button(
+                            "📥 导出筛选结果", 
+                            "".join(filtered_lines), 
+                            file_name=f"{export_name}.txt",
+                            mime="text/plain"
+                        ):
+                            st.success("日志导出成功！")
                     else:
                         st.warning("在指定时间范围内没有日志记录")
-            
-            # 导出功能（仅当有数据时显示）
-            if 'filtered_lines' in locals() and filtered_lines:
-                if st.download_button(
-                    "📥 导出筛选结果", 
-                    "".join(filtered_lines), 
-                    file_name=f"main_log_export_{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}.txt",
-                    mime="text/plain"
-                ):
-                    st.success("日志导出成功！")
     
     # 行情日志选项卡
     with tab2:
@@ -223,6 +167,7 @@ def render_logs_view():
         col1, col2, col3 = st.columns(3)
         with col1:
             keyword = st.text_input("关键词过滤", key="tick_keyword")
+            use_regex = st.checkbox("正则表达式", key="tick_regex")
         with col2:
             start_date = st.date_input("开始日期", key="tick_start_date")
             start_time = datetime.combine(start_date, datetime.min.time())
@@ -237,22 +182,20 @@ def render_logs_view():
         
         # 获取日期范围内的所有日志文件
         log_files = get_log_files_in_date_range(log_base_path, "tick", start_date, end_date)
+        export_name = f"tick_log_export_{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}"
         
         if not log_files:
             st.warning(f"在指定日期范围内未找到日志文件")
         else:
             # 根据是否有关键词决定读取方式
             if keyword:
-                # 有关键词，进行全文搜索
-                with st.spinner(f"正在搜索 {len(log_files)} 个日志文件..."):
-                    log_lines = read_log_content(log_files, keyword)
-                    filtered_lines = filter_logs_by_time(log_lines, start_time, end_time)
-                
-                if filtered_lines:
-                    st.code("".join(filtered_lines), language="text")
-                    st.info(f"找到 {len(filtered_lines)} 条匹配记录，来自 {len(log_files)} 个日志文件")
+                # 有关键词，进行全文搜索，结果分页显示
+                try:
+                    cursor = get_cursor("tick", log_files, start_time, end_time, keyword, use_regex, refresh)
+                except re.error as e:
+                    st.error(f"正则表达式无效: {str(e)}")
                 else:
-                    st.warning(f"未找到包含关键词 '{keyword}' 的日志记录")
+                    render_search_results("tick", cursor, keyword, len(log_files), export_name)
             else:
                 # 没有关键词，只读取最新的200行
                 if len(log_files) > 0:
@@ -263,19 +206,19 @@ def render_logs_view():
                     
                     if filtered_lines:
                         st.code("".join(filtered_lines), language="text")
+                        render_structured(filtered_lines)
                         st.info(f"显示最新 {len(filtered_lines)} 行日志")
+                        
+                        # 导出功能（仅当有数据时显示）
+                        if st.download_button(
+                            "📥 导出筛选结果", 
+                            "".join(filtered_lines), 
+                            file_name=f"{export_name}.txt",
+                            mime="text/plain"
+                        ):
+                            st.success("日志导出成功！")
                     else:
                         st.warning("在指定时间范围内没有日志记录")
-            
-            # 导出功能（仅当有数据时显示）
-            if 'filtered_lines' in locals() and filtered_lines:
-                if st.download_button(
-                    "📥 导出筛选结果", 
-                    "".join(filtered_lines), 
-                    file_name=f"tick_log_export_{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}.txt",
-                    mime="text/plain"
-                ):
-                    st.success("日志导出成功！")
 
 # 渲染日志查询页面
 render_logs_view()
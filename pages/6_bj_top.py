@@ -10,6 +10,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "../.."))
 from stock_common_utils.data_manager import DataManager
 from stock_common_utils.stock_code_config import *
 from stock_common_utils.date_utils import get_last_trading_day
+from ranking_helper import build_ranking
+from metrics import cached
 
 # 页面标题
 st.title("北交所股票排行榜")
@@ -29,7 +31,7 @@ stock_sets = {
 selected_stock_set = st.selectbox("选择股票集合", options=list(stock_sets.keys()), format_func=lambda x: stock_sets[x])
 
 # 获取选定日期的股票数据
-@st.cache_data
+@cached("bj_top.get_stock_data", st.cache_data)
 def get_stock_data(date, stock_set):
     try:
         # 根据选择的股票集合获取相应的股票代码列表
@@ -73,57 +75,8 @@ def get_stock_data(date, stock_set):
         last_day_data_dict = data_manager.get_local_daily_data(['code', 'close'], stock_codes, last_tradedate)
         #print(f"前一交易日数据: {last_day_data_dict}")
         
-        # 将字典格式转换为单个DataFrame
-        result_df = pd.DataFrame()
-        for code, df in stock_data_dict.items():
-            if not df.empty:
-                # 确保日期索引是字符串格式
-                date_idx = df.index[0]
-                if isinstance(date_idx, str) or isinstance(date_idx, int):
-                    # 创建单行数据
-                    row_data = df.loc[date_idx].copy() if date_idx in df.index else pd.Series()
-                    if not row_data.empty:
-                        # 添加股票代码
-                        row_data['code'] = code
-                        # 如果没有name列，添加一个空的name列
-                        if 'name' not in row_data:
-                            row_data['name'] = code.split('.')[0]
-                        
-                        # 获取前一个交易日的收盘价
-                        if code in last_day_data_dict and not last_day_data_dict[code].empty:
-                            last_idx = last_day_data_dict[code].index[0]
-                            if last_idx in last_day_data_dict[code].index:
-                                row_data['pre_close'] = last_day_data_dict[code].loc[last_idx, 'close']
-                                #print(f"close: {row_data['close']}, pre_close: {row_data['pre_close']}")
-                        
-                        # 将行数据添加到结果DataFrame
-                        result_df = pd.concat([result_df, pd.DataFrame([row_data])])
-        
-        # 重置索引
-        if not result_df.empty:
-            result_df = result_df.reset_index(drop=True)
-            
-            # 确保数据包含必要的列
-            for col in required_columns:
-                if col not in result_df.columns:
-                    if col == 'pre_close':
-                        # 如果没有pre_close列，使用前一天的收盘价
-                        result_df['pre_close'] = result_df['close']
-                    else:
-                        st.error(f"数据中缺少必要的列: {col}")
-                        return pd.DataFrame()
-            
-            # 计算涨跌幅
-            result_df['change_pct'] = (result_df['close'] - result_df['pre_close']) / result_df['pre_close'] * 100
-            
-            # 将NaN值替换为0
-            result_df = result_df.fillna(0)
-            
-            # 确保所有数值列都是数值类型
-            numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount', 'pre_close', 'change_pct']
-            for col in numeric_cols:
-                if col in result_df.columns:
-                    result_df[col] = pd.to_numeric(result_df[col], errors='coerce').fillna(0)
+        # 合并当日数据和前收盘价，计算涨跌幅
+        result_df = build_ranking(stock_data_dict, last_day_data_dict, required_columns)
         
         return result_df
     except Exception as e:
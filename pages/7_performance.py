@@ -0,0 +1,71 @@
+# performance_app.py - 性能监控页面
+import streamlit as st
+import metrics
+from config import METRICS_ENABLED, METRICS_PORT, get_footer_text
+
+# 初始化页面
+st.set_page_config(
+    page_title="性能监控",
+    page_icon="⏱️",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Prometheus 文本格式端点（config.METRICS_PORT 为空时不启动）
+if METRICS_PORT:
+    metrics.serve(METRICS_PORT)
+
+def render_performance_view():
+    """渲染性能监控页面"""
+    st.title("⏱️ 性能监控")
+
+    if not METRICS_ENABLED:
+        st.info("性能埋点未开启，请在 config.py 中设置 METRICS_ENABLED = True")
+        return
+
+    registry = metrics.registry
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        uptime = registry.uptime()
+        st.caption(f"统计时长 {uptime / 60:.1f} 分钟" +
+                   (f" · Prometheus 端点 :{METRICS_PORT}/metrics" if METRICS_PORT else ""))
+    with col2:
+        if st.button("🧹 清空统计"):
+            registry.reset()
+            st.rerun()
+
+    st.subheader("调用耗时")
+    timers = registry.timers_frame()
+    if timers.empty:
+        st.info("暂无埋点数据")
+    else:
+        sort_by = st.selectbox("排序字段", ["总耗时(s)", "p99(ms)", "调用次数", "调用/秒"], key="perf_sort")
+        st.dataframe(timers.sort_values(sort_by, ascending=False), use_container_width=True, hide_index=True,
+                     column_config={c: st.column_config.NumberColumn(format="%.3f")
+                                    for c in ["平均(ms)", "p50(ms)", "p95(ms)", "p99(ms)", "最大(ms)", "总耗时(s)", "调用/秒"]})
+
+    st.subheader("缓存命中率")
+    caches = registry.cache_frame()
+    if caches.empty:
+        st.info("暂无缓存数据")
+    else:
+        st.dataframe(caches, use_container_width=True, hide_index=True,
+                     column_config={"命中率": st.column_config.ProgressColumn(min_value=0, max_value=1, format="%.2f")})
+
+    st.subheader("计数器")
+    counters = registry.counters_frame()
+    if counters.empty:
+        st.info("暂无计数器数据")
+    else:
+        st.dataframe(counters, use_container_width=True, hide_index=True)
+
+    with st.expander("Prometheus 文本格式"):
+        text = registry.prometheus()
+        st.code(text, language="text")
+        st.download_button("📥 导出", text, file_name="metrics.prom", mime="text/plain")
+
+# 渲染性能监控页面
+render_performance_view()
+
+# 页脚
+st.caption(get_footer_text())
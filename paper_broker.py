@@ -0,0 +1,455 @@
+# paper_broker.py - 进程内模拟券商
+"""
+实现本项目用到的 XtQuantTrader / xtdata 子集，用于在没有 miniQMT 终端的环境（Linux、CI、压测）下
+原样运行 MiniTrader 和 AccountUpdater：
+
+- PaperTrader：start / stop / connect / subscribe / register_callback / query_stock_* /
+  order_stock_async / cancel_order_stock，回调在独立线程上按模拟延迟推送
+- PaperMarket：行情源（回放文件或 push_tick 推送），同时驱动撮合
+- xtconstant：本项目用到的常量
+
+撮合规则（确定性，只由行情顺序决定）：
+- 买单在 卖一价 <= 委托价（市价单不限）时按卖一价成交，卖单在 买一价 >= 委托价时按买一价成交
+- partial_fill 开启时单笔行情最多成交对手盘挂单量，剩余部分等待后续行情
+- 受理时先按最新行情撮合一次
+延迟、随机废单由 seed 固定的随机数生成，同样的配置和行情得到同样的结果。
+"""
+import copy
+import heapq
+import time
+import random
+import threading
+from types import SimpleNamespace
+from quote_service import ReplayQuoteSource
+from logger import logger
+
+# 与 xtquant.xtconstant 一致的常量
+xtconstant = SimpleNamespace(
+    STOCK_BUY=23,
+    STOCK_SELL=24,
+    LATEST_PRICE=5,
+    FIX_PRICE=11,
+    OFFSET_FLAG_OPEN=48,
+    OFFSET_FLAG_CLOSE=49,
+    ORDER_UNREPORTED=48,
+    ORDER_WAIT_REPORTING=49,
+    ORDER_REPORTED=50,
+    ORDER_REPORTED_CANCEL=51,
+    ORDER_PARTSUCC_CANCEL=52,
+    ORDER_PART_CANCEL=53,
+    ORDER_CANCELED=54,
+    ORDER_PART_SUCC=55,
+    ORDER_SUCCEEDED=56,
+    ORDER_JUNK=57,
+)
+
+DEFAULT_CONFIG = {
+    "cash": 1000000.0,
+    # 初始持仓 {代码: (数量, 成本价)}，视为昨日持仓，当日可卖
+    "positions": {},
+    # 行情回放文件（见 ReplayQuoteSource），为空时由调用方 push_tick
+    "quote_file": None,
+    "replay_speed": 0.0,
+    # 延迟分布（秒）：("const", x) / ("uniform", a, b) / ("normal", mu, sigma) / ("lognormal", mu, sigma)
+    "ack_latency": ("const", 0.001),
+    "accept_latency": ("const", 0.005),
+    "fill_latency": ("const", 0.0),
+    # 随机废单比例
+    "reject_rate": 0.0,
+    "partial_fill": True,
+    # 佣金费率
+    "fee_rate": 0.0,
+    "seed": 0,
+}
+
+
+def sample_latency(spec, rng):
+    """按延迟分布配置取一个样本（秒，不小于 0）"""
+    kind, *args = spec
+    if kind == "const":
+        value = args[0]
+    elif kind == "uniform":
+        value = rng.uniform(*args)
+    elif kind == "normal":
+        value = rng.gauss(*args)
+    elif kind == "lognormal":
+        value = rng.lognormvariate(*args)
+    else:
+        raise ValueError(f"未知的延迟分布: {kind}")
+    return max(value, 0.0)
+
+
+class XtQuantTraderCallback:
+    """回调基类（与 xtquant.xttrader.XtQuantTraderCallback 相同的方法名）"""
+
+    def on_disconnected(self):
+        pass
+
+    def on_stock_order(self, order):
+        pass
+
+    def on_stock_trade(self, trade):
+        pass
+
+    def on_order_error(self, order_error):
+        pass
+
+    def on_cancel_error(self, cancel_error):
+        pass
+
+    def on_order_stock_async_response(self, response):
+        pass
+
+    def on_stock_asset(self, asset):
+        pass
+
+    def on_stock_position(self, position):
+        pass
+
+
+class StockAccount:
+    def __init__(self, account_id, account_type="STOCK"):
+        self.account_id = account_id
+        self.account_type = account_type
+
+
+class PaperMarket(ReplayQuoteSource):
+    """模拟行情：xtdata 的订阅/快照接口 + 驱动已连接 PaperTrader 的撮合"""
+
+    def __init__(self, path=None, speed=0.0):
+        super().__init__(path, speed)
+        self.brokers = []
+
+    def push_tick(self, code, tick):
+        super().push_tick(code, tick)
+        for broker in list(self.brokers):
+            broker._match(code, tick)
+
+
+class PaperTrader:
+    """XtQuantTrader 的模拟实现"""
+
+    def __init__(self, path, session_id, market=None, config=None):
+        self.path = path
+        self.session_id = session_id
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.market = market if market is not None else PaperMarket()
+        self.rng = random.Random(self.config["seed"])
+        self.callback = None
+        self.account = StockAccount("paper")
+        self.connected = False
+        self.balance = float(self.config["cash"])
+        self.positions = {}
+        for code, (volume, cost) in self.config["positions"].items():
+            self.positions[code] = {"volume": volume, "yesterday_volume": volume, "can_use_volume": volume,
+                                    "frozen_volume": 0, "open_price": cost}
+        self.orders = {}
+        self.trades = []
+        self._working = []
+        self._next_seq = 1
+        self._next_order_id = 1
+        self._next_trade_id = 1
+        self._lock = threading.RLock()
+        # 回调调度：(到期时间, 序号, 回调方法名, 参数)
+        self._events = []
+        self._event_seq = 0
+        self._wakeup = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- 连接 ----------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"paper-callback-{self.session_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify()
+        if self in self.market.brokers:
+            self.market.brokers.remove(self)
+
+    def connect(self):
+        self.connected = True
+        if self not in self.market.brokers:
+            self.market.brokers.append(self)
+        return 0
+
+    def subscribe(self, account):
+        self.account = account
+        return 0
+
+    def register_callback(self, callback):
+        self.callback = callback
+
+    # ---------- 回调调度 ----------
+    def _schedule(self, delay, method, arg=None):
+        with self._wakeup:
+            self._event_seq += 1
+            heapq.heappush(self._events, (time.monotonic() + delay, self._event_seq, method, arg))
+            self._wakeup.notify()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._wakeup:
+                if not self._events:
+                    self._wakeup.wait(0.5)
+                    continue
+                due, _, method, arg = self._events[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._wakeup.wait(wait)
+                    continue
+                heapq.heappop(self._events)
+            try:
+                if callable(method):
+                    method(arg)
+                elif self.callback is not None:
+                    handler = getattr(self.callback, method)
+                    handler() if arg is None else handler(arg)
+            except Exception as e:
+                logger.error(f"模拟券商回调异常 {method}: {e}")
+
+    def _latency(self, name):
+        return sample_latency(self.config[name], self.rng)
+
+    # ---------- 查询 ----------
+    def _last_price(self, code):
+        tick = self.market._latest.get(code)
+        return tick.get("lastPrice", 0.0) if tick else 0.0
+
+    def _frozen_cash(self):
+        return sum(o["frozen"] for o in self._working)
+
+    def query_stock_asset(self, account):
+        with self._lock:
+            market_value = sum(p["volume"] * (self._last_price(c) or p["open_price"])
+                               for c, p in self.positions.items())
+            frozen = self._frozen_cash()
+            return SimpleNamespace(
+                account_id=account.account_id,
+                cash=self.balance - frozen,
+                frozen_cash=frozen,
+                market_value=market_value,
+                total_asset=self.balance + market_value,
+            )
+
+    def _position(self, account, code, p):
+        price = self._last_price(code) or p["open_price"]
+        return SimpleNamespace(
+            account_id=account.account_id,
+            stock_code=code,
+            volume=p["volume"],
+            can_use_volume=p["can_use_volume"],
+            frozen_volume=p["frozen_volume"],
+            open_price=p["open_price"],
+            avg_price=p["open_price"],
+            market_value=p["volume"] * price,
+            on_road_volume=0,
+            yesterday_volume=p["yesterday_volume"],
+        )
+
+    def query_stock_positions(self, account):
+        with self._lock:
+            return [self._position(account, c, p) for c, p in self.positions.items() if p["volume"]]
+
+    def query_stock_orders(self, account, cancelable_only=False):
+        with self._lock:
+            orders = [o for o in self.orders.values()
+                      if not cancelable_only or o.order_status in (xtconstant.ORDER_REPORTED, xtconstant.ORDER_PART_SUCC)]
+            return [copy.copy(o) for o in orders]
+
+    def query_stock_trades(self, account):
+        with self._lock:
+            return list(self.trades)
+
+    # ---------- 下单 ----------
+    def order_stock_async(self, account, stock_code, order_type, order_volume, price_type, price,
+                          strategy_name="", order_remark=""):
+        """返回 seq；异步回报、受理、成交按模拟延迟从回调线程推送"""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            order_id = self._next_order_id
+            self._next_order_id += 1
+            order = SimpleNamespace(
+                account_id=account.account_id,
+                stock_code=stock_code,
+                order_id=order_id,
+                order_sysid=str(order_id),
+                order_time=int(time.time()),
+                order_type=order_type,
+                order_volume=int(order_volume),
+                price_type=price_type,
+                price=price,
+                traded_volume=0,
+                traded_price=0.0,
+                order_status=xtconstant.ORDER_UNREPORTED,
+                status_msg="",
+                strategy_name=strategy_name,
+                order_remark=order_remark,
+                direction=0,
+                offset_flag=xtconstant.OFFSET_FLAG_OPEN if order_type == xtconstant.STOCK_BUY
+                else xtconstant.OFFSET_FLAG_CLOSE,
+            )
+            self.orders[order_id] = order
+        response = SimpleNamespace(account_id=account.account_id, order_id=order_id, seq=seq,
+                                   strategy_name=strategy_name, order_remark=order_remark, error_msg="")
+        ack = self._latency("ack_latency")
+        self._schedule(ack, "on_order_stock_async_response", response)
+        self._schedule(ack + self._latency("accept_latency"), self._accept, order_id)
+        return seq
+
+    def order_stock(self, account, stock_code, order_type, order_volume, price_type, price,
+                    strategy_name="", order_remark=""):
+        """同步下单：返回 order_id"""
+        self.order_stock_async(account, stock_code, order_type, order_volume, price_type, price,
+                               strategy_name, order_remark)
+        return self._next_order_id - 1
+
+    def cancel_order_stock(self, account, order_id):
+        with self._lock:
+            working = next((w for w in self._working if w["order"].order_id == order_id), None)
+            if working is None:
+                return -1
+            self._working.remove(working)
+            order = working["order"]
+            self._release(working)
+            order.order_status = (xtconstant.ORDER_PART_CANCEL if order.traded_volume
+                                  else xtconstant.ORDER_CANCELED)
+            snapshot = copy.copy(order)
+        self._schedule(0.0, "on_stock_order", snapshot)
+        return 0
+
+    def _reject(self, order, message):
+        """废单（调用方已持有锁）"""
+        order.order_status = xtconstant.ORDER_JUNK
+        order.status_msg = message
+        error = SimpleNamespace(account_id=order.account_id, order_id=order.order_id, error_id=-1,
+                                error_msg=message, strategy_name=order.strategy_name,
+                                order_remark=order.order_remark)
+        self._schedule(0.0, "on_order_error", error)
+        self._schedule(0.0, "on_stock_order", copy.copy(order))
+
+    def _accept(self, order_id):
+        """柜台受理：检查资金/持仓、冻结，然后按最新行情撮合一次"""
+        with self._lock:
+            order = self.orders[order_id]
+            buy = order.order_type == xtconstant.STOCK_BUY
+            ref_price = order.price if order.price_type != xtconstant.LATEST_PRICE or order.price > 0 \
+                else self._last_price(order.stock_code)
+            if self.config["reject_rate"] and self.rng.random() < self.config["reject_rate"]:
+                self._reject(order, "模拟废单")
+                return
+            if order.order_volume <= 0:
+                self._reject(order, "委托数量错误")
+                return
+            working = {"order": order, "frozen": 0.0}
+            if buy:
+                cost = order.order_volume * ref_price * (1 + self.config["fee_rate"])
+                if ref_price <= 0 or cost > self.balance - self._frozen_cash():
+                    self._reject(order, "可用资金不足")
+                    return
+                working["frozen"] = cost
+            else:
+                position = self.positions.get(order.stock_code)
+                if position is None or position["can_use_volume"] < order.order_volume:
+                    self._reject(order, "可用股份不足")
+                    return
+                position["can_use_volume"] -= order.order_volume
+                position["frozen_volume"] += order.order_volume
+            order.order_status = xtconstant.ORDER_REPORTED
+            self._working.append(working)
+            self._schedule(0.0, "on_stock_order", copy.copy(order))
+            tick = self.market._latest.get(order.stock_code)
+        if tick:
+            self._match(order.stock_code, tick)
+
+    def _release(self, working):
+        """撤单/完成时释放剩余冻结（调用方已持有锁）"""
+        order = working["order"]
+        if order.order_type == xtconstant.STOCK_SELL:
+            remaining = order.order_volume - order.traded_volume
+            position = self.positions[order.stock_code]
+            position["frozen_volume"] -= remaining
+            position["can_use_volume"] += remaining
+        working["frozen"] = 0.0
+
+    # ---------- 撮合 ----------
+    def _match(self, code, tick):
+        """一笔行情到达：按委托顺序撮合该代码的在途委托"""
+        with self._lock:
+            for working in [w for w in self._working if w["order"].stock_code == code]:
+                self._fill(working, tick)
+
+    def _fill(self, working, tick):
+        """调用方已持有锁"""
+        order = working["order"]
+        code = order.stock_code
+        buy = order.order_type == xtconstant.STOCK_BUY
+        last = tick.get("lastPrice", 0.0)
+        side_price = tick.get("askPrice" if buy else "bidPrice")
+        side_volume = tick.get("askVol" if buy else "bidVol")
+        if isinstance(side_price, (list, tuple)):
+            side_price = side_price[0] if side_price else 0.0
+        if isinstance(side_volume, (list, tuple)):
+            side_volume = side_volume[0] if side_volume else 0
+        price = side_price or last
+        if price <= 0:
+            return
+        market = order.price_type == xtconstant.LATEST_PRICE
+        if not market and ((buy and price > order.price) or (not buy and price < order.price)):
+            return
+        volume = order.order_volume - order.traded_volume
+        if self.config["partial_fill"] and side_volume:
+            volume = min(volume, int(side_volume))
+        if volume <= 0:
+            return
+
+        amount = volume * price
+        fee = amount * self.config["fee_rate"]
+        position = self.positions.setdefault(code, {"volume": 0, "yesterday_volume": 0, "can_use_volume": 0,
+                                                    "frozen_volume": 0, "open_price": 0.0})
+        if buy:
+            held = position["volume"]
+            position["open_price"] = (position["open_price"] * held + amount + fee) / (held + volume)
+            position["volume"] = held + volume
+            self.balance -= amount + fee
+            working["frozen"] = max(working["frozen"] - amount - fee, 0.0)
+        else:
+            position["volume"] -= volume
+            position["frozen_volume"] -= volume
+            self.balance += amount - fee
+
+        order.traded_price = (order.traded_price * order.traded_volume + amount) / (order.traded_volume + volume)
+        order.traded_volume += volume
+        finished = order.traded_volume >= order.order_volume
+        order.order_status = xtconstant.ORDER_SUCCEEDED if finished else xtconstant.ORDER_PART_SUCC
+        if finished:
+            self._working.remove(working)
+            self._release(working)
+
+        trade = SimpleNamespace(
+            account_id=order.account_id,
+            stock_code=code,
+            order_type=order.order_type,
+            traded_id=str(self._next_trade_id),
+            traded_time=int(time.time()),
+            traded_price=price,
+            traded_volume=volume,
+            traded_amount=amount,
+            order_id=order.order_id,
+            order_sysid=order.order_sysid,
+            strategy_name=order.strategy_name,
+            order_remark=order.order_remark,
+            direction=0,
+            offset_flag=order.offset_flag,
+        )
+        self._next_trade_id += 1
+        self.trades.append(trade)
+        delay = self._latency("fill_latency")
+        self._schedule(delay, "on_stock_trade", trade)
+        self._schedule(delay, "on_stock_order", copy.copy(order))
+        self._schedule(delay, "on_stock_position", self._position(self.account, code, position))
+        self._schedule(delay, "on_stock_asset", self.query_stock_asset(self.account))
@@ -1,48 +1,35 @@
 # postmarket.py - 盘后业务逻辑
 import streamlit as st
-from trader import get_account_info, get_trades
+from trader import get_account_info, get_trades, get_quotes
 from common import get_xueqiu_link
-import os
-import json
 import pandas as pd
-import glob
-from datetime import datetime
-from postmarket_helper import get_history_trade_from_files
+from datetime import datetime, timedelta
+from trade_index import TradeIndex, SORT_COLUMNS
+from config import ACCOUNT_DATA_DIR
+from equity_curve import refresh_equity_curve
+from snapshot_store import sync_store
+from analytics import compute_performance
+from lot_engine import update_lot_engine
+from metrics import cached, timer
+
+@cached("postmarket.get_trade_index", st.cache_resource)
+def get_trade_index(data_dir=ACCOUNT_DATA_DIR):
+    """获取历史成交索引实例（进程内共享）"""
+    return TradeIndex(data_dir)
 
 def render_postmarket_view(path, account_id):
     """渲染盘后视图"""
+    # 快照库是盘后各视图的数据源：先导入缺失或改写过的 JSON 日期
+    with timer("postmarket.sync_store"):
+        store = sync_store(ACCOUNT_DATA_DIR)
+
     # 一行一列，依次展示
     st.subheader("总资产走势")
 
-    # 读取所有 account_positions 下的 json 文件（已改为绝对路径）
-    data_dir = r"D:\Users\Jack\myqmt_admin\data\account\account_positions"
-    files = [f for f in os.listdir(data_dir) if f.endswith(".json") and f[:8].isdigit()]
-    files.sort()  # 按日期排序
-
-    records = []
-    for fname in files:
-        date_str = fname[:8]
-        try:
-            with open(os.path.join(data_dir, fname), "r", encoding="utf-8") as f:
-                data = json.load(f)
-            info = data.get("account_info", {})
-            total_asset = info.get("总资产")
-            market_value = info.get("持仓市值")
-            if total_asset is not None and market_value is not None:
-                records.append({
-                    "date": pd.to_datetime(date_str),
-                    "总资产": total_asset,
-                    "持仓市值": market_value
-                })
-        except Exception as e:
-            continue
-
-    df = pd.DataFrame(records).set_index("date").sort_index()
-    # 补全缺失日期，线性插值
+    # 资产曲线增量物化：只从快照库读取新增或改写过的日期
+    with timer("postmarket.refresh_equity_curve"):
+        df = refresh_equity_curve(ACCOUNT_DATA_DIR, store)
     if not df.empty:
-        all_days = pd.date_range(df.index.min(), df.index.max(), freq="D")
-        df = df.reindex(all_days)
-        df = df.interpolate(method="linear")
         st.line_chart(df[["总资产", "持仓市值"]])
     else:
         st.info("暂无资产数据")
@@ -63,32 +50,93 @@ def render_postmarket_view(path, account_id):
     else:
         st.dataframe(trades_df, use_container_width=True)
         
-    # 这里可以添加盘后特有的业务逻辑
-    # 例如：绩效分析、收益统计等
+    st.subheader("绩效分析")
+    # 成本计算方式同时影响策略归因和下方的已实现盈亏
+    cost_method = st.radio("成本计算", ["fifo", "average"], horizontal=True,
+                           format_func=lambda x: {"fifo": "先进先出", "average": "平均成本"}[x])
+    with timer("postmarket.update_lot_engine"):
+        lots = update_lot_engine(ACCOUNT_DATA_DIR, store, cost_method)
+    with timer("postmarket.compute_performance"):
+        perf = compute_performance(df, store, lots)
+    summary = perf["summary"]
+    if summary["交易日数"] > 1:
+        cols = st.columns(4)
+        cols[0].metric("累计收益率", f"{summary['累计收益率']:.2%}")
+        cols[1].metric("最大回撤", f"{summary['最大回撤']:.2%}", f"{summary['最长回撤天数']} 个交易日", delta_color="off")
+        cols[2].metric("夏普 / 索提诺", f"{summary['夏普比率']:.2f} / {summary['索提诺比率']:.2f}")
+        cols[3].metric("年化波动率", f"{summary['年化波动率']:.2%}")
+        cols = st.columns(4)
+        cols[0].metric("日胜率", f"{summary['日胜率']:.2%}")
+        cols[1].metric("平均日换手率", f"{summary['平均日换手率']:.2%}")
+        cols[2].metric("交易日数", summary["交易日数"])
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.caption("月度收益率")
+            st.bar_chart(perf["monthly"].rename("月收益率"))
+        with col2:
+            st.caption("回撤")
+            st.area_chart(perf["drawdown"].rename("回撤"))
+        st.caption("策略归因（成交与已实现盈亏）")
+        st.dataframe(perf["attribution"], use_container_width=True)
+    else:
+        st.info("交易日不足，暂无绩效数据")
+
+    st.subheader("已实现盈亏")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("按代码汇总")
+        st.dataframe(lots.realized_by_symbol(), use_container_width=True)
+    with col2:
+        st.caption("当前未平仓批次")
+        st.dataframe(lots.open_lots(get_quotes(path, account_id).last_prices()), use_container_width=True)
 
     st.subheader("历史成交（不含今日）")
 
-    trades_dir = r"D:\Users\Jack\myqmt_admin\data\account\trades_orders"
-    trade_files = sorted(
-        glob.glob(os.path.join(trades_dir, "*.json")),
-        reverse=True
-    )
+    # 增量刷新本地索引，只导入快照库中新增或改写过的日期
+    index = get_trade_index()
+    with timer("postmarket.trade_index_refresh"):
+        index.refresh(store)
+
+    # 查询条件
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        start_date = st.date_input("开始日期", datetime.now().date() - timedelta(days=90), key="hist_start")
+    with col2:
+        end_date = st.date_input("结束日期", datetime.now().date() - timedelta(days=1), key="hist_end")
+    with col3:
+        code = st.text_input("证券代码", key="hist_code")
+    with col4:
+        strategy = st.text_input("策略/备注", key="hist_strategy")
+    with col5:
+        side = st.selectbox("方向", ["全部", "buy", "sell"], key="hist_side")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort_by = st.selectbox("排序字段", list(SORT_COLUMNS.keys()), key="hist_sort")
+    with col2:
+        descending = st.checkbox("倒序", value=True, key="hist_desc")
+    with col3:
+        page_size = st.selectbox("每页行数", [50, 100, 200], key="hist_page_size")
 
-    # 使用辅助函数获取历史交易记录
-    all_trades = get_history_trade_from_files(trade_files)
+    filters = dict(
+        start=start_date.strftime("%Y%m%d"),
+        end=end_date.strftime("%Y%m%d"),
+        code=code.strip() or None,
+        strategy=strategy.strip() or None,
+        side=None if side == "全部" else side,
+    )
+    total = index.count(**filters)
+    pages = max((total + page_size - 1) // page_size, 1)
+    page = st.number_input(f"页码（共 {pages} 页，{total} 条）", min_value=1, max_value=pages, value=1, key="hist_page")
+    df_trades = index.query(sort_by=sort_by, descending=descending, page=page, page_size=page_size, **filters)
 
-    # 转为DataFrame并按日期和时间倒序排列
-    # 历史成交记录部分
-    if all_trades:
-        df_trades = pd.DataFrame(all_trades)
-        # 如果存在证券代码列，将其转换为可点击链接
-        if 'StockCode' in df_trades.columns:
-            display_df = df_trades.copy()
-            display_df['StockCode'] = df_trades['StockCode'].apply(
-                lambda x: f'<a href="{get_xueqiu_link(x)}" target="_blank">{x}</a>' if pd.notna(x) else ''
-            )
-            st.write(display_df.to_html(escape=False), unsafe_allow_html=True)
-        else:
-            st.dataframe(df_trades, use_container_width=True)
+    # 历史成交记录部分（只渲染当前页）
+    if not df_trades.empty:
+        display_df = df_trades.copy()
+        display_df['StockCode'] = df_trades['StockCode'].apply(
+            lambda x: f'<a href="{get_xueqiu_link(x)}" target="_blank">{x}</a>' if pd.notna(x) else ''
+        )
+        st.write(display_df.to_html(escape=False, index=False), unsafe_allow_html=True)
     else:
         st.info("暂无历史成交记录")
\ No newline at end of file
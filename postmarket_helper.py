@@ -1,60 +1,122 @@
 import os
 import json
 import pandas as pd
+from snapshot_store import TRADE_FIELD_MAPPING
+from metrics import incr, timed
 
-def get_history_trade_from_files(trade_files):
+# 成交类型代码（与 xtconstant.STOCK_BUY / STOCK_SELL 一致）
+TRADE_TYPE_MAP = {23: "buy", 24: "sell"}
+
+# 历史成交的输出列及类型
+HISTORY_TRADE_DTYPES = {
+    "日期": "string",
+    "StockCode": "category",
+    "Volume": "int64",
+    "Price": "float64",
+    "Value": "float64",
+    "TradeType": "category",
+    "Strategy": "string",
+    "Remark": "string",
+    "OrderId": "int64",
+    "TradeId": "string",
+    "TradeTime": "string",
+}
+
+
+def _parse_trade_file(file):
+    """解析单个成交文件，返回已标准化的 DataFrame（每个文件只做一次向量化处理）"""
+    with open(file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+        incr("bytes_read.trade_files", os.fstat(f.fileno()).st_size)
+    df = pd.DataFrame(data.get("trades", []))
+    if df.empty:
+        return df
+
+    # 字段名称映射：将中文字段名称转换为英文字段名称
+    df = df.rename(columns=TRADE_FIELD_MAPPING)
+    df.insert(0, "日期", os.path.basename(file)[:8])
+
+    # 处理 TradeType 值：23 -> buy, 24 -> sell，其他值原样保留
+    if "TradeType" in df.columns:
+        df["TradeType"] = df["TradeType"].map(TRADE_TYPE_MAP).fillna(df["TradeType"]).astype(str)
+    return df
+
+
+def _conform_history(df):
+    """统一输出列类型"""
+    for col, dtype in HISTORY_TRADE_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if dtype in ("int64", "float64"):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+            if dtype == "int64":
+                df[col] = df[col].fillna(0).astype("int64")
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+@timed()
+def load_history_trades(trade_files):
     """
-    从交易文件中获取历史成交记录
-    
+    加载 JSON 格式的历史成交记录（看板改为读取快照库，见 read_store_trades）
+
     Args:
         trade_files: 交易文件路径列表
-        
+
     Returns:
-        list: 包含所有标准化交易记录的列表
+        pd.DataFrame: 按 trade_files 顺序拼接的标准化成交记录，无法读取的文件会被跳过
     """
-    all_trades = []
+    parts = []
     for file in trade_files:
-        date_str = os.path.basename(file)[:8]
         try:
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            trades = data.get("trades", [])
-            for trade in trades:
-                # 字段名称映射：将中文字段名称转换为英文字段名称
-                field_mapping = {
-                    "证券代码": "StockCode",
-                    "成交数量": "Volume",
-                    "成交均价": "Price",
-                    "成交金额": "Value",
-                    "订单编号": "OrderId",
-                    "成交编号": "TradeId",
-                    "成交时间": "TradeTime"
-                }
-                
-                # 创建新的交易记录，统一使用英文字段名
-                normalized_trade = {}
-                
-                # 添加日期字段
-                normalized_trade["日期"] = date_str
-                
-                # 处理字段映射
-                for key, value in trade.items():
-                    if key in field_mapping:
-                        # 如果是中文字段名，转换为英文字段名
-                        normalized_trade[field_mapping[key]] = value
-                    else:
-                        # 如果已经是英文字段名或其他字段，保持不变
-                        normalized_trade[key] = value
-                
-                # 处理 TradeType 值：23 -> sell, 24 -> buy
-                if "TradeType" in normalized_trade:
-                    if normalized_trade["TradeType"] == 23:
-                        normalized_trade["TradeType"] = "sell"
-                    elif normalized_trade["TradeType"] == 24:
-                        normalized_trade["TradeType"] = "buy"
-                
-                all_trades.append(normalized_trade)
-        except Exception as e:
+            df = _parse_trade_file(file)
+        except Exception:
             continue
-            
-    return all_trades
\ No newline at end of file
+        if not df.empty:
+            parts.append(df)
+    if not parts:
+        return pd.DataFrame(columns=list(HISTORY_TRADE_DTYPES.keys()))
+    return _conform_history(pd.concat(parts, ignore_index=True))
+
+
+def strategy_of(trades):
+    """策略名：优先 Strategy 字段，旧文件没有时从 Remark（"<策略>_<代码>"）推断，都没有时记为“未知”"""
+    strategy = trades["Strategy"] if "Strategy" in trades.columns else pd.Series(pd.NA, index=trades.index)
+    remark = trades["Remark"] if "Remark" in trades.columns else pd.Series(pd.NA, index=trades.index)
+    inferred = remark.astype("string").str.rsplit("_", n=1).str[0]
+    strategy = strategy.astype("string").replace("", pd.NA)
+    return strategy.fillna(inferred).fillna("未知")
+
+
+def read_store_trades(store, start=None, end=None, dates=None):
+    """
+    从快照库读取历史成交，输出与 load_history_trades 相同的列和类型
+
+    Args:
+        store: SnapshotStore
+        start: 开始日期 YYYYMMDD（含），None 表示不限
+        end: 结束日期 YYYYMMDD（含），None 表示不限
+        dates: 可选，只读取这些日期
+
+    Returns:
+        pd.DataFrame: 按日期排序的标准化成交记录
+    """
+    df = store.read("trades", start=start, end=end, dates=dates).rename(columns={"date": "日期"})
+    if df.empty:
+        return pd.DataFrame(columns=list(HISTORY_TRADE_DTYPES.keys()))
+    df["TradeType"] = df["TradeType"].map(TRADE_TYPE_MAP).fillna(df["TradeType"].astype(str))
+    return _conform_history(df[list(HISTORY_TRADE_DTYPES.keys())])
+
+
+def get_history_trade_from_files(trade_files):
+    """
+    从交易文件中获取历史成交记录
+
+    Args:
+        trade_files: 交易文件路径列表
+
+    Returns:
+        list: 包含所有标准化交易记录的列表
+    """
+    return load_history_trades(trade_files).to_dict("records")
@@ -1,55 +1,316 @@
 import os
+import json
+import threading
+import numpy as np
 import pandas as pd
 import streamlit as st
-from collections import deque
 import re
+from config import QMT_LOG_DIR
+from log_blocks import open_blocks, open_log, is_compressed
+from metrics import incr, timed
+
+# 每次最多读入内存的字节数
+READ_CHUNK = 4 * 1024 * 1024
+# 首次打开时从末尾向前查找最后 N 行的块大小
+TAIL_BLOCK = 64 * 1024
+
+# 信号行定位：只在出现这段字面量的位置解析，其余行不做任何 Python 处理
+SIGNAL_MARK = re.compile("触发(?:买入|卖出)信号".encode("utf-8"))
+
+# 信号行字段（从行首匹配，字段用前瞻提取，和出现顺序无关）：
+#   2025-01-02 09:31:05,123 - INFO - [网格] 600000.SH 触发买入信号 价格: 10.50 阈值: 10.20
+# 时间、策略（方括号内）、价格、阈值缺失时为空；证券代码取行内第一个 六位数字.两位字母
+SIGNAL_RE = re.compile((
+    r"(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})?"
+    r"(?=[^\n]*?触发(?P<side>买入|卖出)信号)"
+    r"(?=[^\n]*?(?P<code>\d{6}\.[A-Z]{2}))"
+    r"(?:(?=[^\n]*?\[(?P<strategy>[^\]\n]*)\]))?"
+    r"(?:(?=[^\n]*?价格\s*(?::|：|=)\s*(?P<price>-?\d+(?:\.\d+)?)))?"
+    r"(?:(?=[^\n]*?阈值\s*(?::|：|=)\s*(?P<threshold>-?\d+(?:\.\d+)?)))?"
+    r"[^\n]*?信号(?P<detail>[^\n]*)"
+).encode("utf-8"))
+
+BUY = "买入".encode("utf-8")
+SIGNAL_COLUMNS = ["时间", "信号类型", "证券代码", "策略", "价格", "阈值", "详情"]
+# 去重键：同一策略对同一代码重复打出的相同信号只保留最后一次
+SIGNAL_KEY = ["信号类型", "证券代码", "策略", "详情"]
+
+def empty_signals():
+    """空信号表（列和类型与 parse_signals 一致）"""
+    return pd.DataFrame({
+        "时间": pd.Series(dtype="datetime64[s]"),
+        "信号类型": pd.Series(dtype=object),
+        "证券代码": pd.Series(dtype=object),
+        "策略": pd.Series(dtype=object),
+        "价格": pd.Series(dtype="float64"),
+        "阈值": pd.Series(dtype="float64"),
+        "详情": pd.Series(dtype=object),
+    })
+
+def _numbers(values):
+    arr = np.array(values, dtype="S32")
+    arr[arr == b""] = b"nan"
+    return arr.astype("float64")
+
+def _texts(values):
+    return pd.Series(values, dtype=object).str.decode("utf-8", errors="replace").to_numpy()
+
+def _structured_signal(data, start):
+    """JSON 行中的信号字段（与 SIGNAL_RE 的分组顺序一致），不是有效的 JSON 行时按文本行匹配"""
+    end = data.find(b"\n", start)
+    line = data[start:end if end >= 0 else len(data)]
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        match = SIGNAL_RE.match(line)
+        return match.groups(b"") if match else None
+    # 正文里没有证券代码时由 code 字段补上（放在行首，不影响详情）
+    text = f"{entry.get('code') or ''} {entry.get('msg') or ''}"
+    match = SIGNAL_RE.match(text.encode("utf-8"))
+    if not match:
+        return None
+    ts, side, code, strategy, price, threshold, detail = match.groups(b"")
+    ts = str(entry.get("ts") or "")[:19].encode("ascii", errors="ignore") or ts
+    code = str(entry.get("code") or "").encode("utf-8") or code
+    strategy = str(entry.get("strategy") or "").encode("utf-8") or strategy
+    return ts, side, code, strategy, price, threshold, detail
+
+def parse_signals(data):
+    """单次扫描一段日志字节，返回按列组织的信号表
+
+    先用字面量定位信号行，再对这些行做一次预编译匹配，字段按列整体转换类型。
+    logger.py 写出的 JSON 行（config.LOG_STRUCTURED）直接取 ts / code / strategy 字段，
+    买卖方向、价格、阈值、详情仍从 msg 中匹配。
+
+    Args:
+        data: 日志内容（bytes，utf-8）
+
+    Returns:
+        pd.DataFrame: 列为 SIGNAL_COLUMNS，时间为 datetime64，价格/阈值为 float64
+    """
+    rows = []
+    last_start = -1
+    for mark in SIGNAL_MARK.finditer(data):
+        start = data.rfind(b"\n", 0, mark.start()) + 1
+        if start == last_start:
+            continue
+        last_start = start
+        if data.startswith(b"{", start):
+            row = _structured_signal(data, start)
+            if row:
+                rows.append(row)
+            continue
+        match = SIGNAL_RE.match(data, start)
+        if match:
+            rows.append(match.groups(b""))
+    if not rows:
+        return empty_signals()
+    ts, side, code, strategy, price, threshold, detail = zip(*rows)
+    return pd.DataFrame({
+        "时间": np.array(ts, dtype="S19").astype("datetime64[s]"),
+        "信号类型": np.where(np.array(side, dtype="S8") == BUY, "买入", "卖出").astype(object),
+        "证券代码": np.array(code, dtype="S9").astype("U9").astype(object),
+        "策略": _texts(strategy),
+        "价格": _numbers(price),
+        "阈值": _numbers(threshold),
+        "详情": np.char.strip(_texts(detail).astype("U")).astype(object),
+    })
+
+def tail_offset(f, size, lines):
+    """从文件末尾向前按块查找，返回最后 lines 行的起始字节位置（f 以二进制打开）"""
+    pos = size
+    # 文件以换行结尾时，最后一个换行不是新一行的开始
+    needed = lines + 1 if size else lines
+    if size:
+        f.seek(size - 1)
+        if f.read(1) != b"\n":
+            needed = lines
+    while pos > 0:
+        step = min(TAIL_BLOCK, pos)
+        pos -= step
+        f.seek(pos)
+        block = f.read(step)
+        count = block.count(b"\n")
+        if count >= needed:
+            # 块内从后往前第 needed 个换行之后就是起点
+            idx = len(block)
+            for _ in range(needed):
+                idx = block.rfind(b"\n", 0, idx)
+            return pos + idx + 1
+        needed -= count
+    return 0
+
+class SignalTailer:
+    """按字节偏移增量读取日志中的交易信号
+
+    记住文件标识（st_dev, st_ino）和已读到的位置，每次只解析新追加的完整行。
+    TimedRotatingFileHandler 每天把 main.log 改名为 main.log.YYYYMMDD：发现标识变化时，
+    先按标识找到改名后的旧文件把剩余部分读完，再从新 main.log 的开头读起。
+    旧文件已被分块压缩（log_blocks）时按块索引里记录的原文件标识找到它，只解压 offset 之后的块。
+    信号表按列保存（见 parse_signals），按 SIGNAL_KEY 去重，只保留最近 max_signals 条。
+    """
+
+    def __init__(self, log_file, lines_limit=10000, max_signals=10000):
+        self.log_file = log_file
+        self.lines_limit = lines_limit
+        self.max_signals = max_signals
+        self.ident = None
+        self.offset = 0
+        self.bytes_read = 0
+        self.rotations = 0
+        self._frame = empty_signals()
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """读取新追加的内容，返回本次解析到的信号行数（去重前）"""
+        with self._lock:
+            try:
+                st_info = os.stat(self.log_file)
+            except FileNotFoundError:
+                # 轮转的瞬间新文件可能还没创建，下次再读
+                return 0
+            ident = (st_info.st_dev, st_info.st_ino)
+            added = 0
+            if self.ident is None:
+                # 首次打开只读最后 lines_limit 行
+                with open(self.log_file, "rb") as f:
+                    self.offset = tail_offset(f, st_info.st_size, self.lines_limit)
+                self.ident = ident
+            elif ident != self.ident:
+                rotated = self._find_rotated()
+                if rotated:
+                    added += self._read(rotated)
+                self.rotations += 1
+                self.ident = ident
+                self.offset = 0
+            elif st_info.st_size < self.offset:
+                # 文件被截断后重写
+                self.offset = 0
+            return added + self._read(self.log_file)
+
+    def _find_rotated(self):
+        """在同目录的 main.log.* 中按文件标识找到改名后的旧文件（含压缩后的 main.log.*.gz）"""
+        directory = os.path.dirname(self.log_file) or "."
+        prefix = os.path.basename(self.log_file) + "."
+        try:
+            names = sorted((n for n in os.listdir(directory) if n.startswith(prefix)), reverse=True)
+        except OSError:
+            return None
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if is_compressed(path):
+                    ident = open_blocks(path).source_ident
+                else:
+                    st_info = os.stat(path)
+                    ident = (st_info.st_dev, st_info.st_ino)
+            except (OSError, ValueError):
+                continue
+            if ident == self.ident:
+                return path
+        return None
+
+    def _read(self, path):
+        """从 offset 读到最后一个完整行，解析其中的信号"""
+        try:
+            f = open_log(path)
+        except (OSError, ValueError):
+            return 0
+        frames = []
+        with f:
+            f.seek(self.offset)
+            pending = b""
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                self.bytes_read += len(chunk)
+                incr("bytes_read.qmtlog", len(chunk))
+                data = pending + chunk
+                end = data.rfind(b"\n") + 1
+                # 不完整的最后一行（日志还在写）留到下次读取
+                pending = data[end:]
+                parsed = parse_signals(data[:end])
+                if not parsed.empty:
+                    frames.append(parsed)
+            self.offset = f.tell() - len(pending)
+        if not frames:
+            return 0
+        added = sum(len(parsed) for parsed in frames)
+        if not self._frame.empty:
+            frames.insert(0, self._frame)
+        frame = pd.concat(frames, ignore_index=True)
+        frame = frame.drop_duplicates(SIGNAL_KEY, keep="last")
+        self._frame = frame.tail(self.max_signals).reset_index(drop=True)
+        return added
+
+    def frame(self):
+        """当前信号表（按出现顺序，旧的在前）"""
+        with self._lock:
+            return self._frame.copy()
+
+    def latest_by_code(self):
+        """每个代码最近一条信号"""
+        with self._lock:
+            frame = self._frame
+        return frame.drop_duplicates("证券代码", keep="last").reset_index(drop=True)
+
+    def window_counts(self, seconds=300, now=None):
+        """最近 seconds 秒内每个代码的买入/卖出信号数和最后信号时间
+
+        Args:
+            now: 窗口终点，默认取信号表中最新的时间（和日志时间一致，不受页面刷新时间影响）
+        """
+        with self._lock:
+            frame = self._frame
+        if frame.empty:
+            return pd.DataFrame(columns=["证券代码", "买入", "卖出", "最后信号"])
+        end = np.datetime64(now, "s") if now is not None else frame["时间"].max()
+        recent = frame[frame["时间"] >= end - np.timedelta64(int(seconds), "s")]
+        counts = pd.crosstab(recent["证券代码"], recent["信号类型"])
+        counts = counts.reindex(columns=["买入", "卖出"], fill_value=0).rename_axis(columns=None)
+        counts["最后信号"] = recent.groupby("证券代码")["时间"].max()
+        return counts.reset_index().sort_values("最后信号", ascending=False, ignore_index=True)
+
+_tailers = {}
+_tailers_lock = threading.Lock()
+
+def get_signal_tailer(log_file, lines_limit=10000):
+    """获取日志文件对应的增量读取器（进程内共享，所有会话复用同一个偏移）"""
+    with _tailers_lock:
+        tailer = _tailers.get(log_file)
+        if tailer is None:
+            tailer = _tailers[log_file] = SignalTailer(log_file, lines_limit, max_signals=lines_limit)
+        return tailer
+
+@timed()
+def read_qmt_log_signals(log_file=os.path.join(QMT_LOG_DIR, "main.log"), lines_limit=10000):
+    """从日志文件中读取潜在交易机会（增量读取，只解析上次之后追加的内容）
 
-def read_qmt_log_signals(log_file=r"D:\Users\Jack\xtquant\logs\main.log", lines_limit=10000):
-    """从日志文件中读取潜在交易机会
-    
     Args:
         log_file: 日志文件路径
-        lines_limit: 读取最后多少行
-        
+        lines_limit: 首次读取最后多少行，也是信号表的容量
+
     Returns:
-        pd.DataFrame: 包含信号类型、证券代码和详情的DataFrame
+        pd.DataFrame: 信号表，列为 SIGNAL_COLUMNS，按出现顺序排列
     """
     if not os.path.exists(log_file):
-        return pd.DataFrame(columns=["信号类型", "证券代码", "详情"])
-    
-    # 从文件末尾读取最后N行
-    def tail(filename, n):
-        with open(filename, 'r', encoding='utf-8') as f:
-            return deque(f, n)
-    
+        return empty_signals()
+
+    tailer = get_signal_tailer(log_file, lines_limit)
     try:
-        lines = tail(log_file, lines_limit)
+        tailer.poll()
     except Exception as e:
         st.error(f"读取日志文件失败: {str(e)}")
-        return pd.DataFrame(columns=["信号类型", "证券代码", "详情"])
-    
-    # 解析交易信号
-    signals = []
-    for line in lines:
-        if "触发买入信号" in line or "触发卖出信号" in line:
-            # 确定信号类型
-            signal_type = "买入" if "触发买入信号" in line else "卖出"
-            
-            # 查找股票代码（格式：六位数字.两位字母）
-            stock_code_match = re.search(r'(\d{6}\.[A-Z]{2})', line)
-            if not stock_code_match:
-                continue
-                
-            stock_code = stock_code_match.group(1)
-            
-            # 提取信号后的详细信息
-            detail_start = line.find("信号") + 2
-            detail = line[detail_start:].strip()
-            
-            signals.append({
-                "信号类型": signal_type,
-                "证券代码": stock_code,
-                "详情": detail
-            })
-
-    return signals
\ No newline at end of file
+    return tailer.frame()
+
+def read_qmt_signal_summary(seconds=300, log_file=os.path.join(QMT_LOG_DIR, "main.log"), lines_limit=10000):
+    """最近 seconds 秒内每个代码的买入/卖出信号数（见 SignalTailer.window_counts）"""
+    if not os.path.exists(log_file):
+        return pd.DataFrame(columns=["证券代码", "买入", "卖出", "最后信号"])
+    tailer = get_signal_tailer(log_file, lines_limit)
+    try:
+        tailer.poll()
+    except Exception as e:
+        st.error(f"读取日志文件失败: {str(e)}")
+    return tailer.window_counts(seconds)
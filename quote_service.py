@@ -0,0 +1,269 @@
+# quote_service.py - 实时行情环形缓冲
+"""
+订阅持仓和自选列表的逐笔行情，每个代码一个预分配的 NumPy 环形缓冲。
+
+- latest(code) / last_price(code)：O(1) 读取最新行情
+- window(code, n)：最近 n 笔行情的零拷贝视图（缓冲区写两份，任意窗口都是连续切片）
+- ReplayQuoteSource：从文件回放行情，接口与 xtdata 的订阅/快照部分一致，可以脱离终端运行
+"""
+import csv
+import json
+import time
+import threading
+import numpy as np
+
+TICK_DTYPE = np.dtype([
+    ("ts", "float64"),
+    ("last", "float64"),
+    ("bid", "float64"),
+    ("ask", "float64"),
+    ("bid_vol", "int64"),
+    ("ask_vol", "int64"),
+    ("volume", "int64"),
+])
+
+
+class TickRing:
+    """单个代码的行情环形缓冲"""
+
+    __slots__ = ("capacity", "buf", "count")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # 每笔行情同时写在 i 和 i + capacity，最近 n 笔总是 buf 中连续的一段
+        self.buf = np.zeros(capacity * 2, dtype=TICK_DTYPE)
+        self.count = 0
+
+    def push(self, ts, last, bid, ask, bid_vol, ask_vol, volume):
+        j = self.count % self.capacity
+        row = (ts, last, bid, ask, bid_vol, ask_vol, volume)
+        self.buf[j] = row
+        self.buf[j + self.capacity] = row
+        self.count += 1
+
+    def latest(self):
+        if self.count == 0:
+            return None
+        return self.buf[(self.count - 1) % self.capacity + self.capacity]
+
+    def window(self, n):
+        """最近 n 笔（按时间升序）的只读视图"""
+        n = min(n, self.count, self.capacity)
+        end = (self.count - 1) % self.capacity + self.capacity + 1
+        view = self.buf[end - n:end]
+        view.flags.writeable = False
+        return view
+
+
+def _first(value, default=0.0):
+    """xtdata 的买卖盘字段是五档列表，取第一档"""
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else default
+    return default if value is None else value
+
+
+class QuoteService:
+    """行情服务"""
+
+    def __init__(self, source=None, capacity=4096, watchlist=()):
+        if source is None:
+            from broker import xtdata
+            source = xtdata
+        self.source = source
+        self.capacity = capacity
+        self.rings = {}
+        # 昨收价，取自行情推送的 lastClose
+        self.prev_close = {}
+        self.watchlist = set(watchlist)
+        self.holdings = set()
+        self._subscriptions = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    # ---------- 订阅管理 ----------
+    def set_watchlist(self, codes):
+        self.watchlist = set(codes)
+        self._sync()
+
+    def sync_holdings(self, codes):
+        """按当前持仓调整订阅（持仓变化时调用）"""
+        codes = set(codes)
+        if codes != self.holdings:
+            self.holdings = codes
+            self._sync()
+
+    def _sync(self):
+        wanted = self.watchlist | self.holdings
+        with self._lock:
+            added = list(wanted - set(self._subscriptions))
+            for code in added:
+                self.rings.setdefault(code, TickRing(self.capacity))
+                self._subscriptions[code] = self.source.subscribe_quote(code, period="tick", callback=self._on_quote)
+            for code in set(self._subscriptions) - wanted:
+                self.source.unsubscribe_quote(self._subscriptions.pop(code))
+        # 新订阅的代码先用快照填一笔，不必等下一笔推送
+        snapshot = {c: t for c, t in self.source.get_full_tick(added).items()
+                    if not self.rings[c].count} if added else {}
+        if snapshot:
+            self._on_quote(snapshot)
+
+    def subscribe(self, listener):
+        """订阅行情更新，listener(code, ring) 在行情回调线程上执行"""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _on_quote(self, data):
+        """xtdata 回调：{code: tick 或 [tick, ...]}"""
+        for code, ticks in data.items():
+            ring = self.rings.get(code)
+            if ring is None:
+                continue
+            if isinstance(ticks, dict):
+                ticks = [ticks]
+            if ticks and ticks[-1].get("lastClose"):
+                self.prev_close[code] = ticks[-1]["lastClose"]
+            for tick in ticks:
+                ring.push(
+                    tick.get("time", time.time() * 1000) / 1000.0,
+                    tick.get("lastPrice", 0.0),
+                    _first(tick.get("bidPrice")),
+                    _first(tick.get("askPrice")),
+                    _first(tick.get("bidVol"), 0),
+                    _first(tick.get("askVol"), 0),
+                    tick.get("volume", 0),
+                )
+            for listener in list(self._listeners):
+                try:
+                    listener(code, ring)
+                except Exception:
+                    pass
+
+    # ---------- 读取 ----------
+    def latest(self, code):
+        ring = self.rings.get(code)
+        return ring.latest() if ring is not None else None
+
+    def last_price(self, code):
+        """最新价；未订阅或尚无行情时返回 None"""
+        tick = self.latest(code)
+        return float(tick["last"]) if tick is not None else None
+
+    def last_prices(self, codes=None):
+        codes = self.rings.keys() if codes is None else codes
+        result = {}
+        for code in codes:
+            price = self.last_price(code)
+            if price is not None:
+                result[code] = price
+        return result
+
+    def quote_table(self):
+        """所有已订阅代码的最新行情，用于页面展示"""
+        rows = []
+        for code in sorted(self.rings):
+            tick = self.latest(code)
+            if tick is None:
+                continue
+            rows.append({
+                "证券代码": code,
+                "最新价": float(tick["last"]),
+                "买一": float(tick["bid"]),
+                "卖一": float(tick["ask"]),
+                "成交量": int(tick["volume"]),
+                "时间": time.strftime("%H:%M:%S", time.localtime(tick["ts"])),
+            })
+        return rows
+
+    def window(self, code, n):
+        ring = self.rings.get(code)
+        return ring.window(n) if ring is not None else np.zeros(0, dtype=TICK_DTYPE)
+
+    def get_full_tick(self, codes):
+        """与 xtdata.get_full_tick 相同的返回结构；本地没有行情的代码回退到数据源查询"""
+        result, missing = {}, []
+        for code in codes:
+            tick = self.latest(code)
+            if tick is None:
+                missing.append(code)
+                continue
+            result[code] = {
+                "time": tick["ts"] * 1000,
+                "lastPrice": float(tick["last"]),
+                "bidPrice": [float(tick["bid"])],
+                "askPrice": [float(tick["ask"])],
+                "bidVol": [int(tick["bid_vol"])],
+                "askVol": [int(tick["ask_vol"])],
+                "volume": int(tick["volume"]),
+            }
+        if missing:
+            result.update(self.source.get_full_tick(missing))
+        return result
+
+
+class ReplayQuoteSource:
+    """从文件回放行情的 xtdata 替身
+
+    文件为 CSV（表头含 code,time,lastPrice,bidPrice,askPrice,bidVol,askVol,volume）
+    或每行一个 JSON 对象的 JSONL，time 为毫秒时间戳。path 为空时只能通过 push_tick 推送行情。
+    """
+
+    def __init__(self, path=None, speed=0.0):
+        self.path = path
+        self.speed = speed
+        self._callbacks = {}
+        self._next_id = 1
+        self._latest = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _rows(self):
+        if not self.path:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            if self.path.endswith(".csv"):
+                for row in csv.DictReader(f):
+                    yield {k: (v if k == "code" else float(v)) for k, v in row.items()}
+            else:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def subscribe_quote(self, stock_code, period="tick", callback=None, **kwargs):
+        sub_id = self._next_id
+        self._next_id += 1
+        self._callbacks[sub_id] = (stock_code, callback)
+        return sub_id
+
+    def unsubscribe_quote(self, sub_id):
+        self._callbacks.pop(sub_id, None)
+
+    def get_full_tick(self, codes):
+        return {code: self._latest[code] for code in codes if code in self._latest}
+
+    def replay(self):
+        """同步回放全部行情；speed > 0 时按原始时间间隔 / speed 休眠"""
+        prev = None
+        for row in self._rows():
+            if self._stop.is_set():
+                break
+            code = row.pop("code")
+            if self.speed > 0 and prev is not None:
+                time.sleep(max(row["time"] - prev, 0) / 1000.0 / self.speed)
+            prev = row["time"]
+            self.push_tick(code, row)
+
+    def push_tick(self, code, tick):
+        """推送一笔行情给订阅者（回放和测试代码调用）"""
+        self._latest[code] = tick
+        for sub_code, callback in list(self._callbacks.values()):
+            if sub_code == code and callback:
+                callback({code: tick})
+
+    def start(self):
+        """在后台线程中回放"""
+        self._thread = threading.Thread(target=self.replay, name="quote-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
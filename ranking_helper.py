@@ -0,0 +1,70 @@
+# ranking_helper.py - 排行榜数据构建
+"""
+pages/6_bj_top.py 的排行榜数据构建，不依赖 Streamlit 和 DataManager，便于复用和压测。
+"""
+import pandas as pd
+
+
+def build_ranking(stock_data_dict, last_day_data_dict, required_columns):
+    """把按代码分开的日线数据合并为排行榜 DataFrame 并计算涨跌幅
+
+    Args:
+        stock_data_dict: {代码: 当日日线 DataFrame}
+        last_day_data_dict: {代码: 前一交易日日线 DataFrame（至少含 close）}
+        required_columns: 必须包含的列
+
+    Returns:
+        pd.DataFrame: 每只股票一行，含 pre_close 和 change_pct
+    """
+    # 将字典格式转换为单个DataFrame：先收集每只股票的一行，最后一次性构建（避免循环内反复 concat）
+    rows = []
+    for code, df in stock_data_dict.items():
+        if not df.empty:
+            # 确保日期索引是字符串格式
+            date_idx = df.index[0]
+            if isinstance(date_idx, str) or isinstance(date_idx, int):
+                # 创建单行数据（字典，比逐个给 Series 添加字段快）
+                row_data = df.loc[date_idx].to_dict() if date_idx in df.index else {}
+                if row_data:
+                    # 添加股票代码
+                    row_data['code'] = code
+                    # 如果没有name列，添加一个空的name列
+                    if 'name' not in row_data:
+                        row_data['name'] = code.split('.')[0]
+                    
+                    # 获取前一个交易日的收盘价
+                    if code in last_day_data_dict and not last_day_data_dict[code].empty:
+                        last_idx = last_day_data_dict[code].index[0]
+                        if last_idx in last_day_data_dict[code].index:
+                            row_data['pre_close'] = last_day_data_dict[code].loc[last_idx, 'close']
+                            #print(f"close: {row_data['close']}, pre_close: {row_data['pre_close']}")
+                    
+                    rows.append(row_data)
+    result_df = pd.DataFrame(rows) if rows else pd.DataFrame()
+    
+    # 重置索引
+    if not result_df.empty:
+        result_df = result_df.reset_index(drop=True)
+        
+        # 确保数据包含必要的列
+        for col in required_columns:
+            if col not in result_df.columns:
+                if col == 'pre_close':
+                    # 如果没有pre_close列，使用前一天的收盘价
+                    result_df['pre_close'] = result_df['close']
+                else:
+                    raise ValueError(f"数据中缺少必要的列: {col}")
+        
+        # 计算涨跌幅
+        result_df['change_pct'] = (result_df['close'] - result_df['pre_close']) / result_df['pre_close'] * 100
+        
+        # 将NaN值替换为0
+        result_df = result_df.fillna(0)
+        
+        # 确保所有数值列都是数值类型
+        numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount', 'pre_close', 'change_pct']
+        for col in numeric_cols:
+            if col in result_df.columns:
+                result_df[col] = pd.to_numeric(result_df[col], errors='coerce').fillna(0)
+
+    return result_df
@@ -0,0 +1,204 @@
+# snapshot_poller.py - 账户快照后台轮询
+"""
+每个 (path, account) 一个后台线程，独占 MiniTrader 连接，按固定节奏刷新账户、委托、成交和持仓，
+发布不可变的带版本号快照。所有页面会话只读取最新快照，不再各自查询券商终端。
+"""
+import time
+import threading
+from typing import NamedTuple
+import pandas as pd
+from mini_trader import MiniTrader
+from quote_service import QuoteService
+from logger import logger
+from metrics import gauge, timed
+
+ORDER_COLUMNS = ["证券代码", "委托数量", "委托价格", "订单编号", "委托策略", "委托状态", "状态描述", "报单时间"]
+TRADE_COLUMNS = ["StockCode", "Volume", "Price", "Value", "TradeType",
+                 "OrderId", "TradeId", "TradeTime", "Strategy", "Remark"]
+TRADE_RENAME = {
+    "StockCode": "证券代码",
+    "Volume": "成交数量",
+    "Price": "成交价格",
+    "Value": "成交金额",
+    "TradeType": "交易类型",
+    "OrderId": "订单编号",
+    "TradeId": "成交编号",
+    "TradeTime": "成交时间",
+    "Strategy": "策略名称",
+    "Remark": "交易备注",
+}
+
+
+class Snapshot(NamedTuple):
+    """一次刷新的结果（DataFrame 由所有会话共享，只读使用）"""
+    version: int
+    created_at: float
+    account_info: pd.DataFrame
+    orders: pd.DataFrame
+    trades: pd.DataFrame
+    positions: pd.DataFrame
+    latency: float
+
+
+def format_account_info(account_data):
+    """账户资产字典 -> 页面展示用 DataFrame"""
+    if account_data:
+        return pd.DataFrame({
+            "可用资金": [account_data["FreeCash"]],
+            "持仓市值": [account_data["MarketValue"]],
+            "总资产": [account_data["TotalAsset"]],
+            "冻结资金": [account_data["FrozenCash"]]
+        }).T.rename(columns={0: "金额(¥)"})
+    # 获取失败时返回空数据
+    return pd.DataFrame({"金额(¥)": []})
+
+
+def format_orders(orders_df):
+    """委托 DataFrame，空结果时补齐列名"""
+    if orders_df.empty and len(orders_df.columns) == 0:
+        return pd.DataFrame(columns=ORDER_COLUMNS)
+    return orders_df
+
+
+def format_trades(trades_df):
+    """成交 DataFrame：转换交易类型并改为中文列名"""
+    if trades_df.empty and len(trades_df.columns) == 0:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+    if not trades_df.empty:
+        trades_df = trades_df.copy()
+        trades_df['TradeType'] = trades_df['TradeType'].map({24: 'sell', 23: 'buy'})
+        trades_df = trades_df.rename(columns=TRADE_RENAME)
+    return trades_df
+
+
+_EMPTY = Snapshot(0, 0.0, format_account_info(None), format_orders(pd.DataFrame()),
+                  format_trades(pd.DataFrame()), pd.DataFrame(), 0.0)
+
+
+class SnapshotPoller:
+    """后台轮询线程"""
+
+    def __init__(self, path, account_id, interval=15.0, trader_factory=MiniTrader,
+                 quote_source=None, watchlist=()):
+        self.path = path
+        self.account_id = account_id
+        self.interval = interval
+        self.trader_factory = trader_factory
+        self.trader = None
+        self.quote_source = quote_source
+        self.watchlist = watchlist
+        self.quotes = None
+        self._snapshot = _EMPTY
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self.errors = 0
+        self.last_error = ""
+
+    @property
+    def snapshot(self):
+        """最新快照（引用替换是原子的，读取无需加锁）"""
+        return self._snapshot
+
+    def connect(self):
+        """创建并连接 MiniTrader，连接或订阅失败时保留原连接并返回 None"""
+        if self.quotes is None:
+            self.quotes = QuoteService(self.quote_source)
+            self.quotes.set_watchlist(self.watchlist)
+            self.quotes.subscribe(self._on_tick)
+        trader = self.trader_factory(self.path, self.account_id)
+        if not trader.connect():
+            trader.close()
+            self.errors += 1
+            self.last_error = "交易终端连接失败"
+            return None
+        trader.quotes = self.quotes
+        trader.seed_valuation()
+        old, self.trader = self.trader, trader
+        if old is not None:
+            old.close()
+        return trader
+
+    def _on_tick(self, code, ring):
+        """行情推送转发给当前连接的持仓估值"""
+        trader = self.trader
+        if trader is not None:
+            trader.valuation.on_tick(code, float(ring.latest()["last"]), self.quotes.prev_close.get(code))
+
+    def reconnect(self):
+        """重建连接并立即刷新一次，返回是否连接成功"""
+        with self._refresh_lock:
+            trader = self.connect()
+        self.refresh_now()
+        return trader is not None
+
+    def start(self):
+        """连接终端、同步刷新首个快照并启动后台线程"""
+        if self._thread and self._thread.is_alive():
+            return self
+        if self.trader is None:
+            self.connect()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name=f"poller-{self.account_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def refresh_now(self):
+        """唤醒后台线程立即刷新（不等待结果）"""
+        self._wakeup.set()
+
+    @timed()
+    def refresh(self):
+        """查询终端并发布新快照"""
+        with self._refresh_lock:
+            if self.trader is None:
+                return self._snapshot
+            started = time.time()
+            try:
+                account_info = format_account_info(self.trader.get_account_info())
+                orders = format_orders(self.trader.get_orders())
+                trades = format_trades(self.trader.get_trades())
+                positions = self.trader.get_positions()
+                self.quotes.sync_holdings(positions["StockCode"] if not positions.empty else [])
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.error(f"账户快照刷新失败: {e}")
+                return self._snapshot
+            latency = time.time() - started
+            self._snapshot = Snapshot(self._snapshot.version + 1, time.time(),
+                                      account_info, orders, trades, positions, latency)
+            for consumer in self.trader.bus.stats():
+                gauge(f"event_bus.{consumer['name']}.backlog", consumer["backlog"])
+                gauge(f"event_bus.{consumer['name']}.dropped", consumer["dropped"])
+            return self._snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            if self.trader is None:
+                # 启动时没连上终端，每个周期重试
+                with self._refresh_lock:
+                    self.connect()
+            self.refresh()
+
+    def stats(self):
+        """刷新耗时与数据延迟，用于调整轮询节奏"""
+        snap = self._snapshot
+        return {
+            "version": snap.version,
+            "latency": snap.latency,
+            "staleness": time.time() - snap.created_at if snap.created_at else None,
+            "interval": self.interval,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "events": self.trader.bus.stats() if self.trader else [],
+        }
@@ -0,0 +1,476 @@
+# snapshot_store.py - 账户快照列式存储
+"""
+按月分区的 Parquet 快照库，替代逐日缩进 JSON 的读取方式。
+
+目录结构::
+
+    <data_dir>/store/manifest.json
+    <data_dir>/store/<table>/<YYYYMM>.parquet
+
+每张表有固定的列类型（SCHEMAS），manifest 记录每个分区包含的日期和行数，
+读取时先按 manifest 剪枝分区，再只读取需要的列。
+manifest 还按日期记录写入版本号（每次写入递增，没有记录的日期也登记）和来源 JSON 文件的
+(mtime_ns, size)：读取方按版本号判断哪些日期需要重新计算，迁移按来源签名只导入缺失或改写过的日期。
+AccountUpdater 进程和看板（迁移 JSON）都会写入，写入在 store/.lock 文件锁内完成。
+依赖 pandas 的 parquet 引擎（pyarrow）。
+"""
+import os
+import json
+import glob
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+STORE_DIRNAME = "store"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+MANIFEST_VERSION = 1
+
+# 表结构：列名 -> pandas dtype，所有表都带 date 列（YYYYMMDD 字符串）
+SCHEMAS = {
+    "account": {
+        "date": "string",
+        "timestamp": "string",
+        "总资产": "float64",
+        "持仓市值": "float64",
+        "可用资金": "float64",
+        "冻结资金": "float64",
+    },
+    "positions": {
+        "date": "string",
+        "证券代码": "string",
+        "持仓数量": "int64",
+        "可用数量": "int64",
+        "冻结数量": "int64",
+        "开仓价格": "float64",
+        "持仓市值": "float64",
+        "在途股份": "int64",
+        "昨夜持股": "int64",
+    },
+    "orders": {
+        "date": "string",
+        "证券代码": "string",
+        "委托数量": "int64",
+        "委托价格": "float64",
+        "订单编号": "int64",
+        "委托状态": "string",
+        "报单时间": "string",
+    },
+    "trades": {
+        "date": "string",
+        "StockCode": "string",
+        "Volume": "int64",
+        "Price": "float64",
+        "Value": "float64",
+        "TradeType": "int64",
+        "Strategy": "string",
+        "Remark": "string",
+        "OrderId": "int64",
+        "TradeId": "string",
+        "TradeTime": "string",
+    },
+}
+
+# 历史成交文件中出现过的中文字段名
+TRADE_FIELD_MAPPING = {
+    "证券代码": "StockCode",
+    "成交数量": "Volume",
+    "成交均价": "Price",
+    "成交金额": "Value",
+    "订单编号": "OrderId",
+    "成交编号": "TradeId",
+    "成交时间": "TradeTime",
+}
+
+
+def _conform(df, table):
+    """按表结构补齐缺失列、丢弃多余列并转换类型"""
+    schema = SCHEMAS[table]
+    df = df.reindex(columns=list(schema.keys()))
+    for col, dtype in schema.items():
+        if dtype == "string":
+            df[col] = df[col].astype("string")
+        elif dtype == "int64":
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    return df
+
+
+def file_signature(path):
+    """来源文件签名 [mtime_ns, size]，文件不存在时返回 None"""
+    try:
+        st_info = os.stat(path)
+    except OSError:
+        return None
+    return [st_info.st_mtime_ns, st_info.st_size]
+
+
+@contextmanager
+def _file_lock(path):
+    """跨进程的排他文件锁"""
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 重试约 10 秒仍拿不到锁时抛出 OSError，继续等待
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SnapshotStore:
+    """按月分区的列式快照存储"""
+
+    def __init__(self, data_dir):
+        self.root = os.path.join(data_dir, STORE_DIRNAME)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._stamp = None
+        self.manifest = self._load_manifest()
+
+    # ---------- manifest ----------
+    def _manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def _load_manifest(self):
+        path = self._manifest_path()
+        self._stamp = file_signature(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        return {"version": MANIFEST_VERSION, "seq": 0, "tables": {}}
+
+    def _save_manifest(self):
+        path = self._manifest_path()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._stamp = file_signature(path)
+
+    def reload(self):
+        """重新读取 manifest（其他进程写入后调用）"""
+        self.manifest = self._load_manifest()
+
+    def refresh(self):
+        """manifest 被其他进程改写过时重新读取
+
+        Returns:
+            bool: 是否重新读取
+        """
+        if file_signature(self._manifest_path()) == self._stamp:
+            return False
+        with self._lock:
+            self.reload()
+        return True
+
+    def _partition_path(self, table, month):
+        return os.path.join(self.root, table, f"{month}.parquet")
+
+    # ---------- 写入 ----------
+    def write_day(self, table, date_str, records, source=None):
+        """写入某张表某一天的全部记录（同一天重复写入会覆盖）
+
+        Args:
+            table: 表名，见 SCHEMAS
+            date_str: 日期，YYYYMMDD
+            records: list[dict] 或 DataFrame
+            source: 来源 JSON 文件的签名（file_signature），用于迁移时判断是否需要重新导入
+
+        Returns:
+            int: 写入的行数
+        """
+        return self.write_days(table, {date_str: records}, {date_str: source} if source else None)
+
+    def write_days(self, table, days, sources=None):
+        """写入某张表多天的记录，每个月分区只重写一次（同一天重复写入会覆盖）
+
+        Args:
+            table: 表名，见 SCHEMAS
+            days: {YYYYMMDD: list[dict] 或 DataFrame}
+            sources: 可选，{YYYYMMDD: 来源文件签名}
+
+        Returns:
+            int: 写入的行数
+        """
+        sources = sources or {}
+        rows = {}
+        raw = []
+        for date_str, records in days.items():
+            df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(list(records))
+            rows[date_str] = len(df)
+            if len(df):
+                raw.append(df.assign(date=date_str))
+        # 整批只做一次类型转换
+        new = _conform(pd.concat(raw, ignore_index=True) if raw else pd.DataFrame(), table)
+        new_month = new["date"].str[:6]
+
+        by_month = {}
+        for date_str in sorted(rows):
+            by_month.setdefault(date_str[:6], []).append(date_str)
+
+        with self._lock, _file_lock(os.path.join(self.root, LOCK_NAME)):
+            # 其他进程（AccountUpdater / 看板）可能刚写过 manifest，持锁后读最新的再合并
+            # （mtime 精度有限，两次写入间隔很短时签名可能相同，所以总是重新读取）
+            self.reload()
+            # 在副本上修改再整体替换，读取方不会看到改了一半的 manifest
+            meta = self.manifest["tables"].get(table, {})
+            partitions = dict(meta.get("partitions", {}))
+            day_meta = dict(meta.get("days", {}))
+            seq = self.manifest.get("seq", 0)
+
+            for month, month_dates in by_month.items():
+                path = self._partition_path(table, month)
+                parts = []
+                if os.path.exists(path):
+                    existing = pd.read_parquet(path)
+                    parts.append(existing[~existing["date"].isin(month_dates)])
+                if any(rows[d] for d in month_dates):
+                    parts.append(new[(new_month == month).to_numpy()])
+                df = pd.concat(parts, ignore_index=True) if parts else _conform(pd.DataFrame(), table)
+                df = df.sort_values("date", kind="stable").reset_index(drop=True)
+
+                if df.empty:
+                    # 这些天没有记录且该月没有其他数据
+                    if os.path.exists(path):
+                        os.remove(path)
+                    partitions.pop(month, None)
+                    continue
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + ".tmp"
+                df.to_parquet(tmp, index=False)
+                os.replace(tmp, path)
+
+                dates = sorted(df["date"].unique().tolist())
+                partitions[month] = {
+                    "file": os.path.relpath(path, self.root),
+                    "rows": int(len(df)),
+                    "min_date": dates[0],
+                    "max_date": dates[-1],
+                    "dates": dates,
+                }
+
+            for date_str in sorted(rows):
+                seq += 1
+                day_meta[date_str] = {
+                    "version": seq,
+                    "rows": rows[date_str],
+                    "source": sources.get(date_str),
+                }
+
+            tables = dict(self.manifest["tables"])
+            tables[table] = {"schema": SCHEMAS[table], "partitions": partitions, "days": day_meta}
+            self.manifest = dict(self.manifest, seq=seq, tables=tables)
+            self._save_manifest()
+        return len(new)
+
+    # ---------- 读取 ----------
+    def dates(self, table):
+        """返回某张表已有的全部日期（升序）"""
+        partitions = self.manifest["tables"].get(table, {}).get("partitions", {})
+        result = []
+        for month in sorted(partitions):
+            result.extend(partitions[month]["dates"])
+        return result
+
+    def versions(self, table):
+        """返回 {日期: 版本号}，包含写入过但没有记录的日期；某天被重写后版本号变大"""
+        days = self.manifest["tables"].get(table, {}).get("days", {})
+        return {date_str: meta["version"] for date_str, meta in days.items()}
+
+    def version(self, table):
+        """某张表最近一次写入的版本号（没有写入过时为 0）：任何一天被写入后都会变大"""
+        days = self.manifest["tables"].get(table, {}).get("days", {})
+        return max((meta["version"] for meta in days.values()), default=0)
+
+    def sources(self, table):
+        """返回 {日期: 来源文件签名}"""
+        days = self.manifest["tables"].get(table, {}).get("days", {})
+        return {date_str: meta.get("source") for date_str, meta in days.items()}
+
+    def read(self, table, columns=None, start=None, end=None, dates=None):
+        """读取某张表
+
+        Args:
+            table: 表名
+            columns: 需要的列，None 表示全部列（date 列总会返回）
+            start: 开始日期 YYYYMMDD（含），None 表示不限
+            end: 结束日期 YYYYMMDD（含），None 表示不限
+            dates: 可选，只读取这些日期（只打开包含这些日期的分区）
+
+        Returns:
+            pd.DataFrame: 按日期排序的数据
+        """
+        schema = SCHEMAS[table]
+        if dates is not None:
+            dates = set(dates)
+        if columns is not None:
+            columns = ["date"] + [c for c in columns if c != "date"]
+        else:
+            columns = list(schema.keys())
+
+        partitions = self.manifest["tables"].get(table, {}).get("partitions", {})
+        frames = []
+        for month in sorted(partitions):
+            meta = partitions[month]
+            if start and meta["max_date"] < start:
+                continue
+            if end and meta["min_date"] > end:
+                continue
+            if dates is not None and dates.isdisjoint(meta["dates"]):
+                continue
+            frames.append(pd.read_parquet(os.path.join(self.root, meta["file"]), columns=columns))
+
+        if not frames:
+            return _conform(pd.DataFrame(), table)[columns]
+
+        df = pd.concat(frames, ignore_index=True)
+        if start:
+            df = df[df["date"] >= start]
+        if end:
+            df = df[df["date"] <= end]
+        if dates is not None:
+            df = df[df["date"].isin(dates)]
+        return df.reset_index(drop=True)
+
+
+def normalize_trades(trades):
+    """把历史成交记录中的中文字段名统一为英文字段名"""
+    df = pd.DataFrame(list(trades))
+    if df.empty:
+        return df
+    return df.rename(columns=TRADE_FIELD_MAPPING)
+
+
+def _pending_files(directory, store, tables):
+    """目录下来源签名与快照库记录不一致（缺失或被改写）的 JSON 文件：[(日期, 路径, 签名)]"""
+    if not os.path.isdir(directory):
+        return []
+    recorded = [store.sources(table) for table in tables]
+    pending = []
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        date_str = entry.name[:8]
+        if not (entry.name.endswith(".json") and date_str.isdigit()):
+            continue
+        st_info = entry.stat()
+        signature = [st_info.st_mtime_ns, st_info.st_size]
+        if any(sources.get(date_str) != signature for sources in recorded):
+            pending.append((date_str, entry.path, signature))
+    return pending
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def migrate_json_history(data_dir, store=None):
+    """把 account_positions / trades_orders 下的 JSON 历史导入快照库
+
+    只导入快照库中缺失、或来源文件在上次导入后被改写过的日期，可以反复调用。
+
+    Args:
+        data_dir: 账户数据目录（包含 account_positions 和 trades_orders）
+        store: 目标 SnapshotStore，None 时在 data_dir 下创建
+
+    Returns:
+        dict: 每张表导入的天数
+    """
+    store = store or SnapshotStore(data_dir)
+    counts = {"account": 0, "positions": 0, "orders": 0, "trades": 0}
+
+    account, positions, sources = {}, {}, {}
+    for date_str, path, signature in _pending_files(os.path.join(data_dir, "account_positions"),
+                                                    store, ("account", "positions")):
+        data = _read_json(path)
+        if data is None:
+            continue
+        info = data.get("account_info") or {}
+        account[date_str] = [dict(info, timestamp=data.get("timestamp"))]
+        positions[date_str] = data.get("positions", [])
+        sources[date_str] = signature
+    if account:
+        store.write_days("account", account, sources)
+        store.write_days("positions", positions, sources)
+        counts["account"] = counts["positions"] = len(account)
+
+    orders, trades, sources = {}, {}, {}
+    for date_str, path, signature in _pending_files(os.path.join(data_dir, "trades_orders"),
+                                                    store, ("orders", "trades")):
+        data = _read_json(path)
+        if data is None:
+            continue
+        orders[date_str] = data.get("orders", [])
+        trades[date_str] = normalize_trades(data.get("trades", []))
+        sources[date_str] = signature
+    if orders:
+        store.write_days("orders", orders, sources)
+        store.write_days("trades", trades, sources)
+        counts["orders"] = counts["trades"] = len(orders)
+
+    return counts
+
+
+# 进程内共享的快照库：data_dir -> SnapshotStore
+_stores = {}
+_stores_lock = threading.Lock()
+# 同一进程内的迁移串行执行，避免多个会话重复导入同一批日期
+_migrate_lock = threading.Lock()
+
+
+def open_store(data_dir):
+    """返回 data_dir 对应的共享 SnapshotStore（同一进程内只创建一次）"""
+    with _stores_lock:
+        store = _stores.get(data_dir)
+        if store is None:
+            store = _stores[data_dir] = SnapshotStore(data_dir)
+        return store
+
+
+def sync_store(data_dir):
+    """读取其他进程写入的最新 manifest，并导入快照库中缺失或已改写的 JSON 日期
+
+    看板读取资产曲线、历史成交和绩效前调用；没有变化时只 stat 一遍 JSON 文件。
+
+    Returns:
+        SnapshotStore: 共享的快照库
+    """
+    store = open_store(data_dir)
+    store.refresh()
+    with _migrate_lock:
+        migrate_json_history(data_dir, store)
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+    from config import ACCOUNT_DATA_DIR
+
+    target = sys.argv[1] if len(sys.argv) > 1 else ACCOUNT_DATA_DIR
+    result = migrate_json_history(target)
+    print(f"导入完成: {result}")
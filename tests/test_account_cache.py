@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+from account_cache import AccountCache, STOCK_BUY, STOCK_SELL
+
+
+def _cache(cash=10000.0, volume=1000):
+    cache = AccountCache()
+    cache.load_asset(SimpleNamespace(total_asset=cash, market_value=0.0, cash=cash, frozen_cash=0.0))
+    cache.load_positions([SimpleNamespace(stock_code="600000.SH", volume=volume, can_use_volume=volume)])
+    return cache
+
+
+def test_ack_before_reservation_is_applied():
+    cache = _cache()
+    # 回报先于 order_stock_async 返回到达
+    cache.on_async_response(1, 101)
+    cache.on_order(SimpleNamespace(order_id=101, order_status=57))
+    cache.reserve_cash(1, "600000.SH", 5000.0)
+    assert cache.available_cash() == 10000.0
+
+    cache.on_async_response(2, 102)
+    cache.reserve_volume(2, "600000.SH", 300)
+    assert cache.can_use_volume("600000.SH") == 700
+    cache.on_order(SimpleNamespace(order_id=102, order_status=54))
+    assert cache.can_use_volume("600000.SH") == 1000
+
+
+def test_confirmed_reservation_settles_on_refresh():
+    cache = _cache()
+    cache.on_async_response(3, 103)
+    cache.on_order(SimpleNamespace(order_id=103, order_status=50))
+    cache.reserve_cash(3, "600000.SH", 4000.0)
+    assert cache.available_cash() == 6000.0
+    # 终端已冻结这笔资金
+    cache.load_asset(SimpleNamespace(total_asset=10000.0, market_value=0.0, cash=6000.0, frozen_cash=4000.0))
+    assert cache.available_cash() == 6000.0
+
+
+def test_order_error_before_reservation_releases():
+    cache = _cache()
+    cache.on_order_error(SimpleNamespace(seq=4, order_id=None, error_msg="资金不足"))
+    cache.reserve_cash(4, "600000.SH", 5000.0)
+    assert cache.available_cash() == 10000.0
+
+
+def test_trades_update_base_once():
+    cache = _cache()
+    sell = SimpleNamespace(traded_id="t1", stock_code="600000.SH", order_type=STOCK_SELL,
+                           traded_volume=200, traded_amount=2000.0)
+    cache.on_trade(sell)
+    cache.on_trade(sell)
+    assert cache.available_cash() == 12000.0
+    assert cache.positions["600000.SH"]["volume"] == 800
+    cache.on_trade(SimpleNamespace(traded_id="t2", stock_code="000001.SZ", order_type=STOCK_BUY,
+                                   traded_volume=100, traded_amount=1000.0))
+    assert cache.positions["000001.SZ"]["volume"] == 100
+    assert cache.can_use_volume("000001.SZ") == 0
+    assert cache.available_cash() == 12000.0
+
+
+def test_refresh_then_late_push_counts_once():
+    cache = _cache()
+    sell = SimpleNamespace(traded_id="t3", stock_code="600000.SH", order_type=STOCK_SELL,
+                           traded_volume=200, traded_amount=2000.0)
+    # 刷新时终端已经结算了这笔成交，推送随后才到
+    cache.load_asset(SimpleNamespace(total_asset=12000.0, market_value=0.0, cash=12000.0, frozen_cash=0.0), ["t3"])
+    cache.load_positions([SimpleNamespace(stock_code="600000.SH", volume=800, can_use_volume=800)], ["t3"])
+    cache.on_trade(sell)
+    assert cache.available_cash() == 12000.0
+    assert cache.positions["600000.SH"]["volume"] == 800
+
+
+def test_part_cancel_keeps_filled_part():
+    cache = _cache()
+    cache.on_async_response(5, 105)
+    cache.reserve_cash(5, "600000.SH", 5000.0)
+    cache.on_order(SimpleNamespace(order_id=105, order_status=53, traded_volume=200, traded_price=10.0))
+    assert cache.available_cash() == 8000.0
+
+    cache.on_async_response(6, 106)
+    cache.reserve_volume(6, "600000.SH", 500)
+    cache.on_order(SimpleNamespace(order_id=106, order_status=53, traded_volume=300, traded_price=10.0))
+    assert cache.can_use_volume("600000.SH") == 700
+    # 下一次刷新已经反映了成交，预扣丢弃
+    cache.load_asset(SimpleNamespace(total_asset=10000.0, market_value=0.0, cash=8000.0, frozen_cash=0.0))
+    cache.load_positions([SimpleNamespace(stock_code="600000.SH", volume=700, can_use_volume=700)])
+    assert cache.available_cash() == 8000.0
+    assert cache.can_use_volume("600000.SH") == 700
@@ -0,0 +1,65 @@
+import pandas as pd
+import analytics
+from analytics import compute_performance, daily_trade_stats
+from lot_engine import update_lot_engine
+from snapshot_store import SnapshotStore
+
+
+def _trade(code, side, volume, price, strategy):
+    return {"StockCode": code, "TradeType": {"buy": 23, "sell": 24}[side], "Volume": volume,
+            "Price": price, "Value": volume * price, "Strategy": strategy, "TradeTime": "10:00:00"}
+
+
+def _curve(values):
+    index = pd.DatetimeIndex(pd.to_datetime(list(values), format="%Y%m%d"), name="date")
+    curve = pd.DataFrame({"总资产": list(values.values())}, index=index)
+    curve["日收益率"] = curve["总资产"].pct_change()
+    return curve
+
+
+def test_attribution_follows_store_versions(tmp_path):
+    data_dir = str(tmp_path)
+    store = SnapshotStore(data_dir)
+    store.write_day("trades", "20250102", [_trade("600000.SH", "buy", 100, 10.0, "网格"),
+                                           _trade("000001.SZ", "buy", 100, 5.0, "动量")])
+    store.write_day("trades", "20250103", [_trade("600000.SH", "sell", 100, 12.0, "网格")])
+    store.write_day("trades", "20250106", [])
+    curve = _curve({"20250102": 1000.0, "20250103": 1100.0, "20250106": 1050.0})
+    lots = update_lot_engine(data_dir, store)
+
+    perf = compute_performance(curve, store, lots)
+    attribution = perf["attribution"]
+    assert attribution.loc["网格", "成交笔数"] == 2
+    assert attribution.loc["网格", "净现金流"] == 200.0
+    assert attribution.loc["网格", "已实现盈亏"] == 200.0
+    assert attribution.loc["动量", "平仓笔数"] == 0
+    assert round(perf["summary"]["平均日换手率"], 6) == round((1500 / 1000 + 1200 / 1100) / 2, 6)
+    assert compute_performance(curve, store, lots) is perf
+
+    # 改写一天：成交笔数和成交额都不变，只有策略变了
+    store.write_day("trades", "20250103", [_trade("600000.SH", "sell", 100, 12.0, "动量")])
+    lots = update_lot_engine(data_dir, store)
+    perf = compute_performance(curve, store, lots)
+    attribution = perf["attribution"]
+    assert attribution.loc["动量", "已实现盈亏"] == 200.0
+    assert attribution.loc["网格", "已实现盈亏"] == 0.0
+
+    # 增量维护的汇总与全量汇总一致
+    incremental = daily_trade_stats(store)
+    analytics._daily.clear()
+    full = daily_trade_stats(store)
+    pd.testing.assert_frame_equal(incremental, full)
+
+
+def test_attribution_win_rate():
+    from types import SimpleNamespace
+    daily = pd.DataFrame({"策略": ["网格", "动量"], "成交笔数": [3, 1], "买入金额": [1000.0, 500.0],
+                          "卖出金额": [1100.0, 0.0], "成交额": [2100.0, 500.0]})
+    realized = pd.DataFrame({"Strategy": ["网格", "网格", "网格", "均值"],
+                             "已实现盈亏": [100.0, -50.0, 0.0, 20.0]})
+    result = analytics.strategy_attribution(daily, SimpleNamespace(realized_lots=lambda: realized))
+    # 盈亏为 0 不算盈利
+    assert result.loc["网格", "胜率"] == 1 / 3
+    assert result.loc["均值", "胜率"] == 1.0
+    assert result.loc["均值", "成交笔数"] == 0
+    assert pd.isna(result.loc["动量", "胜率"])
@@ -0,0 +1,100 @@
+import numpy as np
+from basket import (BasketOrder, MAX_EARLY, build_legs, submit_basket, round_lots,
+                    size_buy_legs, size_sell_legs, size_rebalance)
+
+
+def test_round_lots():
+    assert round_lots([99, 100, 250, 1999]).tolist() == [0, 100, 200, 1900]
+
+
+def test_size_buy_legs_scales_to_cash():
+    volumes = size_buy_legs([10000, 10000], [10.0, 20.0], cash=1e6)
+    assert volumes.tolist() == [1000, 500]
+    # 资金只够一半，按比例缩减后仍为整手
+    volumes = size_buy_legs([10000, 10000], [10.0, 20.0], cash=10000)
+    assert volumes.tolist() == [500, 200]
+    assert (volumes * [10.0, 20.0]).sum() <= 10000
+    assert size_buy_legs([10000], [0.0], cash=1e6).tolist() == [0]
+    assert size_buy_legs([10000], [10.0], cash=0).tolist() == [0]
+
+
+def test_size_sell_legs_caps_and_allows_odd_lot_on_clear():
+    volumes = size_sell_legs([250, 1000, 500], [1000, 350, 0])
+    assert volumes.tolist() == [200, 350, 0]
+
+
+def test_size_rebalance():
+    sell, buy = size_rebalance(weights=[0.5, 0.0, 0.5], prices=[10.0, 20.0, 50.0],
+                               volumes=[1000, 300, 0], can_use=[1000, 300, 0],
+                               total_asset=100000, cash=20000)
+    assert sell.tolist() == [0, 300, 0]
+    # 买入目标 4000 股 + 1000 股共 90000 元，只用现有可用资金 20000 元，按比例缩减后取整手
+    assert buy.tolist() == [800, 0, 200]
+    assert np.dot(buy, [10.0, 20.0, 50.0]) <= 20000
+
+
+class _FakeTrader:
+    def __init__(self, seqs):
+        self.seqs = list(seqs)
+        self.baskets = []
+        self._ack_listeners = []
+
+    def submit_order(self, stock_code, side, volume, price_type, price, remark=""):
+        seq = self.seqs.pop(0)
+        if isinstance(seq, Exception):
+            raise seq
+        return seq
+
+    def add_ack_listener(self, listener):
+        self._ack_listeners.append(listener)
+
+    def remove_ack_listener(self, listener):
+        self._ack_listeners.remove(listener)
+
+    def _remove_basket(self, basket):
+        if basket in self.baskets:
+            self.baskets.remove(basket)
+
+
+def _basket(n):
+    legs = build_legs([f"60000{i}.SH" for i in range(n)], ["buy"] * n, [100] * n, [10.0] * n)
+    return BasketOrder(legs, "test")
+
+
+def test_failed_basket_is_removed():
+    trader = _FakeTrader([None, -1])
+    basket = _basket(2)
+    trader.baskets.append(basket)
+    submit_basket(trader, basket, price_type=11).join(5)
+    assert basket.done()
+    assert basket.summary()["errors"] == 2
+    assert trader.baskets == []
+
+
+def test_submit_exception_fails_remaining_legs():
+    trader = _FakeTrader([None, RuntimeError("断线")])
+    basket = _basket(3)
+    trader.baskets.append(basket)
+    submit_basket(trader, basket, price_type=11).join(5)
+    assert basket.done()
+    assert basket.legs["Error"].tolist()[1:] == ["提交异常: 断线"] * 2
+    assert trader.baskets == []
+
+
+def test_pending_basket_stays_until_final_status():
+    trader = _FakeTrader([1])
+    basket = _basket(1)
+    trader.baskets.append(basket)
+    submit_basket(trader, basket, price_type=11).join(5)
+    assert not basket.done() and trader.baskets == [basket]
+    basket.on_async_response(1, 1001)
+    basket.on_order({"order_id": 1001, "order_status": 56, "traded_volume": 100})
+    assert basket.done()
+
+
+def test_unrelated_order_updates_are_capped():
+    basket = _basket(1)
+    for order_id in range(MAX_EARLY + 50):
+        basket.on_order({"order_id": order_id, "order_status": 50})
+    assert len(basket._early_orders) == MAX_EARLY
+    assert 0 not in basket._early_orders
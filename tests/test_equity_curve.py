@@ -0,0 +1,44 @@
+import os
+import pandas.testing as pdt
+import equity_curve
+from snapshot_store import SnapshotStore
+
+
+def _account(total):
+    return [{"总资产": total, "持仓市值": total / 2, "可用资金": total / 2}]
+
+
+def _full_rebuild(data_dir, store):
+    equity_curve._memo.pop(data_dir, None)
+    os.remove(os.path.join(data_dir, equity_curve.STATE_NAME))
+    return equity_curve.refresh_equity_curve(data_dir, store)
+
+
+def test_incremental_curve_matches_full_rebuild(tmp_path):
+    data_dir = str(tmp_path)
+    store = SnapshotStore(data_dir)
+    for date_str, total in [("20250102", 100.0), ("20250103", 110.0), ("20250106", 99.0)]:
+        store.write_day("account", date_str, _account(total))
+    curve = equity_curve.refresh_equity_curve(data_dir, store)
+    # 周末按自然日插值，日收益率只在真实交易日之间计算
+    assert len(curve) == 5
+    assert round(curve["总资产"].iloc[3], 2) == 102.67
+    assert curve["日收益率"].notna().sum() == 2
+    assert equity_curve.refresh_equity_curve(data_dir, store) is curve
+
+    # 追加新日期
+    store.write_day("account", "20250107", _account(120.0))
+    curve = equity_curve.refresh_equity_curve(data_dir, store)
+    assert curve.index[-1].strftime("%Y%m%d") == "20250107"
+    pdt.assert_frame_equal(curve, _full_rebuild(data_dir, store), check_freq=False)
+
+    # 改写较早的日期、删除某天的资产
+    store.write_day("account", "20250103", _account(90.0))
+    store.write_day("account", "20250106", [])
+    curve = equity_curve.refresh_equity_curve(data_dir, store)
+    assert curve["日收益率"].notna().sum() == 2
+    pdt.assert_frame_equal(curve, _full_rebuild(data_dir, store), check_freq=False)
+
+    # 进程重启：从落盘的状态和曲线恢复
+    equity_curve._memo.clear()
+    pdt.assert_frame_equal(equity_curve.refresh_equity_curve(data_dir, store), curve, check_freq=False)
@@ -0,0 +1,65 @@
+import time
+import threading
+from event_bus import Consumer, EventBus, DROP_NEWEST, DROP_OLDEST, stress
+
+
+def _fill(consumer, n):
+    for i in range(n):
+        consumer.offer(("order", time.monotonic(), i))
+
+
+def test_drop_policies():
+    overflows = []
+    # 不启动线程，队列只进不出
+    oldest = Consumer("oldest", lambda e: None, maxsize=3, overflow=DROP_OLDEST,
+                      on_overflow=lambda: overflows.append(1))
+    _fill(oldest, 5)
+    assert [e[2] for e in oldest.queue] == [2, 3, 4]
+    assert oldest.dropped == 2
+    assert len(overflows) == 2
+
+    newest = Consumer("newest", lambda e: None, maxsize=3, overflow=DROP_NEWEST, kinds=["order"])
+    _fill(newest, 5)
+    newest.offer(("trade", time.monotonic(), 9))
+    assert [e[2] for e in newest.queue] == [0, 1, 2]
+    assert newest.stats()["dropped"] == 2
+
+
+def test_concurrent_publishers_count_every_drop():
+    consumer = Consumer("c", lambda e: None, maxsize=100)
+    threads = [threading.Thread(target=_fill, args=(consumer, 5000)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(consumer.queue) == 100
+    assert consumer.dropped == 4 * 5000 - 100
+
+
+def test_drain_waits_for_running_handler():
+    release = threading.Event()
+    done = []
+
+    def handler(event):
+        release.wait(5)
+        done.append(event[2])
+
+    bus = EventBus()
+    consumer = bus.add_consumer("slow", handler)
+    bus.publish("order", 1)
+    deadline = time.monotonic() + 5
+    while consumer.queue and time.monotonic() < deadline:
+        time.sleep(0.001)
+    # 队列已空但处理器还在运行
+    assert not bus.drain(timeout=0.05)
+    release.set()
+    assert bus.drain(timeout=5)
+    assert done == [1]
+    assert consumer.processed == 1
+    bus.stop()
+
+
+def test_stress_consumes_everything():
+    result = stress(events=3000, consumers=2)
+    assert [c["processed"] for c in result["consumers"]] == [3000, 3000]
+    assert all(c["backlog"] == 0 and c["dropped"] == 0 for c in result["consumers"])
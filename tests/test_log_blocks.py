@@ -0,0 +1,58 @@
+import os
+import gzip
+import pytest
+from log_blocks import BlockReader, compress_log, compress_rotated, open_log, raw_size
+
+
+def _write_log(path, n=2000):
+    lines = [f"2025-01-02 09:{i // 60 % 60:02d}:{i % 60:02d},000 - INFO - 第 {i} 行 600000.SH\n" for i in range(n)]
+    data = "".join(lines).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(data)
+    return data
+
+
+def test_block_reader_matches_original(tmp_path):
+    path = str(tmp_path / "main.log.20250102")
+    data = _write_log(path)
+    gz = compress_log(path, block_size=4096)
+    assert not os.path.exists(path)
+    # 仍是标准 gzip
+    with gzip.open(gz, "rb") as f:
+        assert f.read() == data
+    assert raw_size(gz) == len(data)
+
+    with BlockReader(gz) as reader:
+        assert len(reader.blocks.raw) > 3
+        # 跨块读取
+        for start, n in [(0, 100), (4000, 300), (len(data) - 50, 100), (12345, 9000)]:
+            reader.seek(start)
+            assert reader.read(n) == data[start:start + n]
+            assert reader.tell() == min(start + n, len(data))
+        # 逐行读取与原文件一致，行不会跨块
+        reader.seek(0)
+        lines = list(iter(reader.readline, b""))
+        assert b"".join(lines) == data
+        assert all(line.endswith(b"\n") for line in lines)
+        reader.seek(-10, 2)
+        assert reader.read() == data[-10:]
+
+
+@pytest.mark.parametrize("size", [0, 10])
+def test_block_reader_small_files(tmp_path, size):
+    path = str(tmp_path / "tick.log.20250102")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    with open_log(compress_log(path)) as reader:
+        assert reader.read() == b"x" * size
+        assert reader.readline() == b""
+
+
+def test_compress_rotated_keeps_recent(tmp_path):
+    from datetime import date
+    for name in ("main.log", "main.log.20250101", "main.log.20250102", "main.log.20250103"):
+        _write_log(str(tmp_path / name), n=10)
+    done = compress_rotated(str(tmp_path), today=date(2025, 1, 3))
+    assert [os.path.basename(p) for p in done] == ["main.log.20250101.gz"]
+    assert sorted(os.listdir(tmp_path)) == ["main.log", "main.log.20250101.gz", "main.log.20250102",
+                                            "main.log.20250103"]
@@ -0,0 +1,124 @@
+import re
+from datetime import datetime
+import pytest
+import log_grep
+from log_grep import compile_matcher, decode_lines, grep_lines, grep_logs, scan_bytes
+
+CODES = ["600001.SH", "600001.SZ", "000001.SZ", "688001.sh"]
+
+
+def _data(n=3000, tail=True):
+    lines = []
+    for i in range(n):
+        level = "ERROR" if i % 97 == 0 else "INFO"
+        code = CODES[i % len(CODES)]
+        lines.append(f"2025-01-02 10:{i // 60 % 60:02d}:{i % 60:02d},000 - {level} - 第{i}笔 {code} 卖出 {i % 7}00股\n")
+    data = "".join(lines)
+    if tail:
+        # 还没写完的最后半行
+        data += "2025-01-02 11:00:00,000 - INFO - 600001.SH 写到一半"
+    return data.encode("utf-8")
+
+
+def _expected(data, matches, base=0):
+    los, parts, pos = [], [], 0
+    for line in data.splitlines(keepends=True):
+        if matches(line.decode("utf-8")):
+            los.append(base + pos)
+            parts.append(line)
+        pos += len(line)
+    return los, b"".join(parts)
+
+
+def _check(data, keyword, matches, regex=False, ignore_case=True, **kwargs):
+    result = scan_bytes(data, 100, compile_matcher(keyword, regex, ignore_case), **kwargs)
+    assert result == _expected(data, matches, base=100)
+    return result
+
+
+def test_dense_mode_switches_midway(monkeypatch):
+    calls = []
+    dense = log_grep._dense_lines
+    monkeypatch.setattr(log_grep, "_dense_lines", lambda *a: calls.append(1) or dense(*a))
+    data = _data()
+    los, blob = _check(data, "info", lambda line: "info" in line.lower())
+    assert calls
+    assert len(los) == len(decode_lines(blob))
+    # 稀疏的关键词不切换
+    calls.clear()
+    _check(data, "error", lambda line: "error" in line.lower())
+    _check(data, "ERROR", lambda line: "ERROR" in line, ignore_case=False)
+    assert not calls
+
+
+def test_anchor_mode_confirms_whole_line():
+    matcher = compile_matcher("600001.sh")
+    assert matcher[3] == b"600001."
+    data = _data()
+    # 600001.SZ 命中定位串但整行不匹配
+    _check(data, "600001.sh", lambda line: "600001.sh" in line.lower())
+    _check(data, "600001.SH", lambda line: "600001.SH" in line, ignore_case=False)
+    # 中文关键词不区分大小写也不需要 lower()
+    assert compile_matcher("卖出 3")[2] is False
+    _check(data, "卖出 3", lambda line: "卖出 3" in line)
+
+
+def test_regex_mode_matches_per_line():
+    data = _data()
+    _check(data, r"^2025-01-02 10:0\d:\d5.*ERROR", lambda line: re.search(r"^2025-01-02 10:0\d:\d5.*ERROR", line),
+           regex=True)
+    _check(data, r"SZ 卖出 [36]00股$", lambda line: re.search(r"SZ 卖出 [36]00股$", line), regex=True)
+    _check(data, r"688001\.SH", lambda line: "688001.sh" in line, regex=True)
+    assert scan_bytes(data, 0, compile_matcher(r"688001\.SH", regex=True, ignore_case=False)) == ([], b"")
+    with pytest.raises(re.error):
+        compile_matcher("(", regex=True)
+
+
+def test_time_range_keeps_untimed_lines():
+    data = _data(200, tail=False) + b"Traceback (most recent call last): 600001.SH\n"
+    start, end = b"2025-01-02 10:01:00", b"2025-01-02 10:02:30"
+
+    def in_range(line):
+        stamp = line[:19]
+        return not stamp[0].isdigit() or start.decode() <= stamp <= end.decode()
+
+    for keyword in ("600001.sh", "sh", "0"):
+        _check(data, keyword, lambda line: in_range(line) and keyword in line.lower(), start_s=start, end_s=end)
+
+
+def test_grep_logs_across_chunks_and_processes(tmp_path, monkeypatch):
+    files = []
+    for day in ("20250101", "20250102"):
+        path = tmp_path / f"main.log.{day}"
+        path.write_bytes(_data())
+        files.append(str(path))
+    with open(files[0], encoding="utf-8") as f:
+        first = f.read()
+
+    monkeypatch.setattr(log_grep, "SCAN_CHUNK", 4096)
+    results = list(grep_logs(files, "600001.sh"))
+    expected = [line for line in first.splitlines(keepends=True) if "600001.sh" in line.lower()]
+    assert [line for path, _, line in results if path == files[0]] == expected
+    # 行首位置可以直接 seek 到对应的行
+    with open(files[1], "rb") as f:
+        for path, offset, line in results[-5:]:
+            f.seek(offset)
+            assert f.readline().decode("utf-8") == line
+
+    monkeypatch.setattr(log_grep, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(log_grep, "LOG_SEARCH_WORKERS", 2)
+    try:
+        assert list(grep_logs(files, "600001.sh")) == results
+    finally:
+        log_grep._reset_pool()
+
+
+def test_grep_lines_with_time_range(tmp_path):
+    path = tmp_path / "main.log"
+    path.write_bytes(_data())
+    start, end = datetime(2025, 1, 2, 10, 20), datetime(2025, 1, 2, 10, 25, 30)
+    lines = grep_lines([str(path)], "ERROR", start, end)
+    expected = [line for line in path.read_text(encoding="utf-8").splitlines(keepends=True)
+                if "ERROR" in line and "2025-01-02 10:20:00" <= line[:19] <= "2025-01-02 10:25:30"]
+    assert lines == expected
+    assert lines
@@ -0,0 +1,128 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from log_blocks import compress_log
+from log_index import TimeIndex, TEXT_TIMESTAMP_RE
+
+BASE = datetime(2025, 1, 2, 9, 30)
+
+
+def _lines(n, first=0):
+    """每秒两行，每 50 行夹一段不带时间的异常堆栈"""
+    lines = []
+    for i in range(first, first + n):
+        stamp = (BASE + timedelta(seconds=i // 2)).strftime("%Y-%m-%d %H:%M:%S")
+        lines.append(f"{stamp},000 - INFO - 第 {i} 行 600000.SH\n")
+        if i % 50 == 49:
+            lines.append("Traceback (most recent call last):\n    raise ValueError\n")
+    return lines
+
+
+def _write(path, lines, mode="w"):
+    with open(path, mode, encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+def _timed_lines(path):
+    """[(行首位置, 时间 str)]"""
+    result, pos = [], 0
+    with open(path, "rb") as f:
+        for line in f:
+            match = TEXT_TIMESTAMP_RE.search(line.decode("utf-8"))
+            if match:
+                result.append((pos, match.group(0)))
+            pos += len(line)
+    return result
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = str(tmp_path / "main.log")
+    _write(path, _lines(2000))
+    return path
+
+
+def _index(log_file, tmp_path):
+    return TimeIndex(log_file, index_dir=str(tmp_path / ".index"), stride=512)
+
+
+def test_span_boundaries(log_file, tmp_path):
+    index = _index(log_file, tmp_path)
+    size = index.refresh()
+    assert size == os.path.getsize(log_file)
+    assert index.times.size > 50
+    timed = _timed_lines(log_file)
+
+    # 不限范围：整个文件
+    lo, body_lo, body_hi, hi = index.span()
+    assert (lo, hi) == (0, size)
+    assert body_lo == index.offsets[0] and body_hi == index.offsets[-1]
+
+    last = BASE + timedelta(seconds=999)
+    cases = [
+        (BASE - timedelta(hours=1), BASE),
+        (BASE, BASE),
+        (BASE + timedelta(seconds=37), BASE + timedelta(seconds=37)),
+        (BASE + timedelta(seconds=100), BASE + timedelta(seconds=400)),
+        (last, last + timedelta(hours=1)),
+        (last + timedelta(seconds=1), None),
+        (None, BASE - timedelta(seconds=1)),
+        (BASE + timedelta(seconds=300), BASE + timedelta(seconds=200)),
+    ]
+    # 每个采样点所在的秒和相邻的秒
+    for t in index.times[::7].tolist():
+        stamp = datetime(1970, 1, 1) + timedelta(seconds=t)
+        cases.append((stamp, stamp))
+        cases.append((stamp + timedelta(seconds=1), stamp + timedelta(seconds=3)))
+
+    for start, end in cases:
+        lo, body_lo, body_hi, hi = index.span(start, end)
+        assert 0 <= lo <= body_lo <= body_hi <= hi <= size
+        start_s = start.strftime("%Y-%m-%d %H:%M:%S") if start else None
+        end_s = end.strftime("%Y-%m-%d %H:%M:%S") if end else None
+        for pos, stamp in timed:
+            inside = (not start_s or stamp >= start_s) and (not end_s or stamp <= end_s)
+            # 范围内的行都在 [lo, hi)，[body_lo, body_hi) 内的行都在范围内
+            if inside:
+                assert lo <= pos < hi, (start, end, pos)
+            if body_lo <= pos < body_hi:
+                assert inside, (start, end, pos)
+
+
+def test_iter_lines_matches_filter(log_file, tmp_path):
+    index = _index(log_file, tmp_path)
+    start, end = BASE + timedelta(seconds=120), BASE + timedelta(seconds=480)
+    lines = list(index.iter_lines(start, end))
+    with open(log_file, encoding="utf-8") as f:
+        expected = [line for line in f if "2025-01-02 09:32:00" <= line[:19] <= "2025-01-02 09:38:00"]
+    assert [line for line in lines if line[0].isdigit()] == expected
+    # 范围中间的异常堆栈保留
+    assert "    raise ValueError\n" in lines
+    assert list(index.iter_lines(start, end, keyword="第 300 行")) == [l for l in expected if "第 300 行" in l]
+
+
+def test_refresh_extends_and_survives_rotation(log_file, tmp_path):
+    index = _index(log_file, tmp_path)
+    index.refresh()
+    sampled = index.times.size
+    _write(log_file, _lines(2000, first=2000), mode="a")
+    index.refresh()
+    assert index.times.size > sampled
+    reloaded = _index(log_file, tmp_path)
+    reloaded.refresh()
+    assert reloaded.times.tolist() == index.times.tolist()
+
+    # 轮转改名后沿用原索引，压缩后仍按原始位置读取
+    rotated = log_file + ".20250102"
+    os.rename(log_file, rotated)
+    adopted = _index(rotated, tmp_path)
+    adopted._load()
+    assert adopted.offsets.tolist() == index.offsets.tolist()
+    assert not os.path.exists(index.index_path)
+
+    start, end = BASE + timedelta(seconds=1500), BASE + timedelta(seconds=1510)
+    expected = list(adopted.iter_lines(start, end))
+    # 开头是第 2999 行的异常堆栈（不带时间的行保留）
+    assert len([line for line in expected if line[0].isdigit()]) == 22
+    gz = compress_log(rotated, block_size=4096)
+    assert list(_index(gz, tmp_path).iter_lines(start, end)) == expected
@@ -0,0 +1,93 @@
+import time
+import pytest
+import log_grep
+import log_search
+from log_grep import grep_lines
+from log_search import get_token_index, open_cursor, search_logs, query_tokens
+
+LINES = [
+    "2026-10-16 09:30:00,001 - INFO - [网格] 600001.SH买入完成 100股 价格10.52",
+    "2026-10-16 09:30:01,002 - INFO - 触发买入信号 000001.SZ 数量200股",
+    "2026-10-16 09:30:02,003 - WARNING - 委托失败 order_id=12345abc 原因：可用资金不足",
+    "2026-10-16 09:30:03,004 - INFO - tick_v2 最新价 1600000.sh 成交量300",
+    "2026-10-16 09:30:04,005 - INFO - 卖出 688001.SH 500股，收益率3.5%",
+    "2026-10-16 09:30:05,006 - ERROR - 撤单失败 600001.shx abcDEF",
+]
+KEYWORDS = ["股", "买入", "sh买入", "SH买入完成", "600001.SH", "600000.sh", "1.sh", "abc", "bc",
+            "def", "12345abc", "tick_v2", "v2", "最新价 1600", "：可用", "网格]", "5%", "shx", "完成 100股"]
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "main.log"
+    path.write_text("\n".join(LINES * 20) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_query_tokens_split_by_class():
+    assert query_tokens("600001.SH买入完成") == ["sh", "买入完成", "600001.sh"]
+    assert query_tokens("100股") == ["股"]
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_index_matches_scan(log_file, keyword):
+    index = get_token_index(log_file)
+    assert index.ready()
+    assert search_logs([log_file], keyword=keyword) == grep_lines([log_file], keyword)
+
+
+def test_common_tokens_fall_back_to_scan(log_file, monkeypatch):
+    monkeypatch.setattr(log_search, "STOP_MIN_LINES", 10)
+    index = get_token_index(log_file)
+    assert index.ready()
+    assert "info" in index.common
+    assert index.candidates("INFO") is None
+    for keyword in ("INFO", "info - 卖出", "股"):
+        assert search_logs([log_file], keyword=keyword) == grep_lines([log_file], keyword)
+
+
+def test_large_backlog_builds_in_background(log_file):
+    index = get_token_index(log_file)
+    assert not index.ready(sync_limit=0)
+    # 后台补建期间照常返回全文扫描的结果
+    assert search_logs([log_file], keyword="买入") == grep_lines([log_file], "买入")
+    deadline = time.time() + 10
+    while index._building and time.time() < deadline:
+        time.sleep(0.01)
+    assert index.size > 0
+    assert index.ready(sync_limit=0)
+
+
+@pytest.mark.parametrize("keyword, regex", [("买入", False), ("", False), (r"\d{3}股", True)])
+def test_cursor_pages_cross_segments(tmp_path, monkeypatch, keyword, regex):
+    # 段很小：扫描段按 512 字节切分，索引段每 7 个位置一段
+    monkeypatch.setattr(log_grep, "SCAN_CHUNK", 512)
+    monkeypatch.setattr(log_search, "INDEX_BLOCK", 7)
+    files = []
+    for name, repeat in (("main.log.20261015", 20), ("empty.log", 0), ("main.log", 13)):
+        path = tmp_path / name
+        text = "\n".join(LINES * repeat)
+        # 正在写入的文件最后是没写完的半行
+        path.write_text(text + ("\n" if name != "main.log" else ""), encoding="utf-8")
+        files.append(str(path))
+    expected = search_logs(files, keyword=keyword, regex=regex)
+    assert expected == grep_lines(files, keyword, regex=regex)
+
+    cursor = open_cursor(files, keyword=keyword, regex=regex)
+    assert len(cursor.segments) > 3
+    assert cursor.total() == len(expected)
+    for size in (1, 5, 16, len(expected) + 1):
+        pages = []
+        for number in range((len(expected) + size - 1) // size):
+            page = cursor.page(number, size)
+            assert len(page) == min(size, len(expected) - number * size)
+            pages.extend(page)
+        assert pages == expected
+        assert cursor.page(len(expected) // size + 1, size) == []
+    assert list(cursor.iter_lines()) == expected
+
+    # 之后追加的内容不在已打开的游标里（原来的半行写完后带上换行）
+    with open(files[-1], "a", encoding="utf-8") as f:
+        f.write("\n" + "\n".join(LINES) + "\n")
+    page = cursor.page(0, len(expected) + 10)
+    assert [line.rstrip("\n") for line in page] == [line.rstrip("\n") for line in expected]
@@ -0,0 +1,57 @@
+import json
+import queue
+import logging
+import threading
+import logger as log_module
+from logger import BatchQueueListener, DropQueueHandler, setup_logger
+
+
+class _BlockingHandler(logging.Handler):
+    """写第一条记录时阻塞，模拟写线程卡住、队列被写满"""
+
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+        self.unblock.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def test_structured_lines_are_flushed(tmp_path):
+    path = tmp_path / "main.log"
+    log = setup_logger("test_structured", str(path), rotate=False, structured=True, console=False)
+    for i in range(1000):
+        log.info("买入 600000.SH n=%d", i, extra={"event": "buy", "code": "600000.SH"})
+    log_module.flush_logs()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1000
+    entry = json.loads(lines[-1])
+    assert entry["event"] == "buy" and entry["msg"] == "买入 600000.SH n=999"
+
+
+def test_stop_with_full_queue_keeps_final_flush(monkeypatch):
+    monkeypatch.setattr(log_module, "STOP_TIMEOUT", 0.2)
+    log_queue = queue.Queue(3)
+    source = DropQueueHandler(log_queue)
+    handler = _BlockingHandler()
+    listener = BatchQueueListener(log_queue, handler, source=source)
+    listener.start()
+    log = logging.getLogger("test_full_queue")
+    log.propagate = False
+    log.addHandler(source)
+    log.warning("first")
+    while not log_queue.empty():
+        pass
+    for i in range(5):
+        log.warning("queued %d", i)
+    assert source.dropped == 2
+
+    # 写线程一直卡住：stop 等待超时后丢弃最早的一条放入结束标记，不会抛出 queue.Full
+    listener.stop()
+    handler.unblock.set()
+    log_queue.join()
+    # 停止时丢弃了最早的一条给结束标记腾出位置；第一批写完时已丢弃 3 条，警告紧跟在第一条之后
+    assert source.dropped == 3
+    assert handler.messages == ["first", "日志队列已满，已丢弃 3 条日志", "queued 1", "queued 2"]
@@ -0,0 +1,93 @@
+import pandas as pd
+import pandas.testing as pdt
+import lot_engine
+from lot_engine import LotEngine, update_lot_engine
+from postmarket_helper import read_store_trades
+from snapshot_store import SnapshotStore
+
+
+def _trades(date_str, rows):
+    return pd.DataFrame([
+        {"日期": date_str, "StockCode": code, "TradeType": side, "Volume": volume, "Price": price,
+         "Strategy": strategy, "TradeTime": f"10:00:0{i}"}
+        for i, (code, side, volume, price, strategy) in enumerate(rows)
+    ])
+
+
+def _store_trade(code, side, volume, price, strategy="网格"):
+    return {"StockCode": code, "TradeType": {"buy": 23, "sell": 24}[side], "Volume": volume,
+            "Price": price, "Value": volume * price, "Strategy": strategy, "TradeTime": "10:00:00"}
+
+
+def test_fifo_and_average():
+    trades = pd.concat([
+        _trades("20250102", [("600000.SH", "buy", 100, 10.0, "网格"), ("600000.SH", "buy", 100, 12.0, "网格")]),
+        _trades("20250106", [("600000.SH", "sell", 150, 13.0, "动量")]),
+    ])
+    fifo = LotEngine("fifo")
+    fifo.apply(trades)
+    realized = fifo.realized_lots()
+    assert realized["数量"].tolist() == [100.0, 50.0]
+    assert realized["已实现盈亏"].tolist() == [300.0, 50.0]
+    assert realized["持有天数"].tolist() == [4, 4]
+    assert realized["Strategy"].tolist() == ["动量", "动量"]
+    assert fifo.open_lots()["数量"].tolist() == [50.0]
+
+    # 再亏损卖出剩余的 50 股：两个盈利批次、一个亏损批次
+    fifo.apply(_trades("20250107", [("600000.SH", "sell", 50, 11.0, "动量")]))
+    by_symbol = fifo.realized_by_symbol()
+    assert by_symbol.loc["600000.SH", "平仓笔数"] == 3
+    assert by_symbol.loc["600000.SH", "胜率"] == 2 / 3
+
+    average = LotEngine("average")
+    average.apply(trades)
+    assert average.realized_lots()["已实现盈亏"].sum() == 150 * (13.0 - 11.0)
+    assert average.open_lots()["开仓价"].tolist() == [11.0]
+
+
+def test_overlay_leaves_base_untouched():
+    base = LotEngine("fifo")
+    base.apply(_trades("20250102", [("600000.SH", "buy", 100, 10.0, ""), ("000001.SZ", "buy", 100, 5.0, "")]))
+    live = base.overlay()
+    live.apply(_trades("20250103", [("600000.SH", "sell", 100, 11.0, ""), ("600001.SH", "buy", 100, 8.0, "")]))
+
+    assert base.open_lots()["StockCode"].tolist() == ["600000.SH", "000001.SZ"]
+    assert base.realized_lots().empty
+    assert live.open_lots()["StockCode"].tolist() == ["000001.SZ", "600001.SH"]
+    assert live.realized_lots()["已实现盈亏"].tolist() == [100.0]
+    # 没有被新成交改动的代码仍与基础引擎共用
+    assert live.lots["000001.SZ"] is base.lots["000001.SZ"]
+
+
+def test_update_rebuilds_on_backfill_and_rewrite(tmp_path):
+    data_dir = str(tmp_path)
+    store = SnapshotStore(data_dir)
+    lot_engine._engines.clear()
+    lot_engine._live.clear()
+    store.write_day("trades", "20250102", [_store_trade("600000.SH", "buy", 200, 10.0)])
+    store.write_day("trades", "20250106", [_store_trade("600000.SH", "sell", 100, 12.0)])
+    store.write_day("trades", "20250107", [_store_trade("600000.SH", "sell", 100, 13.0)])
+
+    engine = update_lot_engine(data_dir, store)
+    assert engine.realized_lots()["已实现盈亏"].tolist() == [200.0, 300.0]
+    assert update_lot_engine(data_dir, store) is engine
+
+    # 补录检查点之前的日期：更早的买入改变了 FIFO 匹配
+    store.write_day("trades", "20250103", [_store_trade("600000.SH", "buy", 100, 11.0)])
+    engine = update_lot_engine(data_dir, store)
+    assert engine.realized_lots()["已实现盈亏"].tolist() == [200.0, 300.0]
+    assert engine.open_lots()["开仓价"].tolist() == [11.0]
+
+    # 改写已入检查点的日期
+    store.write_day("trades", "20250102", [_store_trade("600000.SH", "buy", 200, 9.0)])
+    engine = update_lot_engine(data_dir, store)
+    replayed = LotEngine("fifo")
+    replayed.apply(read_store_trades(store))
+    expected = replayed.realized_lots()
+    pdt.assert_frame_equal(engine.realized_lots(), expected)
+    assert engine.realized_lots()["已实现盈亏"].tolist() == [300.0, 400.0]
+
+    # 从检查点恢复后结果一致
+    lot_engine._engines.clear()
+    lot_engine._live.clear()
+    pdt.assert_frame_equal(update_lot_engine(data_dir, store).realized_lots(), expected)
@@ -0,0 +1,97 @@
+import threading
+from urllib.request import urlopen
+import pytest
+import metrics
+from metrics import Registry, cached, registry, timed, timer
+
+
+def test_timers_record_calls_and_errors():
+    @timed("test.work")
+    def work(fail=False):
+        if fail:
+            raise ValueError("失败")
+        return 1
+
+    before = registry.timer("test.work").hist.total
+    assert work() == 1
+    with pytest.raises(ValueError):
+        work(fail=True)
+    t = registry.timer("test.work")
+    assert t.hist.total == before + 2
+    assert t.errors >= 1
+    with timer("test.block"):
+        pass
+    row = registry.timers_frame().set_index("埋点").loc["test.block"]
+    assert row["调用次数"] >= 1
+    # 分位数不超过实际最大值
+    assert row["p99(ms)"] <= row["最大(ms)"]
+
+
+def test_registry_frames_and_prometheus():
+    reg = Registry()
+    reg.timer('a"b').add(0.01)
+    reg.timer('a"b').add(0.02, error=True)
+    threads = [threading.Thread(target=lambda: [reg.incr("bytes") for _ in range(1000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    reg.incr("cache.page.calls", 10)
+    reg.incr("cache.page.miss", 3)
+    reg.set_gauge("backlog", 5)
+
+    assert reg.counters["bytes"] == 4000
+    cache = reg.cache_frame().iloc[0]
+    assert (cache["缓存"], cache["命中"], cache["命中率"]) == ("page", 7, 0.7)
+    counters = reg.counters_frame().set_index("名称")
+    assert "cache.page.calls" not in counters.index
+    assert counters.loc["backlog", "类型"] == "gauge"
+    frame = reg.timers_frame().iloc[0]
+    assert (frame["调用次数"], frame["失败次数"]) == (2, 1)
+    assert 1 <= frame["最近一分钟调用"] <= 2
+
+    text = reg.prometheus()
+    assert 'qmt_call_seconds_count{name="a\\"b"} 2' in text
+    assert 'qmt_call_errors_total{name="a\\"b"} 1' in text
+    assert 'qmt_counter_total{name="bytes"} 4000' in text
+    assert 'qmt_gauge{name="backlog"} 5' in text
+
+    # 清零后装饰器持有的 Timer 仍然有效
+    t = reg.timer('a"b')
+    reg.reset()
+    assert reg.timer('a"b') is t and t.hist.total == 0
+    assert not reg.counters and not reg.gauges
+
+
+def test_cached_counts_hits_and_misses():
+    def fake_cache(func):
+        store = {}
+
+        def wrapper(x):
+            if x not in store:
+                store[x] = func(x)
+            return store[x]
+        wrapper.clear = store.clear
+        return wrapper
+
+    @cached("test.square", fake_cache)
+    def square(x):
+        return x * x
+
+    before = dict(registry.counters)
+    assert [square(2), square(2), square(3)] == [4, 4, 9]
+    square.clear()
+    square(2)
+    calls = registry.counters["cache.test.square.calls"] - before.get("cache.test.square.calls", 0)
+    misses = registry.counters["cache.test.square.miss"] - before.get("cache.test.square.miss", 0)
+    assert (calls, misses) == (4, 3)
+
+
+def test_metrics_endpoint():
+    server = metrics.serve(0, host="127.0.0.1")
+    assert metrics.serve(0) is server
+    port = server.server_address[1]
+    body = urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode("utf-8")
+    assert "qmt_uptime_seconds" in body
+    with pytest.raises(Exception):
+        urlopen(f"http://127.0.0.1:{port}/other", timeout=5)
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from order_book import OrderBook, ORDER_JUNK
+
+
+def _order(order_id, status, **extra):
+    return SimpleNamespace(**dict({"stock_code": "600000.SH", "order_volume": 100, "price": 10.0,
+                                   "order_id": order_id, "strategy_name": "网格", "order_status": status,
+                                   "status_msg": "", "order_time": 1735781400, "order_remark": "网格_600000.SH"},
+                                  **extra))
+
+
+def _trade(traded_id, order_id, volume=100):
+    return SimpleNamespace(stock_code="600000.SH", traded_volume=volume, traded_price=10.0,
+                           traded_amount=volume * 10.0, order_type=23, strategy_name="网格",
+                           order_remark="网格_600000.SH", order_id=order_id, traded_id=traded_id,
+                           traded_time=1735781460)
+
+
+def test_callbacks_update_book_and_deltas():
+    book = OrderBook()
+    assert book.needs_reconcile(60)
+    book.seed([_order(1, 56)], [_trade("t1", 1)])
+    assert not book.needs_reconcile(60)
+    seen = []
+    unsubscribe = book.subscribe(seen.append)
+    start = book.version
+
+    book.on_order(_order(2, 50))
+    book.on_order(_order(2, 55))
+    book.on_trade(_trade("t2", 2, 50))
+    # 同一成交编号重复推送只保留一条
+    book.on_trade(_trade("t2", 2, 50))
+    book.on_order_error(SimpleNamespace(order_id=3, error_msg="可用资金不足", order_remark="动量"))
+
+    assert [d[1] for d in book.changes_since(start)] == ["order", "order", "trade", "trade", "error"]
+    assert seen == book.changes_since(start)
+    assert book.changes_since(book.version) == []
+    assert {o["order_id"]: o["order_status"] for o in book.order_records()} == {1: 56, 2: 55, 3: ORDER_JUNK}
+    assert len(book.trade_records()) == 2
+
+    orders = book.orders_frame()
+    assert orders.loc[orders["订单编号"] == 3, "状态描述"].item() == "可用资金不足"
+    assert orders.loc[orders["订单编号"] == 3, "报单时间"].item() == ""
+    assert book.trades_frame()["TradeId"].tolist() == ["t1", "t2"]
+
+    unsubscribe()
+    book.mark_stale()
+    assert book.needs_reconcile(60)
+    book.on_order(_order(4, 50))
+    assert len(seen) == 5
+
+
+def test_old_versions_need_full_reload():
+    book = OrderBook(max_deltas=3)
+    for order_id in range(5):
+        book.on_order(_order(order_id, 50))
+    # 只保留最近 3 条变化
+    assert book.changes_since(1) is None
+    assert [d[0] for d in book.changes_since(2)] == [3, 4, 5]
+    book.seed([], [])
+    assert book.changes_since(5)[-1][1] == "reset"
+    assert book.order_records() == []
@@ -0,0 +1,101 @@
+import json
+import time
+import pytest
+import order_lifecycle
+from order_lifecycle import LatencyHistogram, OrderLifecycleTracker, ORDER_REPORTED, ORDER_SUCCEEDED
+
+
+def _order(order_id, status, volume=100, code="600000.SH"):
+    return {"order_id": order_id, "order_status": status, "order_volume": volume, "stock_code": code}
+
+
+def _trade(order_id, volume, code="600000.SH"):
+    return {"order_id": order_id, "traded_volume": volume, "stock_code": code}
+
+
+def _counts(tracker, dimension="all"):
+    return dict(zip(tracker.frame(dimension)["阶段"], tracker.frame(dimension)["笔数"]))
+
+
+def test_histogram_percentiles():
+    hist = LatencyHistogram()
+    assert hist.percentiles() == {50: None, 95: None, 99: None}
+    for ms in range(1, 101):
+        hist.add(ms / 1000)
+    p = hist.percentiles()
+    # 取所在桶的上沿，误差不超过一个桶（5%）
+    for q, expected in ((50, 0.050), (95, 0.095), (99, 0.099)):
+        assert expected <= p[q] <= expected * 1.05
+    stats = hist.to_dict()
+    assert stats["count"] == 100 and stats["max"] == 0.1
+    assert stats["mean"] == pytest.approx(0.0505)
+
+
+def test_full_lifecycle():
+    tracker = OrderLifecycleTracker()
+    started = time.monotonic()
+    tracker.on_submit(1, "600000.SH", "buy", 200, "网格", started=started)
+    assert tracker.pending() == 1
+    tracker.on_async_response(1, 101, at=started + 0.002)
+    tracker.on_order(_order(101, ORDER_REPORTED, 200))
+    tracker.on_trade(_trade(101, 100))
+    assert tracker.pending() == 1
+    tracker.on_trade(_trade(101, 100))
+    assert tracker.pending() == 0
+
+    order = tracker.finished[-1].to_dict()
+    assert order["status"] == ORDER_SUCCEEDED and order["filled"] == 200
+    assert list(order["marks"]) == ["submit", "ack", "accepted", "first_fill", "done"]
+    assert order["marks"]["ack"] == pytest.approx(0.002)
+    assert set(_counts(tracker).values()) == {1}
+    assert len(_counts(tracker)) == 5
+    assert _counts(tracker, "strategy") == _counts(tracker, "symbol") == _counts(tracker)
+    assert tracker.frame("strategy")["维度"].unique().tolist() == ["网格"]
+
+
+def test_ack_before_submit_and_reports_before_ack():
+    tracker = OrderLifecycleTracker()
+    # 异步回报先于 on_submit 登记
+    tracker.on_async_response(2, 102)
+    tracker.on_submit(2, "000001.SZ", "sell", 100)
+    tracker.on_order(_order(102, 54))
+    assert tracker.pending() == 0
+    assert tracker.finished[-1].order_id == 102
+
+    # 终端回报先于异步回报：暂不结算，等异步回报到了合并
+    tracker.on_submit(3, "600000.SH", "buy", 100)
+    tracker.on_order(_order(103, ORDER_REPORTED))
+    tracker.on_trade(_trade(103, 100))
+    assert len(tracker.finished) == 1
+    tracker.on_async_response(3, 103)
+    assert tracker.pending() == 0
+    order = tracker.finished[-1]
+    assert order.seq == 3 and order.filled == 100
+    assert {"submit", "ack", "accepted", "first_fill", "done"} <= set(order.marks)
+
+
+def test_orphans_finish_after_grace(monkeypatch):
+    tracker = OrderLifecycleTracker()
+    tracker.on_order(_order(104, 57))
+    assert tracker.pending() == 0
+    assert not tracker.finished
+    monkeypatch.setattr(order_lifecycle, "ORPHAN_GRACE", 0.0)
+    tracker.pending()
+    # 非本进程提交的委托只有终端侧的阶段
+    assert tracker.finished[-1].order_id == 104
+    assert not any(stage.startswith("提交") for stage in _counts(tracker))
+
+
+def test_export_json(tmp_path):
+    tracker = OrderLifecycleTracker(max_finished=2)
+    for seq in range(1, 4):
+        tracker.on_submit(seq, "600000.SH", "buy", 100)
+        tracker.on_async_response(seq, 100 + seq)
+        tracker.on_order(_order(100 + seq, 54))
+    path = tmp_path / "lifecycle.json"
+    tracker.export_json(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert [o["seq"] for o in data["orders"]] == [2, 3]
+    submit_done = [h for h in data["histograms"] if h["stage"] == "submit_done" and h["dimension"] == "all"]
+    assert submit_done[0]["count"] == 3
+    assert "orders" not in tracker.export(include_orders=False)
@@ -0,0 +1,127 @@
+import time
+import threading
+import random
+import pytest
+from paper_broker import PaperMarket, PaperTrader, XtQuantTraderCallback, StockAccount, sample_latency, xtconstant
+
+FAST = {"ack_latency": ("const", 0.0), "accept_latency": ("const", 0.0)}
+
+
+class _Recorder(XtQuantTraderCallback):
+    def __init__(self):
+        self.events = []
+        self._cond = threading.Condition()
+
+    def _add(self, kind, obj):
+        with self._cond:
+            self.events.append((kind, obj))
+            self._cond.notify_all()
+
+    def on_stock_order(self, order):
+        self._add("order", order)
+
+    def on_stock_trade(self, trade):
+        self._add("trade", trade)
+
+    def on_order_error(self, order_error):
+        self._add("error", order_error)
+
+    def on_order_stock_async_response(self, response):
+        self._add("response", response)
+
+    def wait(self, predicate, timeout=5.0):
+        with self._cond:
+            assert self._cond.wait_for(lambda: predicate(self.events), timeout)
+
+    def statuses(self, order_id):
+        return [o.order_status for kind, o in self.events if kind == "order" and o.order_id == order_id]
+
+
+def _tick(ask, bid, ask_vol=0, bid_vol=0, last=None):
+    return {"time": time.time() * 1000, "lastPrice": last or ask, "askPrice": [ask], "bidPrice": [bid],
+            "askVol": [ask_vol], "bidVol": [bid_vol], "volume": 0}
+
+
+@pytest.fixture
+def broker():
+    market = PaperMarket()
+    trader = PaperTrader("paper", 1, market=market,
+                         config=dict(FAST, cash=100000.0, positions={"000001.SZ": (1000, 5.0)}))
+    recorder = _Recorder()
+    trader.register_callback(recorder)
+    trader.start()
+    trader.connect()
+    yield market, trader, recorder, StockAccount("paper")
+    trader.stop()
+
+
+def test_limit_buy_partial_then_full_fill(broker):
+    market, trader, recorder, account = broker
+    seq = trader.order_stock_async(account, "600000.SH", xtconstant.STOCK_BUY, 300, xtconstant.FIX_PRICE, 10.0)
+    recorder.wait(lambda events: any(k == "order" for k, _ in events))
+    assert recorder.events[0][0] == "response" and recorder.events[0][1].seq == seq
+    order_id = recorder.events[0][1].order_id
+    asset = trader.query_stock_asset(account)
+    assert asset.frozen_cash == 3000.0 and asset.cash == 97000.0
+
+    # 卖一价高于委托价不成交；对手盘 100 股时只成交 100 股
+    market.push_tick("600000.SH", _tick(10.1, 10.0, ask_vol=500))
+    market.push_tick("600000.SH", _tick(9.9, 9.8, ask_vol=100))
+    recorder.wait(lambda events: len([e for e in events if e[0] == "trade"]) == 1)
+    assert trader.orders[order_id].order_status == xtconstant.ORDER_PART_SUCC
+    market.push_tick("600000.SH", _tick(9.95, 9.9, ask_vol=1000))
+    recorder.wait(lambda events: xtconstant.ORDER_SUCCEEDED in recorder.statuses(order_id))
+
+    trades = trader.query_stock_trades(account)
+    assert [(t.traded_volume, t.traded_price) for t in trades] == [(100, 9.9), (200, 9.95)]
+    order = trader.orders[order_id]
+    assert order.traded_volume == 300 and order.traded_price == pytest.approx((990 + 1990) / 300)
+    asset = trader.query_stock_asset(account)
+    assert asset.frozen_cash == 0.0
+    assert asset.cash == pytest.approx(100000.0 - 2980.0)
+    position = {p.stock_code: p for p in trader.query_stock_positions(account)}["600000.SH"]
+    assert position.volume == 300 and position.can_use_volume == 0
+
+
+def test_rejects_and_cancel(broker):
+    market, trader, recorder, account = broker
+    trader.order_stock_async(account, "000001.SZ", xtconstant.STOCK_SELL, 2000, xtconstant.FIX_PRICE, 5.0)
+    trader.order_stock_async(account, "600000.SH", xtconstant.STOCK_BUY, 100000, xtconstant.FIX_PRICE, 10.0)
+    recorder.wait(lambda events: len([e for e in events if e[0] == "error"]) == 2)
+    assert sorted(e.error_msg for k, e in recorder.events if k == "error") == ["可用股份不足", "可用资金不足"]
+
+    # 部分成交后撤单：剩余冻结释放，状态为部撤
+    market.push_tick("000001.SZ", _tick(5.3, 5.2, bid_vol=300))
+    trader.order_stock_async(account, "000001.SZ", xtconstant.STOCK_SELL, 500, xtconstant.FIX_PRICE, 5.1)
+    recorder.wait(lambda events: any(k == "trade" for k, _ in events))
+    order_id = next(t.order_id for k, t in recorder.events if k == "trade")
+    position = trader.positions["000001.SZ"]
+    assert (position["volume"], position["frozen_volume"], position["can_use_volume"]) == (700, 200, 500)
+    assert trader.cancel_order_stock(account, order_id) == 0
+    recorder.wait(lambda events: xtconstant.ORDER_PART_CANCEL in recorder.statuses(order_id))
+    assert (position["frozen_volume"], position["can_use_volume"]) == (0, 700)
+    assert trader.cancel_order_stock(account, order_id) == -1
+
+
+def test_same_seed_same_rejects():
+    def rejected(seed):
+        market = PaperMarket()
+        trader = PaperTrader("paper", seed, market=market, config=dict(FAST, reject_rate=0.5, seed=seed))
+        account = StockAccount("paper")
+        for _ in range(40):
+            trader._accept(trader.order_stock(account, "600000.SH", xtconstant.STOCK_BUY, 100,
+                                              xtconstant.FIX_PRICE, 10.0))
+        return [o.order_status == xtconstant.ORDER_JUNK for o in trader.orders.values()]
+
+    first = rejected(7)
+    assert first == rejected(7)
+    assert 0 < sum(first) < 40
+
+
+def test_sample_latency():
+    rng = random.Random(0)
+    assert sample_latency(("const", 0.2), rng) == 0.2
+    assert sample_latency(("normal", -10.0, 0.1), rng) == 0.0
+    assert 0.1 <= sample_latency(("uniform", 0.1, 0.2), rng) <= 0.2
+    with pytest.raises(ValueError):
+        sample_latency(("pareto", 1.0), rng)
@@ -0,0 +1,31 @@
+import json
+import pandas as pd
+from postmarket_helper import load_history_trades, strategy_of
+
+
+def _write(path, trades):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"orders": [], "trades": trades}, f, ensure_ascii=False)
+    return str(path)
+
+
+def test_load_history_trades_skips_unreadable_files(tmp_path):
+    first = _write(tmp_path / "20250102.json", [
+        {"证券代码": "600000.SH", "成交数量": 100, "成交均价": 10.0, "TradeType": 23, "Remark": "网格_600000.SH"},
+        {"证券代码": "600000.SH", "成交数量": 100, "成交均价": 10.5, "TradeType": 99},
+    ])
+    broken = tmp_path / "20250103.json"
+    broken.write_text("{", encoding="utf-8")
+    empty = _write(tmp_path / "20250106.json", [])
+    last = _write(tmp_path / "20250107.json", [
+        {"证券代码": "000001.SZ", "成交数量": 200, "成交均价": 5.0, "TradeType": 24, "Strategy": "动量"},
+    ])
+
+    df = load_history_trades([first, str(broken), empty, str(tmp_path / "missing.json"), last])
+    assert df["日期"].tolist() == ["20250102", "20250102", "20250107"]
+    # 未知的成交类型原样保留
+    assert df["TradeType"].astype(str).tolist() == ["buy", "99", "sell"]
+    assert df["Volume"].dtype == "int64"
+    assert strategy_of(df).tolist() == ["网格", "未知", "动量"]
+
+    assert load_history_trades([empty]).empty
@@ -0,0 +1,102 @@
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+
+from log_blocks import compress_log
+from qmtlog_helper import SignalTailer, parse_signals
+
+
+def _signal(minute, code, side="买入", price=10.0, strategy="网格"):
+    return (f"2025-01-02 10:{minute:02d}:00,000 - INFO - [{strategy}] {code} 触发{side}信号 "
+            f"价格: {price:.2f} 阈值: 9.90\n")
+
+
+def _append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_tailer_reads_appended_lines_and_dedups(tmp_path):
+    log = str(tmp_path / "main.log")
+    _append(log, _signal(0, "600000.SH") + "2025-01-02 10:00:01,000 - INFO - 其他日志\n")
+    tailer = SignalTailer(log)
+    assert tailer.poll() == 1
+
+    # 不完整的最后一行留到下次读取
+    _append(log, _signal(1, "600000.SH") + _signal(2, "000001.SZ", "卖出")[:30])
+    assert tailer.poll() == 1
+    _append(log, _signal(2, "000001.SZ", "卖出")[30:])
+    assert tailer.poll() == 1
+
+    frame = tailer.frame()
+    # 同一策略对同一代码的相同信号只保留最后一次
+    assert frame["证券代码"].tolist() == ["600000.SH", "000001.SZ"]
+    assert str(frame["时间"].iloc[0]) == "2025-01-02 10:01:00"
+    assert tailer.poll() == 0
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_tailer_follows_rotation(tmp_path, compressed):
+    log = str(tmp_path / "main.log")
+    _append(log, _signal(0, "600000.SH"))
+    tailer = SignalTailer(log)
+    assert tailer.poll() == 1
+
+    # 轮转前最后写入的部分还没读到
+    _append(log, _signal(1, "600001.SH"))
+    rotated = str(tmp_path / "main.log.20250102")
+    os.rename(log, rotated)
+    _append(log, _signal(2, "600002.SH"))
+    # 和日志处理器一样先创建新文件再压缩旧文件（否则新文件可能复用旧文件的 inode）
+    if compressed:
+        compress_log(rotated, block_size=64)
+
+    assert tailer.poll() == 2
+    assert tailer.rotations == 1
+    assert tailer.frame()["证券代码"].tolist() == ["600000.SH", "600001.SH", "600002.SH"]
+
+
+def test_parse_signals_extracts_typed_fields():
+    data = (
+        "2025-01-02 10:00:00,000 - INFO - 普通日志 600000.SH 价格: 1.00\n"
+        + _signal(1, "600000.SH", price=10.5)
+        # 字段顺序不同、没有策略和阈值
+        + "2025-01-02 10:02:00,000 - INFO - 价格：8.8 000001.SZ 触发卖出信号 放量\n"
+        + '{"ts": "2025-01-02 10:03:00,000", "level": "INFO", "code": "688001.SH", "strategy": "动量", '
+          '"msg": "触发买入信号 价格=20.1"}\n'
+    ).encode("utf-8")
+    frame = parse_signals(data)
+    assert frame["证券代码"].tolist() == ["600000.SH", "000001.SZ", "688001.SH"]
+    assert frame["信号类型"].tolist() == ["买入", "卖出", "买入"]
+    assert frame["策略"].tolist() == ["网格", "", "动量"]
+    assert frame["价格"].tolist() == [10.5, 8.8, 20.1]
+    assert frame["阈值"].iloc[0] == 9.9 and pd.isna(frame["阈值"].iloc[1])
+    assert frame["详情"].iloc[1] == "放量"
+    assert str(frame["时间"].dtype).startswith("datetime64")
+    assert str(frame["时间"].iloc[2]) == "2025-01-02 10:03:00"
+    assert parse_signals(b"2025-01-02 10:00:00,000 - INFO - nothing\n").empty
+
+
+def test_window_counts_and_latest_by_code(tmp_path):
+    log = str(tmp_path / "main.log")
+    _append(log, _signal(0, "600000.SH") + _signal(3, "600000.SH", "卖出") + _signal(4, "000001.SZ")
+            + _signal(9, "600000.SH", price=11.0) + _signal(10, "000001.SZ", "卖出"))
+    tailer = SignalTailer(log)
+    tailer.poll()
+    latest = tailer.latest_by_code().set_index("证券代码")
+    assert latest.loc["600000.SH", "价格"] == 11.0
+    assert latest.loc["000001.SZ", "信号类型"] == "卖出"
+
+    # 窗口终点为最新的日志时间 10:10，7 分钟内只有 10:03 之后的信号
+    counts = tailer.window_counts(seconds=420).set_index("证券代码")
+    assert counts.loc["600000.SH", ["买入", "卖出"]].tolist() == [1, 1]
+    assert counts.loc["000001.SZ", ["买入", "卖出"]].tolist() == [1, 1]
+    assert tailer.window_counts(seconds=60)["证券代码"].tolist() == ["000001.SZ", "600000.SH"]
+
+
+def test_xueqiu_links_match_single_code_version():
+    from common import get_xueqiu_link, get_xueqiu_links
+    codes = pd.Series(["600000.SH", "000001.SZ", "835368.BJ", "430047.BJ"])
+    assert get_xueqiu_links(codes).tolist() == [get_xueqiu_link(c) for c in codes]
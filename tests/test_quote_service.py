@@ -0,0 +1,74 @@
+import numpy as np
+from quote_service import QuoteService, ReplayQuoteSource, TickRing
+
+
+def _tick(ms, price, **extra):
+    return dict({"time": ms, "lastPrice": price, "bidPrice": [price - 0.01], "askPrice": [price + 0.01],
+                 "bidVol": [100], "askVol": [200], "volume": ms}, **extra)
+
+
+def test_ring_window_wraps_and_is_read_only():
+    ring = TickRing(4)
+    assert ring.latest() is None
+    assert ring.window(3).size == 0
+    for i in range(10):
+        ring.push(i, float(i), 0.0, 0.0, 0, 0, i)
+    assert ring.latest()["last"] == 9.0
+    # 绕回多圈后最近 n 笔仍是连续、按时间升序的视图
+    assert ring.window(3)["last"].tolist() == [7.0, 8.0, 9.0]
+    assert ring.window(10)["ts"].tolist() == [6, 7, 8, 9]
+    view = ring.window(2)
+    assert np.shares_memory(view, ring.buf)
+    assert not view.flags.writeable
+
+
+def test_subscriptions_follow_holdings_and_watchlist():
+    source = ReplayQuoteSource()
+    source.push_tick("600000.SH", _tick(1000, 10.0, lastClose=9.5))
+    service = QuoteService(source, capacity=8, watchlist=["000001.SZ"])
+    service.sync_holdings(["600000.SH"])
+    # 新订阅的代码先用快照填一笔
+    assert service.last_price("600000.SH") == 10.0
+    assert service.prev_close["600000.SH"] == 9.5
+    assert service.last_price("000001.SZ") is None
+
+    seen = []
+    unsubscribe = service.subscribe(lambda code, ring: seen.append((code, ring.count)))
+    source.push_tick("000001.SZ", _tick(2000, 5.0))
+    source.push_tick("600000.SH", _tick(3000, 10.5))
+    source.push_tick("688001.SH", _tick(3000, 50.0))
+    assert seen == [("000001.SZ", 1), ("600000.SH", 2)]
+    assert service.last_prices() == {"600000.SH": 10.5, "000001.SZ": 5.0}
+    assert [row["证券代码"] for row in service.quote_table()] == ["000001.SZ", "600000.SH"]
+
+    # 清仓后退订，不再接收推送
+    service.sync_holdings([])
+    source.push_tick("600000.SH", _tick(4000, 11.0))
+    assert service.last_price("600000.SH") == 10.5
+    assert len(source._callbacks) == 1
+    unsubscribe()
+    source.push_tick("000001.SZ", _tick(5000, 5.1))
+    assert len(seen) == 2
+
+    full = service.get_full_tick(["000001.SZ", "688001.SH", "300001.SZ"])
+    assert full["000001.SZ"]["lastPrice"] == 5.1
+    assert full["000001.SZ"]["askVol"] == [200]
+    # 本地没有的回退到数据源
+    assert full["688001.SH"]["lastPrice"] == 50.0
+    assert "300001.SZ" not in full
+
+
+def test_replay_file(tmp_path):
+    path = tmp_path / "ticks.csv"
+    path.write_text("code,time,lastPrice,bidPrice,askPrice,bidVol,askVol,volume\n"
+                    "600000.SH,1000,10.0,9.99,10.01,100,200,10\n"
+                    "000001.SZ,1500,5.0,4.99,5.01,100,200,20\n"
+                    "600000.SH,2000,10.2,10.19,10.21,100,200,30\n", encoding="utf-8")
+    source = ReplayQuoteSource(str(path))
+    service = QuoteService(source, watchlist=["600000.SH"])
+    service.set_watchlist(["600000.SH"])
+    source.replay()
+    window = service.window("600000.SH", 5)
+    assert window["last"].tolist() == [10.0, 10.2]
+    assert window["ts"].tolist() == [1.0, 2.0]
+    assert service.window("000001.SZ", 5).size == 0
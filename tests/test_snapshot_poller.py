@@ -0,0 +1,94 @@
+import time
+from types import SimpleNamespace
+import pandas as pd
+import config
+
+# 没有 miniQMT 终端时按模拟券商导入（MiniTrader 依赖 broker 模块）
+config.BROKER = "paper"
+
+from quote_service import ReplayQuoteSource  # noqa: E402
+from snapshot_poller import SnapshotPoller, TRADE_COLUMNS  # noqa: E402
+
+
+class _FakeTrader:
+    """只实现轮询用到的 MiniTrader 接口"""
+    connect_ok = True
+    instances = []
+
+    def __init__(self, path, account_id):
+        self.closed = False
+        self.ticks = []
+        self.fail = False
+        self.valuation = SimpleNamespace(on_tick=lambda *args: self.ticks.append(args))
+        self.bus = SimpleNamespace(stats=lambda: [{"name": "state", "backlog": 0, "dropped": 0}])
+        _FakeTrader.instances.append(self)
+
+    def connect(self):
+        return self.connect_ok
+
+    def close(self):
+        self.closed = True
+
+    def seed_valuation(self):
+        pass
+
+    def get_account_info(self):
+        if self.fail:
+            raise RuntimeError("查询超时")
+        return {"FreeCash": 1.0, "MarketValue": 2.0, "TotalAsset": 3.0, "FrozenCash": 0.0}
+
+    def get_orders(self):
+        return pd.DataFrame()
+
+    def get_trades(self):
+        return pd.DataFrame([{"StockCode": "600000.SH", "Volume": 100, "TradeType": 23}])
+
+    def get_positions(self):
+        return pd.DataFrame({"StockCode": ["600000.SH"], "Volume": [100]})
+
+
+def test_poller_publishes_versions_and_forwards_ticks():
+    _FakeTrader.instances.clear()
+    source = ReplayQuoteSource()
+    poller = SnapshotPoller("path", "acct", interval=60, trader_factory=_FakeTrader, quote_source=source)
+    assert poller.snapshot.version == 0
+    assert poller.snapshot.trades.columns.tolist() == TRADE_COLUMNS
+
+    poller.start()
+    try:
+        snap = poller.snapshot
+        assert snap.version == 1
+        assert snap.account_info.loc["总资产", "金额(¥)"] == 3.0
+        assert snap.trades[["证券代码", "交易类型"]].values.tolist() == [["600000.SH", "buy"]]
+        # 持仓代码已订阅，行情推送转给估值
+        source.push_tick("600000.SH", {"time": 1000, "lastPrice": 10.0, "lastClose": 9.8})
+        assert _FakeTrader.instances[0].ticks == [("600000.SH", 10.0, 9.8)]
+
+        # 刷新失败时保留上一个快照
+        poller.trader.fail = True
+        assert poller.refresh() is snap
+        assert poller.errors == 1 and poller.last_error == "查询超时"
+
+        # 重连成功后替换并关闭旧连接，后台线程立即刷新
+        assert poller.reconnect()
+        first, second = _FakeTrader.instances
+        assert first.closed and poller.trader is second
+        deadline = time.time() + 5
+        while poller.snapshot.version < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert poller.stats()["version"] == 2
+    finally:
+        poller.stop()
+
+
+def test_failed_connect_keeps_current_trader(monkeypatch):
+    _FakeTrader.instances.clear()
+    poller = SnapshotPoller("path", "acct", interval=60, trader_factory=_FakeTrader,
+                            quote_source=ReplayQuoteSource())
+    poller.connect()
+    current = poller.trader
+    monkeypatch.setattr(_FakeTrader, "connect_ok", False)
+    assert poller.connect() is None
+    assert poller.trader is current and not current.closed
+    assert _FakeTrader.instances[-1].closed
+    assert poller.last_error == "交易终端连接失败"
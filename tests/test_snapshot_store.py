@@ -0,0 +1,140 @@
+import os
+import json
+import pandas as pd
+import pandas.testing as pdt
+from snapshot_store import SnapshotStore, migrate_json_history, normalize_trades
+from postmarket_helper import load_history_trades, read_store_trades
+from trade_index import TradeIndex
+
+
+def _trade(code, side, volume, price, strategy="网格"):
+    return {"证券代码": code, "成交数量": volume, "成交均价": price, "成交金额": volume * price,
+            "TradeType": side, "Strategy": strategy, "Remark": f"{strategy}_{code}",
+            "订单编号": 1, "成交编号": f"{code}-{volume}", "成交时间": "10:00:00"}
+
+
+def _write_json(data_dir, date_str, trades, total=1e6):
+    for sub in ("account_positions", "trades_orders"):
+        os.makedirs(os.path.join(data_dir, sub), exist_ok=True)
+    with open(os.path.join(data_dir, "account_positions", f"{date_str}.json"), "w", encoding="utf-8") as f:
+        json.dump({"account_info": {"总资产": total, "持仓市值": total / 2, "可用资金": total / 2},
+                   "positions": [], "timestamp": date_str}, f, ensure_ascii=False)
+    path = os.path.join(data_dir, "trades_orders", f"{date_str}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"orders": [], "trades": trades}, f, ensure_ascii=False)
+    return path
+
+
+def test_write_day_records_versions(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.write_day("trades", "20250102", [{"StockCode": "600000.SH", "Volume": 100}])
+    store.write_day("trades", "20250103", [])
+    versions = store.versions("trades")
+    # 没有成交的日期也登记版本号，但不出现在分区里
+    assert sorted(versions) == ["20250102", "20250103"]
+    assert store.dates("trades") == ["20250102"]
+
+    store.write_day("trades", "20250102", [{"StockCode": "600000.SH", "Volume": 200}])
+    assert store.versions("trades")["20250102"] > versions["20250103"]
+    assert store.read("trades")["Volume"].tolist() == [200]
+
+    # 其他进程写入后 refresh 能读到
+    other = SnapshotStore(str(tmp_path))
+    other.write_day("trades", "20250106", [{"StockCode": "000001.SZ", "Volume": 300}])
+    assert store.refresh()
+    assert store.dates("trades") == ["20250102", "20250106"]
+    assert not store.refresh()
+
+
+def test_concurrent_writers_do_not_lose_days(tmp_path):
+    import threading
+    # 两个实例模拟 AccountUpdater 进程和看板，同时改写同一个月分区
+    stores = [SnapshotStore(str(tmp_path)), SnapshotStore(str(tmp_path))]
+    dates = [f"202501{day:02d}" for day in range(1, 29)]
+
+    def writer(store, own):
+        for date_str in own:
+            store.write_day("trades", date_str, [{"StockCode": "600000.SH", "Volume": int(date_str[-2:])}])
+
+    threads = [threading.Thread(target=writer, args=(store, dates[i::2])) for i, store in enumerate(stores)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    store = SnapshotStore(str(tmp_path))
+    assert store.dates("trades") == dates
+    assert sorted(store.versions("trades")) == dates
+    assert store.read("trades")["Volume"].tolist() == list(range(1, 29))
+
+
+def test_migrate_imports_only_missing_or_changed_days(tmp_path):
+    data_dir = str(tmp_path)
+    _write_json(data_dir, "20250102", [_trade("600000.SH", 23, 100, 10.0)])
+    path = _write_json(data_dir, "20250103", [_trade("600000.SH", 24, 100, 11.0)])
+    store = SnapshotStore(data_dir)
+
+    assert migrate_json_history(data_dir, store)["trades"] == 2
+    assert migrate_json_history(data_dir, store)["trades"] == 0
+    before = store.versions("trades")
+
+    _write_json(data_dir, "20250103", [_trade("600000.SH", 24, 100, 12.0)])
+    os.utime(path, ns=(1, 1))
+    assert migrate_json_history(data_dir, store) == {"account": 1, "positions": 1, "orders": 1, "trades": 1}
+    after = store.versions("trades")
+    assert after["20250102"] == before["20250102"]
+    assert after["20250103"] > before["20250103"]
+    assert store.read("trades", start="20250103")["Price"].tolist() == [12.0]
+
+
+def test_store_trades_match_json_history(tmp_path):
+    data_dir = str(tmp_path)
+    files = [
+        _write_json(data_dir, "20250102", [_trade("600000.SH", 23, 100, 10.0), _trade("000001.SZ", 23, 200, 5.5)]),
+        _write_json(data_dir, "20250103", []),
+        _write_json(data_dir, "20250106", [_trade("600000.SH", 24, 100, 11.0, strategy="动量")]),
+    ]
+    store = SnapshotStore(data_dir)
+    migrate_json_history(data_dir, store)
+
+    expected = load_history_trades(files)
+    result = read_store_trades(store)
+    pdt.assert_frame_equal(result.astype(str), expected.astype(str))
+
+    index = TradeIndex(data_dir)
+    assert index.refresh(store) == 3
+    assert index.refresh(store) == 0
+    assert index.count() == 3
+    assert index.count(side="sell") == 1
+
+    _write_json(data_dir, "20250106", [])
+    os.utime(files[2], ns=(1, 1))
+    migrate_json_history(data_dir, store)
+    assert index.refresh(store) == 1
+    assert index.count() == 2
+    assert pd.Series(index.query()["日期"]).tolist() == ["20250102", "20250102"]
+
+
+def test_index_reimports_only_changed_dates(tmp_path, monkeypatch):
+    data_dir = str(tmp_path)
+    store = SnapshotStore(data_dir)
+    for date_str, price in (("20250102", 10.0), ("20250203", 11.0), ("20250304", 12.0)):
+        store.write_day("trades", date_str, normalize_trades([_trade("600000.SH", 23, 100, price)]))
+    index = TradeIndex(data_dir)
+    assert index.refresh(store) == 3
+
+    # 改写首尾两天：只读取这两天所在的分区，中间月份不打开
+    store.write_day("trades", "20250102", normalize_trades([_trade("600000.SH", 24, 100, 9.0)]))
+    store.write_day("trades", "20250304", [])
+    opened = []
+    read_parquet = pd.read_parquet
+    monkeypatch.setattr(pd, "read_parquet", lambda path, **kw: opened.append(os.path.basename(path))
+                        or read_parquet(path, **kw))
+    assert index.refresh(store) == 2
+    assert opened == ["202501.parquet"]
+
+    page = index.query(sort_by="日期", descending=False)
+    assert page["日期"].tolist() == ["20250102", "20250203"]
+    assert page["Price"].tolist() == [9.0, 11.0]
+    assert index.count(side="sell") == 1
+    assert read_store_trades(store, dates=["20250203", "20250304"])["Price"].tolist() == [11.0]
@@ -0,0 +1,64 @@
+import pytest
+from valuation import PortfolioValuation, STOCK_BUY, STOCK_SELL
+
+
+def _position(code, volume, cost, yesterday=None):
+    return {"stock_code": code, "volume": volume, "open_price": cost,
+            "yesterday_volume": volume if yesterday is None else yesterday}
+
+
+def _trade(traded_id, side, volume, price, code="600000.SH"):
+    return {"traded_id": traded_id, "order_type": side, "stock_code": code,
+            "traded_volume": volume, "traded_price": price, "traded_amount": volume * price}
+
+
+def test_pending_buy_does_not_change_total_asset():
+    valuation = PortfolioValuation()
+    # 可用 90000 + 挂买单冻结 10000
+    valuation.seed([_position("600000.SH", 1000, 10.0)], [], 90000.0 + 10000.0,
+                   prices={"600000.SH": 10.0}, prev_close={"600000.SH": 9.5})
+    summary = valuation.summary()
+    assert summary["total_asset"] == 110000.0
+    assert summary["exposure"] == pytest.approx(10000.0 / 110000.0)
+    assert summary["intraday_pnl"] == 500.0
+
+    # 挂单成交：资金转为市值，总资产不变
+    valuation.on_trade(_trade("t1", STOCK_BUY, 1000, 10.0))
+    summary = valuation.summary()
+    assert summary["cash"] == 90000.0
+    assert summary["market_value"] == 20000.0
+    assert summary["total_asset"] == 110000.0
+    assert summary["exposure"] == pytest.approx(20000.0 / 110000.0)
+    assert summary["intraday_pnl"] == 500.0
+
+    # 同一成交重复推送只计一次
+    valuation.on_trade(_trade("t1", STOCK_BUY, 1000, 10.0))
+    assert valuation.summary()["cash"] == 90000.0
+
+
+def test_sell_fill_and_ticks():
+    valuation = PortfolioValuation()
+    valuation.seed([_position("600000.SH", 1000, 10.0)], [], 50000.0, prices={"600000.SH": 10.0})
+    valuation.on_tick("600000.SH", 11.0)
+    assert valuation.summary()["market_value"] == 11000.0
+    valuation.on_trade(_trade("t2", STOCK_SELL, 400, 11.0))
+    summary = valuation.summary()
+    assert summary["cash"] == 54400.0
+    assert summary["market_value"] == 6600.0
+    assert summary["total_asset"] == 61000.0
+    # 没有持仓的代码的行情被忽略
+    valuation.on_tick("000001.SZ", 5.0)
+    assert valuation.summary()["market_value"] == 6600.0
+
+
+def test_seed_counts_todays_trades_without_reapplying_them():
+    valuation = PortfolioValuation()
+    # 全量持仓已经包含今天买入的 500 股，当日成交只记买入金额
+    valuation.seed([_position("600000.SH", 1500, 10.0, yesterday=1000)], [_trade("t3", STOCK_BUY, 500, 10.0)],
+                   10000.0, prices={"600000.SH": 10.0}, prev_close={"600000.SH": 10.0})
+    summary = valuation.summary()
+    assert summary["market_value"] == 15000.0
+    assert summary["cash"] == 10000.0
+    assert summary["intraday_pnl"] == 0.0
+    valuation.on_trade(_trade("t3", STOCK_BUY, 500, 10.0))
+    assert valuation.summary()["cash"] == 10000.0
@@ -0,0 +1,172 @@
+# trade_index.py - 历史成交的本地索引与查询
+"""
+用 SQLite 为快照库（snapshot_store）中的历史成交建立本地索引，支持按日期、证券代码、
+策略/备注、买卖方向过滤，服务端排序和分页。索引按快照库的日期版本号增量刷新，
+只有新增或被改写的日期会重新导入。
+"""
+import os
+import sqlite3
+import threading
+import pandas as pd
+from postmarket_helper import read_store_trades
+
+INDEX_NAME = "trade_history.sqlite"
+
+# 查询结果列名 -> 表字段
+COLUMN_MAP = {
+    "日期": "date",
+    "StockCode": "code",
+    "Volume": "volume",
+    "Price": "price",
+    "Value": "value",
+    "TradeType": "side",
+    "Strategy": "strategy",
+    "Remark": "remark",
+    "OrderId": "order_id",
+    "TradeId": "trade_id",
+    "TradeTime": "trade_time",
+}
+
+# 允许的排序字段
+SORT_COLUMNS = {
+    "日期": "date {dir}, trade_time {dir}",
+    "StockCode": "code {dir}, date {dir}",
+    "Value": "value {dir}",
+    "Volume": "volume {dir}",
+    "Strategy": "strategy {dir}, date {dir}",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    date TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    date TEXT NOT NULL,
+    code TEXT,
+    volume INTEGER,
+    price REAL,
+    value REAL,
+    side TEXT,
+    strategy TEXT,
+    remark TEXT,
+    order_id INTEGER,
+    trade_id TEXT,
+    trade_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trades_date ON trades(date, trade_time);
+CREATE INDEX IF NOT EXISTS idx_trades_code ON trades(code, date);
+CREATE INDEX IF NOT EXISTS idx_trades_strategy ON trades(strategy, date);
+CREATE INDEX IF NOT EXISTS idx_trades_side ON trades(side, date);
+"""
+
+
+class TradeIndex:
+    """历史成交索引"""
+
+    def __init__(self, data_dir):
+        self.db_path = os.path.join(data_dir, INDEX_NAME)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+
+    def refresh(self, store):
+        """增量导入快照库中新增或改写过的日期
+
+        Args:
+            store: SnapshotStore（调用方已经 sync_store）
+
+        Returns:
+            int: 本次重新导入的天数
+        """
+        versions = store.versions("trades")
+        with self._lock:
+            indexed = dict(self.conn.execute("SELECT date, version FROM days"))
+            changed = sorted(d for d, v in versions.items() if indexed.get(d) != v)
+            removed = [d for d in indexed if d not in versions]
+            if not changed and not removed:
+                return 0
+
+            frames = read_store_trades(store, dates=changed) if changed else None
+            with self.conn:
+                for date_str in removed + changed:
+                    self.conn.execute("DELETE FROM trades WHERE date = ?", (date_str,))
+                    self.conn.execute("DELETE FROM days WHERE date = ?", (date_str,))
+                if frames is not None and not frames.empty:
+                    rows = frames.reindex(columns=list(COLUMN_MAP.keys())).astype(object)
+                    rows = rows.where(pd.notna(rows), None)
+                    self.conn.executemany(
+                        f"INSERT INTO trades ({', '.join(COLUMN_MAP.values())}) "
+                        f"VALUES ({', '.join('?' * len(COLUMN_MAP))})",
+                        rows.itertuples(index=False, name=None),
+                    )
+                self.conn.executemany(
+                    "INSERT INTO days (date, version) VALUES (?, ?)",
+                    [(date_str, versions[date_str]) for date_str in changed],
+                )
+            return len(changed)
+
+    @staticmethod
+    def _where(start=None, end=None, code=None, strategy=None, side=None):
+        """拼接过滤条件"""
+        where, params = [], []
+        if start:
+            where.append("date >= ?")
+            params.append(start)
+        if end:
+            where.append("date <= ?")
+            params.append(end)
+        if code:
+            where.append("code LIKE ?")
+            params.append(f"{code}%")
+        if strategy:
+            where.append("(strategy = ? OR remark LIKE ?)")
+            params.extend([strategy, f"%{strategy}%"])
+        if side:
+            where.append("side = ?")
+            params.append(side)
+        return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+    def count(self, **filters):
+        """返回符合条件的总行数，过滤参数同 query"""
+        where_sql, params = self._where(**filters)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM trades {where_sql}", params).fetchone()[0]
+
+    def query(self, start=None, end=None, code=None, strategy=None, side=None,
+              sort_by="日期", descending=True, page=1, page_size=50):
+        """分页查询历史成交
+
+        Args:
+            start: 开始日期 YYYYMMDD（含）
+            end: 结束日期 YYYYMMDD（含）
+            code: 证券代码，支持前缀匹配（如 "600"）
+            strategy: 策略名或备注关键词
+            side: "buy" / "sell"
+            sort_by: 排序字段，见 SORT_COLUMNS
+            descending: 是否倒序
+            page: 页码，从 1 开始
+            page_size: 每页行数
+
+        Returns:
+            pd.DataFrame: 当前页数据
+        """
+        where_sql, params = self._where(start, end, code, strategy, side)
+        order = SORT_COLUMNS.get(sort_by, SORT_COLUMNS["日期"]).format(dir="DESC" if descending else "ASC")
+        offset = max(page - 1, 0) * page_size
+        select = ", ".join(f'{col} AS "{name}"' for name, col in COLUMN_MAP.items())
+
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT {select} FROM trades {where_sql} ORDER BY {order} LIMIT ? OFFSET ?",
+                self.conn,
+                params=params + [page_size, offset],
+            )
+
+    def strategies(self):
+        """返回索引中出现过的策略名"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT strategy FROM trades WHERE strategy IS NOT NULL ORDER BY strategy"
+            ).fetchall()
+        return [r[0] for r in rows]
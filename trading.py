@@ -1,26 +1,28 @@
 # trading.py - 盘中业务逻辑
 import streamlit as st
 import pandas as pd
-from trader import get_trades
-from common import get_xueqiu_link
+from trader import get_trades, get_orders, get_trader, get_poller, get_quotes, get_valuation, get_lifecycle
+import json
+from common import get_xueqiu_link, get_xueqiu_links
+from metrics import cached
 
-@st.cache_data(ttl=30)  # 15秒缓存，保证数据相对实时
 def get_current_trades(path, account_id):
     """获取今日成交"""
-    # 直接调用trader.py中的通用函数
+    # 直接读取后台轮询器的最新快照
     return get_trades(path, account_id)
 
 # 将原有的get_potential_trades函数修改为调用新模块的函数
-@st.cache_data(ttl=60)
+@cached("trading.get_potential_trades", st.cache_data(ttl=60))
 def get_potential_trades():
-    """从日志文件中读取潜在交易机会"""
+    """从日志文件中读取潜在交易机会（按时间倒序）"""
     from qmtlog_helper import read_qmt_log_signals
-    signals = read_qmt_log_signals()
-        # 转换为DataFrame并返回
-    signals_df = pd.DataFrame(signals)
-    if signals_df.empty:
-        return pd.DataFrame(columns=["信号类型", "证券代码", "详情"])
-    return signals_df
+    signals_df = read_qmt_log_signals()
+    return signals_df.sort_values("时间", ascending=False, kind="stable", ignore_index=True)
+
+def get_signal_summary(seconds):
+    """按代码汇总最近 seconds 秒的信号数"""
+    from qmtlog_helper import read_qmt_signal_summary
+    return read_qmt_signal_summary(seconds)
 
 def execute_manual_trade(stock_code, trade_type, price, volume, path, account_id):
     """执行手动交易"""
@@ -33,16 +35,37 @@ def execute_manual_trade(stock_code, trade_type, price, volume, path, account_id
         result = trader.sell_stock(stock_code, volume, price=price, remark='手动触发')
         return result is not None, "卖出请求已提交" if result else "卖出请求失败"
 
+@st.fragment(run_every=2)
+def render_valuation(path, account_id):
+    """持仓估值（按逐笔行情更新，局部定时刷新）"""
+    valuation = get_valuation(path, account_id)
+    summary = valuation.summary()
+    cols = st.columns(5)
+    cols[0].metric("总资产", f"{summary['total_asset']:,.2f}")
+    cols[1].metric("持仓市值", f"{summary['market_value']:,.2f}")
+    cols[2].metric("当日盈亏", f"{summary['intraday_pnl']:,.2f}")
+    cols[3].metric("浮动盈亏", f"{summary['unrealized_pnl']:,.2f}")
+    cols[4].metric("仓位", f"{summary['exposure']:.1%}")
+    st.dataframe(valuation.frame(), use_container_width=True, hide_index=True)
+
 def render_trading_view(path, account_id):
     """渲染盘中视图"""
     st.header("🔄 盘中监控")
+    if get_trader(path, account_id) is None:
+        st.error("交易终端未连接，请运行并登录 miniQMT 终端后点击侧边栏的重新连接")
+        return
+
+    # 持仓估值
+    st.subheader("持仓估值")
+    render_valuation(path, account_id)
+    st.divider()
     
     # 当前委托部分
     st.subheader("当前委托")
     col1, col2 = st.columns([3, 1])
     with col2:
         if st.button("🔄 刷新委托", key="refresh_orders"):
-            st.cache_data.clear()
+            get_poller(path, account_id).refresh()
             st.toast("委托数据已刷新")
     
     orders_df = get_current_orders(path, account_id)
@@ -65,7 +88,7 @@ def render_trading_view(path, account_id):
     col1, col2 = st.columns([3, 1])
     with col2:
         if st.button("🔄 刷新成交", key="refresh_trades"):
-            st.cache_data.clear()
+            get_poller(path, account_id).refresh()
             st.toast("成交数据已刷新")
     
     trades_df = get_current_trades(path, account_id)
@@ -88,21 +111,33 @@ def render_trading_view(path, account_id):
     col1, col2 = st.columns([3, 1])
     with col2:
         if st.button("🔄 刷新信号", key="refresh_signals"):
-            st.cache_data.clear()
+            get_potential_trades.clear()
             st.toast("交易信号已刷新")
     
     signals_df = get_potential_trades()
     
-    # 如果存在证券代码列，将其转换为可点击链接
+    # 信号表按列整体渲染，证券代码链接向量化生成，数千行也不逐行处理
     if not signals_df.empty and '证券代码' in signals_df.columns:
-        display_df = signals_df.copy()
-        display_df['证券代码'] = signals_df['证券代码'].apply(
-            lambda x: f'<a href="{get_xueqiu_link(x)}" target="_blank">{x}</a>' if pd.notna(x) else ''
+        view = st.radio("显示方式", ["全部信号", "按代码汇总"], horizontal=True, key="signal_view")
+        if view == "全部信号":
+            display_df = signals_df.assign(雪球=get_xueqiu_links(signals_df['证券代码']))
+        else:
+            minutes = st.select_slider("统计窗口（分钟）", [5, 15, 30, 60, 240], value=30, key="signal_window")
+            summary_df = get_signal_summary(minutes * 60)
+            display_df = summary_df.assign(雪球=get_xueqiu_links(summary_df['证券代码']))
+        st.dataframe(
+            display_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "雪球": st.column_config.LinkColumn("雪球", display_text="打开"),
+                "时间": st.column_config.DatetimeColumn("时间", format="MM-DD HH:mm:ss"),
+                "最后信号": st.column_config.DatetimeColumn("最后信号", format="MM-DD HH:mm:ss"),
+            }
         )
-        st.write(display_df.to_html(escape=False), unsafe_allow_html=True)
         
         # 添加选择操作的功能
-        selected_signals = st.multiselect("选择要执行的交易", signals_df['证券代码'].tolist())
+        selected_signals = st.multiselect("选择要执行的交易", signals_df['证券代码'].unique().tolist())
         if selected_signals:
             if st.button("执行选中的交易"):
                 st.write(f"将执行以下交易: {', '.join(selected_signals)}")
@@ -120,6 +155,25 @@ def render_trading_view(path, account_id):
             }
         )
     
+    # 实时行情（持仓 + 自选）
+    st.divider()
+    st.subheader("实时行情")
+    quotes_df = pd.DataFrame(get_quotes(path, account_id).quote_table())
+    if quotes_df.empty:
+        st.info("暂无行情数据")
+    else:
+        st.dataframe(quotes_df, use_container_width=True, hide_index=True)
+
+    # 委托延迟统计
+    with st.expander("委托延迟"):
+        lifecycle = get_lifecycle(path, account_id)
+        dimension = st.radio("维度", ["all", "strategy", "symbol"], horizontal=True,
+                             format_func={"all": "整体", "strategy": "按策略", "symbol": "按代码"}.get)
+        st.caption(f"未完成委托 {lifecycle.pending()} 笔")
+        st.dataframe(lifecycle.frame(dimension), use_container_width=True, hide_index=True)
+        st.download_button("导出 JSON", json.dumps(lifecycle.export(), ensure_ascii=False),
+                           file_name="order_latency.json", mime="application/json")
+
     # 手动交易表单
     with st.expander("手动触发交易"):
         with st.form("manual_trade_form"):
@@ -145,8 +199,6 @@ def render_trading_view(path, account_id):
                     st.error(message)
 
 
-@st.cache_data(ttl=30)  # 15秒缓存，保证数据相对实时
 def get_current_orders(path, account_id):
     """获取当前委托订单"""
-    from trader import get_orders
     return get_orders(path, account_id)
\ No newline at end of file
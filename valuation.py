@@ -0,0 +1,242 @@
+# valuation.py - 逐笔行情驱动的持仓估值
+"""
+持仓按代码对齐成若干 NumPy 数组（数量、成本、最新价、昨收、昨日持仓、今日买卖金额），
+每笔行情只更新一个价格并增量调整组合汇总，需要明细时一次性向量化计算。
+
+- 基准值来自持仓全量查询 + 当日成交（AccountCache 刷新时重新对齐）
+- 成交回报增量更新数量、成本和当日买卖金额
+- 资金为可用资金 + 冻结资金：挂单冻结不改变总资产，买入成交时扣除、卖出成交时增加
+- 当日盈亏 = 市值 - 昨日持仓 × 昨收 - 今日买入金额 + 今日卖出金额
+"""
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+# 成交方向（与 xtconstant.STOCK_BUY / STOCK_SELL 一致）
+STOCK_BUY = 23
+STOCK_SELL = 24
+
+
+class PortfolioValuation:
+    """组合估值"""
+
+    def __init__(self, capacity=256):
+        self.codes = []
+        self.index = {}
+        self.size = 0
+        self._alloc(capacity)
+        self.cash = 0.0
+        self.market_value = 0.0
+        self.baseline = 0.0
+        self.version = 0
+        self.updated_at = 0.0
+        self.ticks = 0
+        self._seen_trades = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def _alloc(self, capacity):
+        self.volume = np.zeros(capacity, dtype="int64")
+        self.yesterday_volume = np.zeros(capacity, dtype="int64")
+        self.cost = np.zeros(capacity, dtype="float64")
+        self.last = np.zeros(capacity, dtype="float64")
+        self.prev_close = np.zeros(capacity, dtype="float64")
+        self.buy_amount = np.zeros(capacity, dtype="float64")
+        self.sell_amount = np.zeros(capacity, dtype="float64")
+
+    def _grow(self):
+        """容量翻倍（调用方已持有锁）"""
+        n = self.volume.size
+        for name in ("volume", "yesterday_volume", "cost", "last", "prev_close", "buy_amount", "sell_amount"):
+            old = getattr(self, name)
+            new = np.zeros(n * 2, dtype=old.dtype)
+            new[:n] = old
+            setattr(self, name, new)
+
+    def _slot(self, code):
+        """代码对应的下标，不存在时追加（调用方已持有锁）"""
+        i = self.index.get(code)
+        if i is None:
+            if self.size == self.volume.size:
+                self._grow()
+            i = self.size
+            self.size += 1
+            self.codes.append(code)
+            self.index[code] = i
+        return i
+
+    # ---------- 基准值 ----------
+    def seed(self, positions, trades, cash, prices=None, prev_close=None):
+        """用全量持仓和当日成交重建
+
+        Args:
+            positions: AccountCache.position_records() 的持仓记录
+            trades: OrderBook.trade_records() 的当日成交记录
+            cash: 资金（可用资金 + 挂单冻结的资金）
+            prices: {代码: 最新价}，缺失时沿用已有价格或持仓成本
+            prev_close: {代码: 昨收}，缺失时沿用已有昨收或最新价
+        """
+        prices = prices or {}
+        prev_close = prev_close or {}
+        with self._lock:
+            old_last = dict(zip(self.codes, self.last[:self.size]))
+            old_prev = dict(zip(self.codes, self.prev_close[:self.size]))
+            self.codes, self.index, self.size = [], {}, 0
+            self._alloc(max(self.volume.size, len(positions) * 2, 16))
+            for p in positions:
+                i = self._slot(p["stock_code"])
+                self.volume[i] = p.get("volume") or 0
+                self.yesterday_volume[i] = p.get("yesterday_volume") or 0
+                self.cost[i] = p.get("open_price") or 0.0
+            self._seen_trades = set()
+            for t in trades:
+                self._apply_trade(t, update_position=False)
+            for code, i in self.index.items():
+                last = prices.get(code) or old_last.get(code) or self.cost[i]
+                self.last[i] = last
+                self.prev_close[i] = prev_close.get(code) or old_prev.get(code) or last
+            self.cash = cash
+            self._recompute()
+            delta = self._publish()
+        self._notify(delta)
+
+    def _recompute(self):
+        """重新计算组合汇总（调用方已持有锁）"""
+        n = self.size
+        self.market_value = float(np.dot(self.volume[:n], self.last[:n]))
+        self.baseline = float(np.dot(self.yesterday_volume[:n], self.prev_close[:n])
+                              + self.buy_amount[:n].sum() - self.sell_amount[:n].sum())
+
+    # ---------- 增量更新 ----------
+    def on_tick(self, code, price, prev_close=None):
+        """单笔行情：O(1) 更新价格和组合市值"""
+        if price <= 0:
+            return
+        with self._lock:
+            # seed 会整体替换 index，查找也要在锁内
+            i = self.index.get(code)
+            if i is None:
+                return
+            self.market_value += float(self.volume[i]) * (price - self.last[i])
+            self.last[i] = price
+            if prev_close and prev_close != self.prev_close[i]:
+                self.baseline += float(self.yesterday_volume[i]) * (prev_close - self.prev_close[i])
+                self.prev_close[i] = prev_close
+            self.ticks += 1
+            delta = self._publish()
+        self._notify(delta)
+
+    def on_prices(self, prices):
+        """批量行情 {代码: 最新价}：向量化更新后重新汇总"""
+        with self._lock:
+            pairs = [(self.index[c], p) for c, p in prices.items() if c in self.index and p > 0]
+            if not pairs:
+                return
+            idx, px = np.array(pairs).T
+            self.last[idx.astype("int64")] = px
+            self.ticks += len(pairs)
+            self._recompute()
+            delta = self._publish()
+        self._notify(delta)
+
+    def on_trade(self, trade):
+        """成交回报（OrderBook 的成交记录），同一成交编号只计一次"""
+        with self._lock:
+            if not self._apply_trade(trade, update_position=True):
+                return
+            self._recompute()
+            delta = self._publish()
+        self._notify(delta)
+
+    def _apply_trade(self, trade, update_position):
+        """记入当日买卖金额；update_position 时同时调整数量、成本和资金（调用方已持有锁）"""
+        traded_id = trade.get("traded_id")
+        if traded_id in self._seen_trades:
+            return False
+        self._seen_trades.add(traded_id)
+        side = trade.get("order_type")
+        if side not in (STOCK_BUY, STOCK_SELL):
+            return False
+        i = self._slot(trade["stock_code"])
+        volume = trade.get("traded_volume") or 0
+        price = trade.get("traded_price") or 0.0
+        amount = trade.get("traded_amount") or volume * price
+        if side == STOCK_BUY:
+            self.buy_amount[i] += amount
+            if update_position:
+                held = self.volume[i]
+                self.cost[i] = (self.cost[i] * held + amount) / (held + volume) if held + volume else price
+                self.volume[i] = held + volume
+                self.cash -= amount
+        else:
+            self.sell_amount[i] += amount
+            if update_position:
+                self.volume[i] = max(self.volume[i] - volume, 0)
+                self.cash += amount
+        if update_position and not self.last[i]:
+            self.last[i] = price
+            self.prev_close[i] = price
+        return True
+
+    # ---------- 订阅 ----------
+    def _publish(self):
+        """版本号 +1，返回通知内容（调用方已持有锁）"""
+        self.version += 1
+        self.updated_at = time.time()
+        return self.version, self.market_value, self.market_value - self.baseline
+
+    def _notify(self, delta):
+        for listener in list(self._listeners):
+            try:
+                listener(delta)
+            except Exception:
+                pass
+
+    def subscribe(self, listener):
+        """订阅估值变化，listener((version, 市值, 当日盈亏)) 在行情/回调线程上执行"""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    # ---------- 读取 ----------
+    def summary(self):
+        with self._lock:
+            n = self.size
+            unrealized = float(np.dot(self.volume[:n], self.last[:n] - self.cost[:n]))
+            market_value = float(self.market_value)
+            total = market_value + self.cash
+            return {
+                "version": self.version,
+                "updated_at": self.updated_at,
+                "total_asset": total,
+                "market_value": market_value,
+                "cash": self.cash,
+                "unrealized_pnl": unrealized,
+                "intraday_pnl": market_value - float(self.baseline),
+                "exposure": market_value / total if total else 0.0,
+                "ticks": self.ticks,
+            }
+
+    def frame(self):
+        """持仓估值明细"""
+        with self._lock:
+            n = self.size
+            volume = self.volume[:n].astype("float64")
+            last = self.last[:n].copy()
+            cost = self.cost[:n].copy()
+            market_value = volume * last
+            intraday = (market_value - self.yesterday_volume[:n] * self.prev_close[:n]
+                        - self.buy_amount[:n] + self.sell_amount[:n])
+            total = self.market_value + self.cash
+            codes = list(self.codes)
+        df = pd.DataFrame({
+            "证券代码": codes,
+            "持仓数量": volume.astype("int64"),
+            "成本价": cost,
+            "最新价": last,
+            "市值": market_value,
+            "浮动盈亏": volume * (last - cost),
+            "当日盈亏": intraday,
+            "仓位占比": market_value / total if total else 0.0,
+        })
+        return df[(df["持仓数量"] > 0) | (df["当日盈亏"] != 0)].sort_values("市值", ascending=False)